@@ -0,0 +1,162 @@
+"""
+Measure the per-issue cost of collecting issues.
+
+Run from the root of the repository::
+
+    python benchmarks/collect.py render [--issues N]
+    python benchmarks/collect.py transport [--issues N]
+
+``render`` times turning issues into taskwarrior records.  The synthetic
+target uses several field templates, added tags and label tags, so the numbers
+are dominated by template handling.
+
+``transport`` times a worker process handing issues to the parent, either as
+``Issue`` objects rendered by the parent or as records rendered by the worker
+and sent in batches, and reports the parent's CPU time.
+"""
+import argparse
+import multiprocessing
+import pickle
+import time
+import timeit
+
+import typing_extensions
+
+from bugwarrior import collect, config
+from bugwarrior.config import schema
+from bugwarrior.services import Issue
+
+
+class BenchConfig(config.ServiceConfig):
+    service: typing_extensions.Literal['bench']
+    import_labels_as_tags: bool = True
+    label_template: str = 'label_{{label}}'
+
+
+class BenchIssue(Issue):
+    UDAS = {'benchid': {'type': 'numeric', 'label': 'Bench ID'}}
+    UNIQUE_KEY = ('benchid',)
+
+    def to_taskwarrior(self):
+        return {
+            'project': self.record['project'],
+            'priority': self.config.default_priority,
+            'annotations': [
+                f'@someone - comment {i} on this issue, truncated to 45...'
+                for i in range(20)],
+            'tags': self.get_tags_from_labels(self.record['labels']),
+            'benchid': self.record['id'],
+        }
+
+    def get_default_description(self):
+        return self.build_default_description(
+            title=self.record['title'], url=self.record['url'],
+            number=self.record['id'])
+
+
+def make_issues(count):
+    main_config = schema.MainSectionConfig.construct(
+        targets=['bench'], interactive=False)
+    service_config = BenchConfig(
+        service='bench',
+        target='bench',
+        add_tags=['bench', '{{project}}_work'],
+        project_template='work.{{project}}',
+        priority_template='{% if benchid % 2 %}H{% else %}L{% endif %}',
+        description_template='{{benchid}}: {{description}}',
+        due_template='2024-01-01',
+        entry_template='2023-01-01',
+    )
+    return [
+        BenchIssue({
+            'id': i,
+            'title': f'Issue number {i}',
+            'url': f'https://example.com/issues/{i}',
+            'project': f'project{i % 10}',
+            'labels': ['bug', 'needs review', f'area {i % 5}'],
+        }, service_config, main_config, extra={})
+        for i in range(count)
+    ]
+
+
+def bench_render(issues, repeat):
+    def run():
+        for issue in issues:
+            collect.TaskConstructor(issue).get_taskwarrior_record()
+
+    def run_uncached():
+        for issue in issues:
+            collect.compile_template.cache_clear()
+            collect.TaskConstructor(issue).get_taskwarrior_record()
+
+    for label, func in (('compiled once', run),
+                        ('compiled per issue', run_uncached)):
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f'{label:>20}: {best / len(issues) * 1e6:8.1f} us/issue')
+
+
+def send_issues(issues, queue):
+    for issue in issues:
+        queue.put(issue)
+    queue.put(None)
+
+
+def receive_issues(queue):
+    while True:
+        issue = queue.get()
+        if issue is None:
+            return
+        collect.TaskConstructor(issue).get_taskwarrior_record()
+
+
+def send_records(issues, queue):
+    batcher = collect.RecordBatcher(queue, serialize=True)
+    for issue in issues:
+        batcher.put(collect.TaskConstructor(issue).get_taskwarrior_record())
+    batcher.flush()
+    queue.put(None)
+
+
+def receive_records(queue):
+    while True:
+        batch = queue.get()
+        if batch is None:
+            return
+        for record in batch:
+            pickle.loads(record)
+
+
+def bench_transport(issues, repeat):
+    for label, send, receive in (
+            ('issue objects', send_issues, receive_issues),
+            ('record batches', send_records, receive_records)):
+        wall = cpu = float('inf')
+        for _ in range(repeat):
+            queue = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=send, args=(issues, queue))
+            start, start_cpu = time.perf_counter(), time.process_time()
+            worker.start()
+            receive(queue)
+            wall = min(wall, time.perf_counter() - start)
+            cpu = min(cpu, time.process_time() - start_cpu)
+            worker.join()
+        print(f'{label:>20}: {len(issues) / wall:8.0f} issues/s, '
+              f'parent CPU {cpu / len(issues) * 1e6:6.1f} us/issue')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('benchmark', choices=('render', 'transport'))
+    parser.add_argument('--issues', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    issues = make_issues(args.issues)
+    if args.benchmark == 'render':
+        bench_render(issues, args.repeat)
+    else:
+        bench_transport(issues, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,48 @@
-import copy
+import asyncio
+import concurrent.futures
+import contextvars
+import datetime
+import functools
+import hashlib
+import inspect
 import logging
 import multiprocessing
+import pickle
+import queue as queue_module
+import threading
 import time
+import urllib.parse
 
 from jinja2 import Template
+import pydantic.v1.json
 from pkg_resources import iter_entry_points
 
 from taskw.task import Task
 
+from bugwarrior.config import secrets
+
 log = logging.getLogger(__name__)
 
 # Sentinels for process completion status
 SERVICE_FINISHED_OK = 0
 SERVICE_FINISHED_ERROR = 1
 
+# How far back from the previous pull's start incremental pulls look, to
+# allow for our clock being ahead of the service's.
+INCREMENTAL_OVERLAP = datetime.timedelta(minutes=5)
+
+# Credential options, left out of the digest of a target's configuration:
+# password oracles may return new ones on every run, and the digest is kept.
+SECRET_OPTIONS = frozenset({
+    'PAT', 'api_key', 'api_token', 'auth_token', 'key', 'password', 'secret',
+    'token',
+})
+
+# Bounds on the records a worker sends to the parent at once.
+BATCH_RECORDS = 500
+BATCH_BYTES = 1024 * 1024
+BATCH_SECONDS = 1
+
 
 def get_service(service_name):
     epoint = iter_entry_points(group='bugwarrior.service', name=service_name)
@@ -25,25 +54,182 @@ def get_service(service_name):
     return epoint.load()
 
 
-def _aggregate_issues(conf, main_section, target, queue):
-    """ This worker function is separated out from the main
-    :func:`aggregate_issues` func only so that we can use multiprocessing
-    on it for speed reasons.
+@functools.lru_cache(maxsize=None)
+def compile_template(source):
+    """ Return the compiled Jinja template for `source`.
+
+    Compiling costs far more than rendering, so each distinct template is
+    compiled once per process and then shared by every issue.
     """
+    return Template(source)
+
+
+# The HostLimiter of the running collection, if any.
+host_limiter = contextvars.ContextVar('host_limiter', default=None)
+
+
+class HostLimiter:
+    """ Bound the number of concurrent requests made to each host. """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.semaphores = {}
+
+    def __call__(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.limit)
+        return self.semaphores[host]
+
+
+def _encode_config_value(value):
+    # Sets would be encoded in an order varying from one process to the next.
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return pydantic.v1.json.pydantic_encoder(value)
+
+
+def _config_digest(service_config):
+    return hashlib.sha256(service_config.json(
+        exclude=SECRET_OPTIONS & service_config.__fields__.keys(),
+        sort_keys=True, encoder=_encode_config_value).encode('utf-8')
+    ).hexdigest()
+
+
+def _iter_incremental_issues(service):
+    """ Iterate over the issues of `service`, fetching only updated ones.
+
+    The issues of each pull are kept as a snapshot in the bugwarrior data,
+    along with a cursor recording when the pull started.  The next pull asks
+    the service for the issues updated since then and takes the others from
+    the snapshot.  A full pull is made when there is no cursor, when the
+    target's configuration changed, or once ``full_pull_interval`` hours
+    have passed since the last one, to drop issues which left the target
+    without the service noticing.
+    """
+    data = service.main_config.data
+    target = service.config.target
+    namespace = 'snapshot.' + target
+    started = datetime.datetime.now(datetime.timezone.utc)
+
+    cursor = data.get(target, namespace='cursors')
+    full = cursor is None or cursor['config'] != _config_digest(
+        service.config) or started - datetime.datetime.fromisoformat(
+            cursor['full']) >= datetime.timedelta(
+                hours=service.config.full_pull_interval)
+    if full:
+        log.info("Pulling every issue of [%s].", target)
+        since = None
+        snapshot = {}
+    else:
+        since = datetime.datetime.fromisoformat(
+            cursor['since']) - INCREMENTAL_OVERLAP
+        log.info("Pulling issues of [%s] updated since %s.", target, since)
+        snapshot = data.get_namespace(namespace)
+
+    updated = {}
+    removed = []
+    for key, issue in service.issues_updated_since(since):
+        if issue is None:
+            removed.append(key)
+            continue
+        updated[key] = service.get_snapshot(issue)
+        yield issue
+    log.debug(" %i issues updated, %i removed.", len(updated), len(removed))
+
+    for key, value in snapshot.items():
+        if key not in updated and key not in removed:
+            yield service.issue_from_snapshot(value)
+
+    with data.transaction() as transaction:
+        transaction.update_namespace(namespace, updated, replace=full)
+        transaction.delete(removed, namespace)
+        transaction.set(target, {
+            'since': started.isoformat(),
+            'full': started.isoformat() if full else cursor['full'],
+            'config': _config_digest(service.config),
+        }, namespace='cursors')
 
-    start = time.time()
 
+def _pulls_incrementally(service_config, service_class):
+    """ Whether the target of `service_config` is pulled incrementally. """
+    if not service_config.incremental:
+        return False
+    # Services which support incremental pulls implement the
+    # issues_updated_since generator.
+    if inspect.isgeneratorfunction(service_class.issues_updated_since):
+        return True
+    log.warning("[%s] does not support incremental pulls.",
+                service_config.target)
+    return False
+
+
+def _iter_issues(service):
+    """ Iterate over the issues of `service`.
+
+    Asynchronous services are driven on an event loop of their own.
+    """
+    if _pulls_incrementally(service.config, type(service)):
+        yield from _iter_incremental_issues(service)
+        return
+
+    issues = service.issues()
+    if not inspect.isasyncgen(issues):
+        yield from issues
+        return
+
+    token = host_limiter.set(
+        HostLimiter(service.main_config.max_requests_per_host))
+    loop = asyncio.new_event_loop()
     try:
-        service = get_service(conf[target].service)(
-            conf[target], conf[main_section])
-        issue_count = 0
-        for issue in service.issues():
-            queue.put(issue)
-            issue_count += 1
-    except SystemExit as e:
+        while True:
+            try:
+                yield loop.run_until_complete(issues.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(issues.aclose())
+        loop.close()
+        host_limiter.reset(token)
+
+
+class RecordBatcher:
+    """ Send a worker's rendered records to the parent in batches.
+
+    Records bound for another process are pickled one by one as they are
+    rendered, which bounds the size of each batch and spares the queue from
+    pickling anything but bytes.
+    """
+
+    def __init__(self, queue, serialize):
+        self.queue = queue
+        self.serialize = serialize
+        self.batch = []
+        self.size = 0
+        self.started = None
+
+    def put(self, record):
+        if self.serialize:
+            record = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+            self.size += len(record)
+        if not self.batch:
+            self.started = time.monotonic()
+        self.batch.append(record)
+        if (len(self.batch) >= BATCH_RECORDS or self.size >= BATCH_BYTES
+                or time.monotonic() - self.started >= BATCH_SECONDS):
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+            self.size = 0
+
+
+def _report_failure(target, e, queue):
+    if isinstance(e, SystemExit):
         log.critical(f"Worker for [{target}] exited: {e}")
-        queue.put((SERVICE_FINISHED_ERROR, target))
-    except BaseException as e:
+    else:
         if hasattr(e, 'request') and e.request:
             # Exceptions raised by requests library have the HTTP request
             # object stored as attribute. The request can have hooks attached
@@ -51,8 +237,32 @@ def _aggregate_issues(conf, main_section, target, queue):
             # methods. There is no one left to call these hooks anyway.
             e.request.hooks = {}
         log.exception(f"Worker for [{target}] failed: {e}")
-        queue.put((SERVICE_FINISHED_ERROR, target))
+    queue.put((SERVICE_FINISHED_ERROR, target))
+
+
+def _aggregate_issues(conf, main_section, target, queue, serialize=True):
+    """ This worker function is separated out from the main
+    :func:`aggregate_issues` func only so that we can use multiprocessing
+    on it for speed reasons.
+
+    Issues are rendered to taskwarrior records here, so only the records
+    travel to the parent; `serialize` is false when it shares our process.
+    """
+
+    start = time.time()
+    batcher = RecordBatcher(queue, serialize)
+
+    try:
+        service = get_service(conf[target].service)(
+            conf[target], conf[main_section])
+        for issue in _iter_issues(service):
+            batcher.put(TaskConstructor(issue).get_taskwarrior_record())
+        service.save_cached_comments()
+    except BaseException as e:
+        batcher.flush()
+        _report_failure(target, e, queue)
     else:
+        batcher.flush()
         log.debug(f"Worker for [{target}] finished ok.")
         queue.put((SERVICE_FINISHED_OK, target))
     finally:
@@ -60,48 +270,205 @@ def _aggregate_issues(conf, main_section, target, queue):
         log.info(f"Done with [{target}] in {duration}.")
 
 
-def aggregate_issues(conf, main_section, debug):
-    """ Return all issues from every target. """
-    log.info("Starting to aggregate remote issues.")
+async def _aggregate_issues_async(conf, main_section, target, queue, executor):
+    """ Counterpart of :func:`_aggregate_issues` for the asyncio engine. """
+    loop = asyncio.get_running_loop()
+    service_class = get_service(conf[target].service)
+    if not inspect.isasyncgenfunction(service_class.issues) or (
+            _pulls_incrementally(conf[target], service_class)):
+        # Synchronous services, and incremental pulls whose
+        # issues_updated_since is synchronous, run unchanged in a thread.
+        await loop.run_in_executor(
+            executor, _aggregate_issues, conf, main_section, target, queue,
+            False)
+        return
 
-    # Create and call service objects for every target in the config
-    targets = conf[main_section].targets
+    start = time.time()
+    batcher = RecordBatcher(queue, serialize=False)
+
+    try:
+        service = await loop.run_in_executor(
+            executor, service_class, conf[target], conf[main_section])
+        async for issue in service.issues():
+            batcher.put(TaskConstructor(issue).get_taskwarrior_record())
+        await loop.run_in_executor(executor, service.save_cached_comments)
+    except asyncio.CancelledError:
+        raise
+    except BaseException as e:
+        batcher.flush()
+        _report_failure(target, e, queue)
+    else:
+        batcher.flush()
+        log.debug(f"Worker for [{target}] finished ok.")
+        queue.put((SERVICE_FINISHED_OK, target))
+    finally:
+        duration = time.time() - start
+        log.info(f"Done with [{target}] in {duration}.")
+
+
+async def _aggregate_all_async(conf, main_section, targets, queue, workers):
+    host_limiter.set(HostLimiter(conf[main_section].max_requests_per_host))
+    executor = concurrent.futures.ThreadPoolExecutor(workers)
+    try:
+        await asyncio.gather(*(
+            _aggregate_issues_async(conf, main_section, target, queue, executor)
+            for target in targets))
+    finally:
+        executor.shutdown(wait=False)
+
+
+class _EventLoopThread(threading.Thread):
+    """ Run a coroutine on an event loop beside the consumer of its results.
+    """
 
-    queue = multiprocessing.Queue()
+    def __init__(self, coroutine):
+        super().__init__(daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.task = self.loop.create_task(coroutine)
 
-    log.info("Spawning %i workers." % len(targets))
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+
+    def cancel(self):
+        try:
+            self.loop.call_soon_threadsafe(self.task.cancel)
+        except RuntimeError:
+            pass  # The loop has already finished.
 
+
+def _resolve_secrets(conf, main_section):
+    """ Return a copy of `conf` with login-independent password oracles
+    already evaluated.
+
+    Running ``@oracle:eval:`` commands (and prompting for passwords) once here,
+    before any worker starts, keeps workers from racing each other for
+    gpg-agent or the terminal.  Oracles which fail are left in place so that
+    only the affected target fails, in its worker.
+    """
+    main_config = conf[main_section]
+    conf = dict(conf)
+    for target in main_config.targets:
+        service_config = conf[target]
+        resolved = {}
+        for key, value in dict(service_config).items():
+            if not isinstance(value, str):
+                continue
+            if not (value.startswith('@oracle:eval:') or (
+                    main_config.interactive
+                    and value == '@oracle:ask_password')):
+                continue
+            try:
+                keyring_service = get_service(
+                    service_config.service).get_keyring_service(service_config)
+            except NotImplementedError:
+                keyring_service = target
+            try:
+                resolved[key] = secrets.get_service_password(
+                    keyring_service, None, oracle=value,
+                    interactive=main_config.interactive)
+            except SystemExit:
+                continue
+        if resolved:
+            conf[target] = service_config.copy(update=resolved)
+    return conf
+
+
+_worker_state = {}
+
+
+def _init_worker(conf, main_section, queue):
+    _worker_state.update(conf=conf, main_section=main_section, queue=queue)
+
+
+def _run_worker(target):
+    _aggregate_issues(
+        _worker_state['conf'], _worker_state['main_section'], target,
+        _worker_state['queue'])
+
+
+def aggregate_issues(conf, main_section, debug, full=False, dry_run=False):
+    """ Return all issues from every target.
+
+    If `full`, targets configured for incremental pulls fetch every issue,
+    unless `dry_run` is set too: their cursors are then left untouched.
+    """
+    log.info("Starting to aggregate remote issues.")
+
+    # Create and call service objects for every target in the config
+    main_config = conf[main_section]
+    targets = main_config.targets
+    conf = _resolve_secrets(conf, main_section)
+    if full and not dry_run:
+        main_config.data.delete(targets, namespace='cursors')
+
+    pool = None
     if debug:
+        queue = multiprocessing.Queue()
         for target in targets:
             _aggregate_issues(conf, main_section, target, queue)
     else:
-        for target in targets:
-            proc = multiprocessing.Process(
-                target=_aggregate_issues,
-                args=(conf, main_section, target, queue)
-            )
-            proc.start()
-
-            # Sleep for 1 second here to try and avoid a race condition where
-            # all N workers start up and ask the gpg-agent process for
-            # information at the same time.  This causes gpg-agent to fumble
-            # and tell some of our workers some incomplete things.
-            time.sleep(1)
-
-    currently_running = len(targets)
-    while currently_running > 0:
-        issue = queue.get(True)
-        try:
-            yield TaskConstructor(issue).get_taskwarrior_record()
-        except AttributeError:
-            if isinstance(issue, tuple):
+        workers = max(1, min(main_config.max_workers or len(targets),
+                             len(targets)))
+        log.info("Spawning %i %s workers." % (
+            workers, main_config.worker_type))
+        if main_config.worker_type == 'asyncio':
+            queue = queue_module.Queue()
+            pool = _EventLoopThread(_aggregate_all_async(
+                conf, main_section, targets, queue, workers))
+            pool.start()
+        elif main_config.worker_type == 'thread':
+            queue = queue_module.Queue()
+            pool = concurrent.futures.ThreadPoolExecutor(workers)
+            futures = [
+                pool.submit(_aggregate_issues, conf, main_section, target,
+                            queue, False)
+                for target in targets]
+        else:
+            queue = multiprocessing.Queue()
+            pool = multiprocessing.Pool(
+                workers, _init_worker, (conf, main_section, queue))
+            pool.map_async(_run_worker, targets, chunksize=1)
+            pool.close()
+
+    finished = False
+    try:
+        currently_running = len(targets)
+        while currently_running > 0:
+            batch = queue.get(True)
+            if isinstance(batch, tuple):
                 currently_running -= 1
-                completion_type, target = issue
+                completion_type, target = batch
                 if completion_type == SERVICE_FINISHED_ERROR:
                     log.error(f"Aborted [{target}] due to critical error.")
                     yield ('SERVICE FAILED', target)
                 continue
-            yield issue
+            for record in batch:
+                if isinstance(record, bytes):
+                    record = pickle.loads(record)
+                yield record
+        finished = True
+    finally:
+        # Stop outstanding workers if our consumer gave up early.
+        if isinstance(pool, concurrent.futures.Executor):
+            if not finished:
+                for future in futures:
+                    future.cancel()
+            pool.shutdown(wait=finished)
+        elif isinstance(pool, _EventLoopThread):
+            if finished:
+                pool.join()
+            else:
+                pool.cancel()
+        elif pool is not None:
+            if not finished:
+                pool.terminate()
+            pool.join()
 
     log.info("Done aggregating remote issues.")
 
@@ -111,43 +478,52 @@ class TaskConstructor:
 
     def __init__(self, issue):
         self.issue = issue
+        self._taskwarrior_record = None
+        self._template_context = None
 
     def get_added_tags(self):
         added_tags = []
         for tag in self.issue.config.add_tags:
-            tag = Template(tag).render(self.get_template_context())
+            tag = compile_template(tag).render(self.get_template_context())
             if tag:
                 added_tags.append(tag)
 
         return added_tags
 
+    def _get_unrefined_record(self):
+        """ The issue's own record, computed once and never modified. """
+        if self._taskwarrior_record is None:
+            record = self.issue.to_taskwarrior()
+            if 'tags' not in record:
+                record = dict(record, tags=[])
+            self._taskwarrior_record = record
+        return self._taskwarrior_record
+
     def get_taskwarrior_record(self, refined=True) -> dict:
-        if not getattr(self, '_taskwarrior_record', None):
-            self._taskwarrior_record = self.issue.to_taskwarrior()
-        record = copy.deepcopy(self._taskwarrior_record)
+        # Refining only replaces top-level values, so a shallow copy keeps
+        # the unrefined record intact; the tag list is copied as it grows.
+        record = dict(self._get_unrefined_record())
         if refined:
             record = self.refine_record(record)
-        if 'tags' not in record:
-            record['tags'] = []
-        if refined:
-            record['tags'].extend(self.get_added_tags())
+            record['tags'] = record['tags'] + self.get_added_tags()
         return record
 
     def get_template_context(self):
-        context = (
-            self.get_taskwarrior_record(refined=False).copy()
-        )
-        context.update(self.issue.extra)
-        context.update({
-            'description': self.issue.get_default_description(),
-        })
-        return context
+        if self._template_context is None:
+            context = dict(self._get_unrefined_record())
+            context.update(self.issue.extra)
+            context.update({
+                'description': self.issue.get_default_description(),
+            })
+            self._template_context = context
+        return self._template_context
 
     def refine_record(self, record):
         for field in Task.FIELDS.keys():
             if field in self.issue.config.templates:
-                template = Template(self.issue.config.templates[field])
+                template = compile_template(self.issue.config.templates[field])
                 record[field] = template.render(self.get_template_context())
             elif field == 'description':
-                record['description'] = self.issue.get_default_description()
+                record['description'] = (
+                    self.get_template_context()['description'])
         return record
@@ -86,8 +86,11 @@ def cli():
 @click.option('--debug', is_flag=True,
               help='Do not use multiprocessing (which breaks pdb).')
 @click.option('--quiet', is_flag=True, help='Set logging level to WARNING.')
+@click.option('--full', is_flag=True,
+              help='Fetch and reconcile every issue, even those unchanged '
+              'since the last pull.')
 @_legacy_cli_deprecation_warning
-def pull(dry_run, flavor, interactive, debug, quiet):
+def pull(dry_run, flavor, interactive, debug, quiet, full):
     """ Pull down tasks from forges and add them to your taskwarrior tasks.
 
     Relies on configuration in bugwarriorrc
@@ -103,10 +106,11 @@ def pull(dry_run, flavor, interactive, debug, quiet):
         lockfile.acquire(timeout=10)
         try:
             # Get all the issues.  This can take a while.
-            issue_generator = aggregate_issues(config, main_section, debug)
+            issue_generator = aggregate_issues(
+                config, main_section, debug, full, dry_run)
 
             # Stuff them in the taskwarrior db as necessary
-            synchronize(issue_generator, config, main_section, dry_run)
+            synchronize(issue_generator, config, main_section, dry_run, full)
         finally:
             lockfile.release()
     except LockTimeout:
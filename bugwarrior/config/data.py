@@ -1,9 +1,15 @@
+import contextlib
 import json
 import os
+import sqlite3
 import subprocess
+import time
 
 from lockfile.pidlockfile import PIDLockFile
 
+# Seconds to wait for another process's write transaction before giving up.
+SQLITE_TIMEOUT = 30
+
 
 def get_data_path(taskrc):
     # We cannot use the taskw module here because it doesn't really support
@@ -27,32 +33,234 @@ def get_data_path(taskrc):
     return os.path.normpath(os.path.expanduser(data_path))
 
 
+class Transaction:
+    """ Reads and writes sharing one SQLite connection.
+
+    Values are stored as JSON.  Top-level keys live in the default namespace
+    (``''``); other namespaces hold bulk data such as per-target caches.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get(self, key, namespace=''):
+        row = self.connection.execute(
+            'SELECT value FROM data WHERE namespace = ? AND key = ?',
+            (namespace, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, namespace=''):
+        self.update_namespace(namespace, {key: value})
+
+    def delete(self, keys, namespace=''):
+        self.connection.executemany(
+            'DELETE FROM data WHERE namespace = ? AND key = ?',
+            [(namespace, key) for key in keys])
+
+    def get_namespace(self, namespace):
+        return {
+            key: json.loads(value) for key, value in self.connection.execute(
+                'SELECT key, value FROM data WHERE namespace = ?',
+                (namespace,))
+        }
+
+    def update_namespace(self, namespace, mapping, replace=False):
+        """ Store every key of `mapping`, first dropping the rest if `replace`.
+        """
+        if replace:
+            self.connection.execute(
+                'DELETE FROM data WHERE namespace = ?', (namespace,))
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO data (namespace, key, value) '
+            'VALUES (?, ?, ?)',
+            [(namespace, key, json.dumps(value))
+             for key, value in mapping.items()])
+
+
 class BugwarriorData:
+    """ Persistent data bugwarrior keeps between runs.
+
+    This is an SQLite database in WAL mode, so worker processes can read it
+    concurrently while another process writes.  The JSON file used by older
+    versions of bugwarrior is migrated into it the first time it is opened.
+    """
+
     def __init__(self, data_path):
-        self.datafile = os.path.join(data_path, 'bugwarrior.data')
+        self.datafile = os.path.join(data_path, 'bugwarrior.sqlite3')
+        self.legacy_datafile = os.path.join(data_path, 'bugwarrior.data')
         self.lockfile = os.path.join(data_path, 'bugwarrior-data.lockfile')
         self.path = data_path
 
+    def _connect(self):
+        # Create the file ourselves so it is never readable by others.
+        try:
+            os.close(os.open(
+                self.datafile, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+        except FileExistsError:
+            pass
+        connection = sqlite3.connect(
+            self.datafile, timeout=SQLITE_TIMEOUT, isolation_level=None)
+        try:
+            # The table is ensured on every connection, so that a first run
+            # interrupted before creating it can't leave the store unusable.
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS data ('
+                'namespace TEXT NOT NULL, '
+                'key TEXT NOT NULL, '
+                'value TEXT NOT NULL, '
+                'PRIMARY KEY (namespace, key)'
+                ') WITHOUT ROWID')
+            if os.path.exists(self.legacy_datafile):
+                self._migrate(connection)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def _migrate(self, connection):
+        """ Import the JSON file of older versions, once. """
+        with PIDLockFile(self.lockfile):
+            transaction = Transaction(connection)
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if not transaction.get('legacy_datafile', 'migrations'):
+                    with open(self.legacy_datafile) as jsondata:
+                        transaction.update_namespace('', json.load(jsondata))
+                    transaction.set('legacy_datafile', True, 'migrations')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+            if os.path.exists(self.legacy_datafile):
+                os.rename(self.legacy_datafile,
+                          self.legacy_datafile + '.migrated')
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Group reads and writes so they are applied atomically. """
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield Transaction(connection)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+
+    @contextlib.contextmanager
+    def _reader(self):
+        connection = self._connect()
+        try:
+            yield Transaction(connection)
+        finally:
+            connection.close()
+
     def get_data(self):
-        with open(self.datafile) as jsondata:
-            return json.load(jsondata)
+        return self.get_namespace('')
+
+    def get(self, key, namespace=''):
+        with self._reader() as reader:
+            return reader.get(key, namespace)
+
+    def set(self, key, value, namespace=''):
+        with self.transaction() as transaction:
+            transaction.set(key, value, namespace)
+
+    def delete(self, keys, namespace=''):
+        with self.transaction() as transaction:
+            transaction.delete(keys, namespace)
+
+    def get_namespace(self, namespace):
+        with self._reader() as reader:
+            return reader.get_namespace(namespace)
+
+    def update_namespace(self, namespace, mapping, replace=False):
+        with self.transaction() as transaction:
+            transaction.update_namespace(namespace, mapping, replace)
+
+
+class ResponseCache:
+    """ HTTP responses kept to revalidate with conditional requests.
+
+    Entries are stored in their own SQLite database next to the bugwarrior
+    data.  They are looked up by a key the caller derives from the request,
+    which must identify the credentials used so that responses are never
+    shared between identities.  Opening the cache evicts entries unused for
+    more than `max_age` seconds, then the least recently used ones until the
+    bodies fit in `max_size` bytes.
+    """
+
+    def __init__(self, data_path, max_size, max_age):
+        self.cachefile = os.path.join(data_path, 'bugwarrior-http.sqlite3')
+        self.max_size = max_size
+        self.max_age = max_age
+        self._initialize()
+
+    def _connect(self):
+        return sqlite3.connect(
+            self.cachefile, timeout=SQLITE_TIMEOUT, isolation_level=None)
+
+    def _initialize(self):
+        if not os.path.exists(self.cachefile):
+            os.close(os.open(self.cachefile, os.O_CREAT | os.O_WRONLY, 0o600))
+        connection = self._connect()
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, '
+                'status INTEGER NOT NULL, '
+                'headers TEXT NOT NULL, '
+                'body BLOB NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'used REAL NOT NULL'
+                ')')
+            self._evict(connection)
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+
+    def _evict(self, connection):
+        connection.execute(
+            'DELETE FROM responses WHERE used < ?',
+            (time.time() - self.max_age,))
+        total = 0
+        expired = []
+        for key, size in connection.execute(
+                'SELECT key, size FROM responses ORDER BY used DESC'):
+            total += size
+            if total > self.max_size:
+                expired.append((key,))
+        connection.executemany('DELETE FROM responses WHERE key = ?', expired)
 
     def get(self, key):
+        """ Return the (status, headers, body) stored under `key`, if any. """
+        connection = self._connect()
         try:
-            return self.get_data()[key]
-        except OSError:  # File does not exist.
+            row = connection.execute(
+                'SELECT status, headers, body FROM responses WHERE key = ?',
+                (key,)).fetchone()
+        finally:
+            connection.close()
+        if row is None:
             return None
+        status, headers, body = row
+        return status, json.loads(headers), body
 
-    def set(self, key, value):
-        with PIDLockFile(self.lockfile):
-            try:
-                data = self.get_data()
-            except OSError:  # File does not exist.
-                with open(self.datafile, 'w') as jsondata:
-                    json.dump({key: value}, jsondata)
-            else:
-                with open(self.datafile, 'w') as jsondata:
-                    data[key] = value
-                    json.dump(data, jsondata)
-
-            os.chmod(self.datafile, 0o600)
+    def set(self, key, status, headers, body):
+        connection = self._connect()
+        try:
+            connection.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, status, headers, body, size, used) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, status, json.dumps(headers), body, len(body),
+                 time.time()))
+        finally:
+            connection.close()
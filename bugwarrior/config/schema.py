@@ -135,6 +135,13 @@ class MainSectionConfig(pydantic.v1.BaseModel):
     replace_tags: bool = False
     static_tags: ConfigList = ConfigList([])
     static_fields: ConfigList = ConfigList(['priority'])
+    max_workers: typing.Optional[pydantic.v1.PositiveInt] = None
+    worker_type: typing_extensions.Literal[
+        'process', 'thread', 'asyncio'] = 'process'
+    max_requests_per_host: pydantic.v1.PositiveInt = 4
+    http_cache: bool = True
+    http_cache_max_size: pydantic.v1.PositiveInt = 100
+    http_cache_max_age: pydantic.v1.PositiveInt = 30
 
     log_level: typing_extensions.Literal[
         ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL', 'DISABLED')
@@ -303,6 +310,8 @@ class ServiceConfig(_ServiceConfig):  # type: ignore  # (dynamic base class)
     default_priority: typing_extensions.Literal['', 'L', 'M', 'H'] = 'M'
     add_tags: ConfigList = ConfigList([])
     description_template: typing.Optional[str] = None
+    incremental: bool = False
+    full_pull_interval: pydantic.v1.PositiveInt = 24
 
     @pydantic.v1.root_validator
     def compute_templates(cls, values):
@@ -1,9 +1,15 @@
+import datetime
+import hashlib
 import json
 import re
 import subprocess
+import tempfile
+import uuid
 
 from taskw import TaskWarriorShellout
 from taskw.exceptions import TaskwarriorError
+from taskw.fields import DateField
+from taskw.task import Task
 
 from bugwarrior.collect import get_service
 from bugwarrior.notifications import send_notification
@@ -11,6 +17,9 @@ from bugwarrior.notifications import send_notification
 import logging
 log = logging.getLogger(__name__)
 
+# Number of tasks written per taskwarrior invocation.
+BATCH_SIZE = 500
+
 
 class NotFound(Exception):
     pass
@@ -47,23 +56,101 @@ def hamdist(str1, str2):
     return diffs
 
 
-def get_managed_task_uuids(tw, key_list):
+def get_managed_task_uuids(index, key_list):
     expected_task_ids = set()
-    for keys in key_list.values():
-        tasks = tw.filter_tasks({
-            'and': [('%s.any' % key, None) for key in keys],
-            'or': [
-                ('status', 'pending'),
-                ('status', 'waiting'),
-            ],
-        })
+    for service in key_list:
         expected_task_ids = expected_task_ids | set([
-            task['uuid'] for task in tasks
+            task['uuid'] for task in index.get_managed_tasks(service)
         ])
 
     return expected_task_ids
 
 
+class TaskIndex:
+    """ An in-memory index of the local tasks bugwarrior may have created.
+
+    A single ``task export`` fetches every pending, waiting and completed task
+    carrying any of the unique keys in ``key_list``.  Those tasks are then
+    indexed by service and by the tuple of their unique key values, so that
+    incoming issues can be matched without a taskwarrior round trip each.
+
+    :params:
+    * `tw`: An instance of `taskw.TaskWarriorShellout`
+    * `key_list`: A dictionary mapping service names to their unique keys,
+      as returned by `build_key_list`.
+    """
+
+    def __init__(self, tw, key_list):
+        self.key_list = key_list
+        self.udas = tw.config.get_udas()
+        self.tasks = {}  # uuid -> task
+        self.statuses = {}  # uuid -> status at export time
+        self.keys = {}  # (service, key values) -> [task, ...]
+
+        all_keys = sorted(set(
+            key for keys in key_list.values() for key in keys))
+        if not all_keys:
+            return
+
+        tasks = tw.filter_tasks([
+            ('or', [('%s.any' % key, None) for key in all_keys]),
+            ('or', [
+                ('status', 'pending'),
+                ('status', 'waiting'),
+                ('status', 'completed'),
+            ]),
+        ])
+        for task in tasks:
+            self.add(task)
+
+    def normalize(self, key, value):
+        """ Coerce a key value the way taskwarrior compares it with ``==``.
+
+        Values on exported tasks have already been marshalled according to
+        their UDA type, so incoming issue values are run through the same
+        field converter (e.g. ``'5'`` and ``5`` for a numeric UDA).
+        """
+        converter = self.udas.get(key)
+        if converter is None:
+            return value
+        return converter.deserialize(value)
+
+    def add(self, task):
+        self.tasks[str(task['uuid'])] = task
+        self.statuses[str(task['uuid'])] = task['status']
+        for service, keys in self.key_list.items():
+            if all(task.get(key) not in (None, '') for key in keys):
+                self.keys.setdefault(
+                    (service, tuple(task[key] for key in keys)), []
+                ).append(task)
+
+    def filter(self, service, issue):
+        """ Return the indexed tasks of `service` matching `issue`'s keys. """
+        values = tuple(
+            self.normalize(key, issue[key])
+            for key in self.key_list[service])
+        return self.keys.get((service, values), [])
+
+    def get_task(self, uuid):
+        return self.tasks[str(uuid)]
+
+    def get_modified(self, uuid):
+        """ Return the serialized modification time of an indexed task. """
+        task = self.tasks.get(str(uuid))
+        if task is None:
+            return None
+        return DateField().serialize(task.get('modified'))
+
+    def get_managed_tasks(self, service):
+        """ Return the indexed pending and waiting tasks of `service`. """
+        keys = self.key_list[service]
+        return [
+            task for uuid, task in self.tasks.items()
+            if self.statuses[uuid] in ('pending', 'waiting')
+            and all(task.get(key) not in (None, '') for key in keys)
+        ]
+
+
 def make_unique_identifier(keys: dict, issue: dict) -> str:
     """ For a given issue, make an identifier from its unique keys.
 
@@ -77,7 +164,26 @@ def make_unique_identifier(keys: dict, issue: dict) -> str:
     raise RuntimeError("Could not determine unique identifier for %s" % issue)
 
 
-def find_taskwarrior_uuid(tw, keys, issue):
+def get_issue_fingerprint(issue, main_config):
+    """ Return a stable hash of a refined issue record.
+
+    The options governing how an issue is merged into its task are hashed
+    along with it, so that changing them invalidates every fingerprint.
+    """
+    options = {
+        option: getattr(main_config, option) for option in [
+            'merge_annotations',
+            'merge_tags',
+            'replace_tags',
+            'static_tags',
+            'static_fields',
+        ]
+    }
+    serialized = json.dumps([issue, options], sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+def find_taskwarrior_uuid(index, keys, issue):
     """ For a given issue issue, find its local taskwarrior UUID.
 
     Assembles a list of task IDs existing in taskwarrior
@@ -85,7 +191,7 @@ def find_taskwarrior_uuid(tw, keys, issue):
     set of supplied unique identifiers (`keys`).
 
     :params:
-    * `tw`: An instance of `taskw.TaskWarriorShellout`
+    * `index`: A `TaskIndex` of the local tasks.
     * `keys`: A list of lists of keys to use for uniquely identifying
       an issue.  To clarify the "list of lists" behavior, assume that
       there are two services, one having a single primary key field
@@ -115,14 +221,7 @@ def find_taskwarrior_uuid(tw, keys, issue):
 
     for service, key_list in keys.items():
         if any([key in issue for key in key_list]):
-            results = tw.filter_tasks({
-                'and': [("%s.is" % key, issue[key]) for key in key_list],
-                'or': [
-                    ('status', 'pending'),
-                    ('status', 'waiting'),
-                    ('status', 'completed')
-                ],
-            })
+            results = index.filter(service, issue)
             new_possibilities = set([task['uuid'] for task in results])
             # Previous versions of bugwarrior did not allow for reopening
             # completed tasks, so there could be multiple completed tasks
@@ -242,6 +341,214 @@ def merge_left(field, local_task, remote_issue, hamming=False):
             new_count, field, len(local_task[field]),))
 
 
+def encode_annotations(annotations, now):
+    """ Serialize annotations as ``task import`` JSON objects.
+
+    Taskwarrior keys annotations on their entry date, so annotations without
+    one (i.e. those merged in from upstream) are each given a free second at
+    or after `now` to keep them from overwriting each other.
+    """
+    taken = set(
+        annotation.entry for annotation in annotations
+        if getattr(annotation, 'entry', None))
+    next_entry = now
+    encoded = []
+    for annotation in annotations:
+        entry = getattr(annotation, 'entry', None)
+        if not entry:
+            while next_entry in taken:
+                next_entry += datetime.timedelta(seconds=1)
+            entry = next_entry
+            taken.add(entry)
+        encoded.append({
+            'entry': DateField().serialize(entry),
+            'description': str(annotation),
+        })
+    return encoded
+
+
+def encode_import_record(task, now):
+    """ Serialize a task or issue as a ``task import`` JSON record.
+
+    Empty values are left out, which removes them from existing tasks since
+    taskwarrior replaces a task wholesale when importing its uuid.
+    """
+    record = {}
+    for key, value in task.items():
+        if key in ('id', 'urgency'):
+            continue  # Read-only and recomputed by taskwarrior.
+        if key == 'annotations':
+            value = encode_annotations(value, now)
+        elif key == 'depends':
+            value = ','.join(str(dependency) for dependency in value)
+        elif isinstance(value, datetime.date):
+            value = DateField().serialize(value)
+        elif isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, list):
+            value = list(value)
+
+        if value is None or value == '' or value == []:
+            continue
+        record[key] = value
+    return record
+
+
+def build_import_record(issue, now):
+    """ Serialize a new task as a ``task import`` JSON record.
+
+    The uuid is assigned here rather than by taskwarrior so that the caller
+    knows it without reading the task back, and issues arriving already
+    closed are created as completed instead of being completed afterwards.
+    """
+    record = {
+        'uuid': str(uuid.uuid4()),
+        'status': 'pending',
+        'entry': DateField().serialize(now),
+    }
+    record.update(encode_import_record(issue, now))
+    record['description'] = record['description'].strip()
+
+    if record.get('end'):
+        record['status'] = 'completed'
+    return record
+
+
+def task_import(tw, records):
+    """ Write a list of JSON task records with a single ``task import``. """
+    with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', encoding='utf-8') as import_file:
+        json.dump(records, import_file, default=str)
+        import_file.flush()
+        tw._execute('import', import_file.name)
+
+
+def import_tasks(tw, records, action='add'):
+    """ Import records in batches, returning the uuids written.
+
+    If a batch is rejected it is retried record by record so that each
+    failing task is reported on its own.  This is safe because taskwarrior
+    imports are keyed on the uuid.
+    """
+    imported = []
+    for start in range(0, len(records), BATCH_SIZE):
+        batch = records[start:start + BATCH_SIZE]
+        try:
+            task_import(tw, batch)
+        except TaskwarriorError:
+            for record in batch:
+                try:
+                    task_import(tw, [record])
+                except TaskwarriorError as e:
+                    log.exception("Unable to %s task: %s" % (action, e.stderr))
+                else:
+                    imported.append(record['uuid'])
+        else:
+            imported.extend(record['uuid'] for record in batch)
+    return imported
+
+
+def complete_tasks(tw, uuids):
+    """ Complete tasks in batches of a single multi-uuid ``task done``.
+
+    If a batch fails, the tasks it did not complete are retried one by one
+    so that each failing task is reported on its own.
+    """
+    for start in range(0, len(uuids), BATCH_SIZE):
+        batch = uuids[start:start + BATCH_SIZE]
+        try:
+            # bulk=0 disables the confirmation prompt for bulk changes.
+            tw._execute('rc.bulk=0', *batch, 'done')
+        except TaskwarriorError:
+            for task_uuid in batch:
+                stdout, _ = tw._execute('_get', task_uuid + '.status')
+                if stdout.strip() == 'completed':
+                    continue
+                try:
+                    tw._execute(task_uuid, 'done')
+                except TaskwarriorError as e:
+                    log.exception("Unable to close task: %s" % e.stderr)
+
+
+class TaskWriter:
+    """ Queue new and changed tasks and write them out in batches.
+
+    Batches are flushed as soon as they fill up, so tasks are written while
+    the remaining issues are still being collected.  Queued tasks are keyed
+    by uuid: a task changed again while queued is written once, and one
+    changed again after its batch was flushed is simply imported again.
+    """
+
+    def __init__(self, tw, dry_run=False, on_created=None):
+        self.tw = tw
+        self.dry_run = dry_run
+        self.on_created = on_created
+        self.now = datetime.datetime.now(
+            datetime.timezone.utc).replace(microsecond=0)
+        self.new = {}  # uuid -> import record
+        self.changed = {}  # uuid -> task
+        self.written = set()  # uuids of the new tasks written so far
+        self.created = {}  # uuid -> issue, until its task is written
+
+    def add(self, record, issue=None):
+        """ Queue a new task, passing `issue` to `on_created` once written. """
+        self.new[record['uuid']] = record
+        if issue is not None:
+            self.created[record['uuid']] = issue
+        self.maybe_flush()
+
+    def modify(self, task):
+        self.changed[str(task['uuid'])] = task
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if len(self.new) + len(self.changed) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        notreally = ' (not really)' if self.dry_run else ''
+        updated_records = []
+        for task in self.changed.values():
+            changes = '; '.join([
+                '{field}: {f} -> {t}'.format(
+                    field=field,
+                    f=repr(ch[0]),
+                    t=repr(ch[1])
+                )
+                for field, ch in task.get_changes().items()
+            ])
+            log.info(
+                "Updating task %s, %s; %s%s",
+                str(task['uuid']),
+                task['description'],
+                changes,
+                notreally
+            )
+            updated_records.append(encode_import_record(task, self.now))
+
+        new_records = list(self.new.values())
+        self.new, self.changed = {}, {}
+        if self.dry_run:
+            return
+
+        written = import_tasks(self.tw, new_records)
+        self.written.update(written)
+        for task_uuid in written:
+            issue = self.created.pop(task_uuid, None)
+            if issue is not None and self.on_created:
+                self.on_created(issue)
+        import_tasks(self.tw, updated_records, action='modify')
+
+
+def merge_tags(main_config, task, issue):
+    """ Merge (or replace) the tags of `issue` into `task` as configured. """
+    if main_config.merge_tags:
+        if main_config.replace_tags:
+            replace_left('tags', task, issue, main_config.static_tags)
+        else:
+            merge_left('tags', task, issue)
+
+
 def run_hooks(pre_import):
     for hook in pre_import:
         exit_code = subprocess.call(hook, shell=True)
@@ -251,7 +558,13 @@ def run_hooks(pre_import):
             raise RuntimeError(msg)
 
 
-def synchronize(issue_generator, conf, main_section, dry_run=False):
+def synchronize(issue_generator, conf, main_section, dry_run=False,
+                full=False):
+    """ Write the incoming issues to taskwarrior.
+
+    Unless `full` is set, issues whose fingerprint and task modification
+    time are the same as after the last pull are not reconciled again.
+    """
     main_config = conf[main_section]
 
     targets = main_config.targets.copy()
@@ -276,33 +589,55 @@ def synchronize(issue_generator, conf, main_section, dry_run=False):
         config_overrides=uda_list,
         marshal=True,
     )
+    index = TaskIndex(tw, key_list)
 
     issue_updates = {
         'new': [],
-        'existing': [],
-        'changed': [],
+        'changed': set(),
         'closed': [],
     }
 
-    issue_map = {}  # unique identifier -> issue
+    notreally = ' (not really)' if dry_run else ''
+
+    def notify_created(issue):
+        send_notification(issue, 'Created', conf['notifications'])
+
+    writer = TaskWriter(
+        tw, dry_run, on_created=notify_created if notify else None)
+    issue_map = {}  # unique identifier -> (merged tags, task or new record)
+    seen_uuids = set()
+    # unique identifier -> [fingerprint, uuid, task modification time]
+    fingerprint_namespace = 'fingerprints.' + main_section
+    old_fingerprints = main_config.data.get_namespace(fingerprint_namespace)
+    fingerprints = {}
     for issue in issue_generator:
         if isinstance(issue, tuple) and issue[0] == 'SERVICE FAILED':
             targets.remove(issue[1])
             continue
 
-        # De-duplicate issues coming in
+        # De-duplicate issues coming in.  Issues are matched and queued for
+        # writing as they arrive, so the tags of a duplicate are merged into
+        # whatever was built from its first copy, which is then re-queued.
         unique_identifier = make_unique_identifier(key_list, issue)
         if unique_identifier in issue_map:
             log.debug(
                 f"Merging tags and skipping. Seen {unique_identifier} of {issue}")
             # Merge and deduplicate tags.
-            issue_map[unique_identifier]['tags'] += issue['tags']
-            issue_map[unique_identifier]['tags'] = list(set(issue_map[unique_identifier]['tags']))
-        else:
-            issue_map[unique_identifier] = issue
+            tags, task = issue_map[unique_identifier]
+            tags[:] = list(set(tags + issue['tags']))
+            if isinstance(task, Task):
+                merge_tags(main_config, task, {'tags': tags})
+                if task.get_changes(keep=True):
+                    issue_updates['changed'].add(task['uuid'])
+                    writer.modify(task)
+                    fingerprints[unique_identifier][2] = None
+            elif task is not None:
+                task['tags'] = tags
+                writer.add(task)
+            continue
+
+        issue_map[unique_identifier] = (list(issue.get('tags', [])), None)
 
-    seen_uuids = set()
-    for issue in issue_map.values():
         # We received this issue from The Internet, but we're not sure what
         # kind of encoding the service providers may have handed us. Let's try
         # and decode all byte strings from UTF8 off the bat.  If we encounter
@@ -319,17 +654,46 @@ def synchronize(issue_generator, conf, main_section, dry_run=False):
         if issue['priority'] == '':
             issue['priority'] = None
 
+        # Skip issues which have not changed upstream, and whose task has not
+        # changed locally, since the last pull.  The modification time is only
+        # known once a task is seen unchanged, so written tasks are
+        # reconciled one more time before they can be skipped.
+        fingerprint = get_issue_fingerprint(issue, main_config)
+        if not full and unique_identifier in old_fingerprints:
+            old_hash, old_uuid, old_modified = (
+                old_fingerprints[unique_identifier])
+            if old_hash == fingerprint and old_modified and (
+                    index.get_modified(old_uuid) == old_modified):
+                task = index.get_task(old_uuid)
+                seen_uuids.add(task['uuid'])
+                issue_map[unique_identifier] = (
+                    issue_map[unique_identifier][0], task)
+                fingerprints[unique_identifier] = [
+                    old_hash, old_uuid, old_modified]
+                continue
+
         try:
-            existing_taskwarrior_uuid = find_taskwarrior_uuid(tw, key_list, issue)
+            existing_taskwarrior_uuid = find_taskwarrior_uuid(
+                index, key_list, issue)
         except MultipleMatches as e:
             log.exception("Multiple matches: %s", str(e))
         except NotFound:  # Create new task
+            log.info("Adding task %s%s", issue['description'], notreally)
             issue_updates['new'].append(issue)
+
+            record = build_import_record(issue, writer.now)
+            issue_map[unique_identifier] = (
+                issue_map[unique_identifier][0], record)
+            fingerprints[unique_identifier] = [
+                fingerprint, record['uuid'], None]
+            writer.add(record, issue)
         else:  # Update existing task.
             seen_uuids.add(existing_taskwarrior_uuid)
-            _, task = tw.get_task(uuid=existing_taskwarrior_uuid)
+            task = index.get_task(existing_taskwarrior_uuid)
+            issue_map[unique_identifier] = (
+                issue_map[unique_identifier][0], task)
 
-            if task['status'] == 'completed':
+            if task['status'] == 'completed' and not issue.get('end'):
                 # Reopen task
                 task['status'] = 'pending'
                 task['end'] = None
@@ -344,78 +708,49 @@ def synchronize(issue_generator, conf, main_section, dry_run=False):
             if main_config.merge_annotations:
                 merge_left('annotations', task, issue, hamming=True)
 
-            if main_config.merge_tags:
-                if main_config.replace_tags:
-                    replace_left('tags', task, issue, main_config.static_tags)
-                else:
-                    merge_left('tags', task, issue)
+            merge_tags(main_config, task, issue)
 
             issue.pop('annotations', None)
             issue.pop('tags', None)
 
+            # Store values as taskwarrior would give them back, so that an
+            # issue which did not change leaves its task unchanged.
+            for key, value in issue.items():
+                issue[key] = task._deserialize(
+                    key, task._serialize(key, value, task._fields),
+                    task._fields)
+
             task.update(issue)
 
+            if issue.get('end'):
+                # Issues closed upstream are completed locally.
+                task['status'] = 'completed'
+
+            fingerprints[unique_identifier] = [
+                fingerprint,
+                str(existing_taskwarrior_uuid),
+                index.get_modified(existing_taskwarrior_uuid),
+            ]
             if task.get_changes(keep=True):
-                issue_updates['changed'].append(task)
-            else:
-                issue_updates['existing'].append(task)
+                issue_updates['changed'].add(existing_taskwarrior_uuid)
+                writer.modify(task)
+                fingerprints[unique_identifier][2] = None
 
-    notreally = ' (not really)' if dry_run else ''
-    # Add new issues
+    writer.flush()
+    seen_uuids.update(writer.written)
     log.info("Adding %i tasks", len(issue_updates['new']))
-    for issue in issue_updates['new']:
-        log.info("Adding task %s%s", issue['description'], notreally)
-
-        if dry_run:
-            continue
-        if notify:
-            send_notification(issue, 'Created', conf['notifications'])
-
-        try:
-            new_task = tw.task_add(**issue)
-            if 'end' in issue and issue['end']:
-                tw.task_done(uuid=new_task['uuid'])
-        except TaskwarriorError as e:
-            log.exception("Unable to add task: %s" % e.stderr)
-        else:
-            seen_uuids.add(new_task['uuid'])
-
     log.info("Updating %i tasks", len(issue_updates['changed']))
-    for issue in issue_updates['changed']:
-        changes = '; '.join([
-            '{field}: {f} -> {t}'.format(
-                field=field,
-                f=repr(ch[0]),
-                t=repr(ch[1])
-            )
-            for field, ch in issue.get_changes(keep=True).items()
-        ])
-        log.info(
-            "Updating task %s, %s; %s%s",
-            str(issue['uuid']),
-            issue['description'],
-            changes,
-            notreally
-        )
-        if dry_run:
-            continue
-
-        try:
-            _, updated_task = tw.task_update(issue)
-            if 'end' in issue and issue['end']:
-                tw.task_done(uuid=updated_task['uuid'])
-        except TaskwarriorError as e:
-            log.exception("Unable to modify task: %s" % e.stderr)
 
     log.debug(f'Closing tasks for succeeding services: {targets}.')
     succeeded_service_task_uuids = get_managed_task_uuids(
-        tw,
+        index,
         build_key_list(
             set([conf[target].service for target in targets])))
     issue_updates['closed'] = succeeded_service_task_uuids - seen_uuids
     log.info("Closing %i tasks", len(issue_updates['closed']))
+    closed_uuids = []
     for issue in issue_updates['closed']:
-        _, task_info = tw.get_task(uuid=issue)
+        task_info = index.get_task(issue)
         log.info(
             "Completing task %s %s%s",
             issue,
@@ -428,10 +763,13 @@ def synchronize(issue_generator, conf, main_section, dry_run=False):
         if notify:
             send_notification(task_info, 'Completed', conf['notifications'])
 
-        try:
-            tw.task_done(uuid=issue)
-        except TaskwarriorError as e:
-            log.exception("Unable to close task: %s" % e.stderr)
+        closed_uuids.append(issue)
+
+    complete_tasks(tw, closed_uuids)
+
+    if not dry_run:
+        main_config.data.update_namespace(
+            fingerprint_namespace, fingerprints, replace=True)
 
     # Send notifications
     if notify:
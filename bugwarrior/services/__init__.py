@@ -3,4 +3,4 @@ Service API
 
 NOTE: This is a public API and should not be casually modified.
 """
-from .base import Service, Issue, Client  # noqa: F401
+from .base import Service, Issue, Client, AsyncClient  # noqa: F401
@@ -1,7 +1,6 @@
 import itertools
 import time
 
-import requests
 import typing_extensions
 
 from bugwarrior.services import Service, Issue, Client
@@ -39,12 +38,14 @@ class ActiveCollab2Config(config.ServiceConfig):
 
 
 class ActiveCollab2Client(Client):
-    def __init__(self, url, key, user_id, projects, target):
+    def __init__(self, url, key, user_id, projects, target,
+                 cache=None):
         self.url = url
         self.key = key
         self.user_id = user_id
         self.projects = projects
         self.target = target
+        self.session = self.get_session(cache=cache)
 
     def get_task_dict(self, project, key, task):
         assigned_task = {
@@ -101,7 +102,7 @@ class ActiveCollab2Client(Client):
             'path_info': uri,
             'format': 'json'}
 
-        return self.json_response(requests.get(url, params=params))
+        return self.json_response(self.session.get(url, params=params))
 
 
 class ActiveCollab2Issue(Issue):
@@ -202,7 +203,8 @@ class ActiveCollab2Service(Service):
                                           self.config.key,
                                           self.config.user_id,
                                           self.config.projects,
-                                          self.config.target)
+                                          self.config.target,
+                                          self.get_response_cache())
 
     def issues(self):
         # Loop through each project
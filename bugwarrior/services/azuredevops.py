@@ -4,7 +4,6 @@ import re
 import sys
 from urllib.parse import quote
 
-import requests
 import typing_extensions
 
 from bugwarrior import config
@@ -52,7 +51,7 @@ def format_item(item):
 
 
 class AzureDevopsClient(Client):
-    def __init__(self, pat, org, project, host):
+    def __init__(self, pat, org, project, host, cache=None):
         if pat[0] != ":":
             pat = f":{pat}"
         self.pat = base64.b64encode(pat.encode("ascii")).decode("ascii")
@@ -60,7 +59,7 @@ class AzureDevopsClient(Client):
         self.project = project
         self.host = host
         self.base_url = f"https://{host}/{org}/{project}/_apis/wit"
-        self.session = requests.Session()
+        self.session = self.get_session(cache=cache)
         self.session.headers = {
             "authorization": f"Basic {self.pat}",
             "accept": "application/json",
@@ -189,7 +188,8 @@ class AzureDevopsService(Service):
             pat=self.get_password('PAT'),
             project=self.config.project,
             org=self.config.organization,
-            host=self.config.host
+            host=self.config.host,
+            cache=self.get_response_cache(),
         )
 
     def get_query(self):
@@ -1,15 +1,24 @@
 import abc
+import asyncio
+import email.utils
+import functools
+import hashlib
 import os
 import re
+import threading
+import time
 
 from dateutil.parser import parse as parse_date
 from dateutil.tz import tzlocal
 import dogpile.cache
-from jinja2 import Template
 import pytz
 import requests
+import requests.structures
+import requests.utils
 
+from bugwarrior.collect import compile_template, host_limiter
 from bugwarrior.config import schema, secrets
+from bugwarrior.config.data import ResponseCache
 
 import logging
 log = logging.getLogger(__name__)
@@ -40,7 +49,7 @@ class URLShortener:
         if not url:
             return ''
         base = 'https://da.gd/s'
-        return requests.get(base, params=dict(url=url)).text.strip()
+        return Session().get(base, params=dict(url=url)).text.strip()
 
 
 def get_processed_url(main_config: schema.MainSectionConfig, url: str):
@@ -65,6 +74,10 @@ class Service(abc.ABC):
     # Which class defines this service's configuration options?
     CONFIG_SCHEMA = None
 
+    # Comments of the last pull, loaded by get_cached_comments().
+    _cached_comments = None
+    _comments_lock = threading.Lock()
+
     def __init__(self, config, main_config):
         self.config = config
         self.main_config = main_config
@@ -80,6 +93,47 @@ class Service(abc.ABC):
                 interactive=self.main_config.interactive)
         return password
 
+    def get_response_cache(self):
+        """ Return a :class:`ResponseCache` for :meth:`Client.get_session`.
+
+        This is None if the ``http_cache`` option is disabled.
+        """
+        if not self.main_config.http_cache:
+            return None
+        return ResponseCache(
+            self.main_config.data.path,
+            max_size=self.main_config.http_cache_max_size * 2 ** 20,
+            max_age=self.main_config.http_cache_max_age * 24 * 60 * 60)
+
+    def get_cached_comments(self, key, signal, fetch):
+        """ Return the comments of issue `key`, as (author, body) pairs.
+
+        Comments are kept from one pull to the next along with `signal`, a
+        JSON value which changes whenever they may have, such as the issue's
+        comment count and update time.  `fetch` returns the comments and is
+        only called when the signal changed, or always if it is None.
+        """
+        with self._comments_lock:
+            if self._cached_comments is None:
+                self._cached_comments = self.main_config.data.get_namespace(
+                    'comments.' + self.config.target)
+                self._used_comments = {}
+        cached = self._cached_comments.get(key)
+        if signal is not None and cached is not None and (
+                cached['signal'] == signal):
+            comments = cached['comments']
+        else:
+            comments = [[author, body] for author, body in fetch()]
+        self._used_comments[key] = {'signal': signal, 'comments': comments}
+        return comments
+
+    def save_cached_comments(self):
+        """ Keep the comments used by this pull for the next one. """
+        if self._cached_comments is not None:
+            self.main_config.data.update_namespace(
+                'comments.' + self.config.target, self._used_comments,
+                replace=True)
+
     def get_issue_for_record(self, record, extra=None):
         return self.ISSUE_CLASS(
             record, self.config, self.main_config, extra=extra)
@@ -110,6 +164,10 @@ class Service(abc.ABC):
     def issues(self):
         """ Returns a list of Issue instances representing issues from a remote service.
 
+        This may also be an asynchronous generator (``async def issues``),
+        typically awaiting an :class:`AsyncClient`, in which case its
+        requests can run concurrently with those of other targets.
+
         Each item in the list should be a dict that looks something like this:
 
             {
@@ -133,6 +191,30 @@ class Service(abc.ABC):
         """
         raise NotImplementedError()
 
+    def issues_updated_since(self, since):
+        """ Yield (key, issue) pairs for issues updated since `since`.
+
+        Services implement this to support the ``incremental`` option.  Keys
+        are strings identifying each issue from one pull to the next.  When
+        `since` is None every issue is yielded, just as by :meth:`issues`;
+        otherwise `since` is an aware datetime in UTC and only the issues
+        updated after it are.  An issue which was updated but no longer belongs to
+        the target, because it was closed say, may be yielded as None so
+        that its task is closed right away rather than by the next full
+        pull.
+        """
+        raise NotImplementedError()
+
+    def get_snapshot(self, issue):
+        """ Return JSON-serializable data to rebuild `issue` from. """
+        return [issue.record, issue.extra]
+
+    def issue_from_snapshot(self, snapshot):
+        """ Rebuild an issue from the data returned by :meth:`get_snapshot`.
+        """
+        record, extra = snapshot
+        return self.get_issue_for_record(record, extra)
+
     @staticmethod
     def get_keyring_service(service_config):
         """ Given the keyring service name for this service. """
@@ -190,7 +272,8 @@ class Issue(abc.ABC):
             return tags
 
         context = self.record.copy()
-        label_template = Template(getattr(self.config, template_option))
+        label_template = compile_template(
+            getattr(self.config, template_option))
 
         for label in labels:
             normalized_label = re.sub(r'[^a-zA-Z0-9]', '_', label)
@@ -248,8 +331,210 @@ class Issue(abc.ABC):
         )
 
 
+def _header_number(response, *names):
+    for name in names:
+        try:
+            return float(response.headers[name])
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def _retry_after(response):
+    """ Seconds the server asked us to wait in its Retry-After header. """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+def _rate_limit_remaining(response):
+    # GitHub uses the X- prefixed headers, GitLab the unprefixed ones.
+    return _header_number(
+        response, 'X-RateLimit-Remaining', 'RateLimit-Remaining')
+
+
+def _rate_limit_reset(response):
+    """ Seconds until the rate limit window of `response` resets. """
+    reset = _header_number(response, 'X-RateLimit-Reset', 'RateLimit-Reset')
+    if reset is None:
+        return None
+    if reset > 1e9:  # An epoch timestamp rather than a delay.
+        reset -= time.time()
+    return max(0.0, reset)
+
+
+class Session(requests.Session):
+    """ HTTP session with timeouts, retries and rate limit handling.
+
+    Connections are kept alive and reused for every request made through the
+    session.  Requests time out after ``timeout`` (connect, read) seconds.
+    Responses with a 5xx or 429 status, or a 403 that exhausted the rate
+    limit, are retried up to ``retries`` times, waiting for as long as the
+    server asks to or else backing off exponentially from ``backoff``
+    seconds; connection errors are likewise retried for idempotent requests.
+    When a response reports that the rate limit is exhausted, the session
+    waits for it to reset before returning.  No wait exceeds ``max_wait``
+    seconds; a response which would need one is returned as is.
+
+    Given a :class:`ResponseCache`, GET responses carrying an ``ETag`` or
+    ``Last-Modified`` header are stored, and later requests for the same URL
+    with the same headers are made conditional.  When the server answers 304
+    Not Modified, the stored response is returned in its place.
+    """
+    timeout = (10, 60)
+    retries = 5
+    backoff = 1
+    max_wait = 300
+
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+    # Headers describing the stored body rather than the response to return.
+    UNCACHED_HEADERS = frozenset([
+        'content-encoding', 'content-length', 'transfer-encoding'])
+
+    def __init__(self, cache=None):
+        super().__init__()
+        self.cache = cache
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if (attempt >= self.retries
+                        or method.upper() not in self.IDEMPOTENT_METHODS):
+                    raise
+                delay = self.backoff * 2 ** attempt
+                log.warning("%s %s failed (%s); retrying in %is.",
+                            method, url, e, delay)
+            else:
+                delay = self.get_retry_delay(response, attempt)
+                if delay is None:
+                    self.wait_for_rate_limit(response)
+                    return response
+                log.warning("%s %s returned %i; retrying in %is.",
+                            method, url, response.status_code, delay)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def send(self, request, **kwargs):
+        if (self.cache is None or request.method != 'GET'
+                or kwargs.get('stream')):
+            return super().send(request, **kwargs)
+
+        key = self.get_cache_key(request)
+        cached = self.cache.get(key)
+        if cached is not None:
+            status, headers, body = cached
+            headers = requests.structures.CaseInsensitiveDict(headers)
+            if 'ETag' in headers:
+                request.headers['If-None-Match'] = headers['ETag']
+            if 'Last-Modified' in headers:
+                request.headers['If-Modified-Since'] = headers['Last-Modified']
+
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            # A 304 carries fresh values of the headers it includes.
+            headers.update(response.headers)
+            response.close()
+            response = self.build_cached_response(
+                request, status, headers, body)
+        elif response.status_code != 200 or not (
+                'ETag' in response.headers
+                or 'Last-Modified' in response.headers):
+            return response
+
+        body = response.content
+        for name in self.UNCACHED_HEADERS:
+            response.headers.pop(name, None)
+        self.cache.set(
+            key, response.status_code, dict(response.headers), body)
+        return response
+
+    @staticmethod
+    def get_cache_key(request):
+        """ Identify `request` by its URL and headers, credentials included.
+
+        Only a digest is kept, so the cache holds no credentials.
+        """
+        digest = hashlib.sha256(request.url.encode('utf-8'))
+        for name, value in sorted(request.headers.items()):
+            if name.lower() in ('if-none-match', 'if-modified-since'):
+                continue
+            digest.update(f'\n{name.lower()}: {value}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def build_cached_response(request, status, headers, body):
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'OK'
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.from_cache = True
+        return response
+
+    def get_retry_delay(self, response, attempt):
+        """ Seconds to wait before retrying `response`, or None not to. """
+        rate_limited = response.status_code == 429 or (
+            response.status_code == 403
+            and _rate_limit_remaining(response) == 0)
+        if attempt >= self.retries or not (
+                rate_limited or response.status_code in self.RETRY_STATUSES):
+            return None
+
+        delay = _retry_after(response)
+        if delay is None and rate_limited:
+            delay = _rate_limit_reset(response)
+        if delay is None:
+            delay = self.backoff * 2 ** attempt
+        return delay if delay <= self.max_wait else None
+
+    def wait_for_rate_limit(self, response):
+        if not response.ok or _rate_limit_remaining(response) != 0:
+            return
+        delay = _rate_limit_reset(response)
+        if delay is None:
+            return
+        if delay > self.max_wait:
+            log.warning("Rate limit for %s exhausted for another %is.",
+                        response.url, delay)
+            return
+        log.info("Rate limit for %s exhausted; waiting %is.",
+                 response.url, delay)
+        time.sleep(delay)
+
+
 class Client:
     """ Abstract class responsible for making requests to service API's. """
+    @staticmethod
+    def get_session(cache=None):
+        """ Return a new :class:`Session`, revalidating responses in `cache`.
+
+        Clients should make all their requests through one session, so that
+        each target opens a single connection per host.  Services opt into
+        conditional requests by passing :meth:`Service.get_response_cache`.
+        """
+        return Session(cache=cache)
+
     @staticmethod
     def json_response(response):
         # If we didn't get good results, just bail.
@@ -264,3 +549,31 @@ class Client:
         else:
             # Older python-requests
             return response.json
+
+
+class AsyncClient(Client):
+    """ Client whose requests are awaited, for asynchronous services.
+
+    Requests are made with ``self.session`` (by default a new
+    :class:`Session`) in the event loop's executor, so that many of them can be in flight at once.
+    Within a collection, at most ``[general] max_requests_per_host`` run
+    against the same host at a time.
+    """
+    session = None
+
+    async def request(self, method, url, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.session is None:
+            self.session = self.get_session()
+        call = functools.partial(self.session.request, method, url, **kwargs)
+        limiter = host_limiter.get()
+        if limiter is None:
+            return await loop.run_in_executor(None, call)
+        async with limiter(url):
+            return await loop.run_in_executor(None, call)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def get_json(self, url, **kwargs):
+        return self.json_response(await self.get(url, **kwargs))
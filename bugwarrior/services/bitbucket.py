@@ -2,7 +2,6 @@ import logging
 import typing
 
 import pydantic.v1
-import requests
 import typing_extensions
 
 from bugwarrior import config
@@ -99,17 +98,18 @@ class BitbucketService(Service, Client):
     def __init__(self, *args, **kw):
         super().__init__(*args, **kw)
 
+        self.session = self.get_session(cache=self.get_response_cache())
         oauth = (self.config.key, self.get_password('secret', self.config.key))
         refresh_token = self.main_config.data.get('bitbucket_refresh_token')
 
         if refresh_token:
-            response = requests.post(
+            response = self.session.post(
                 self.BASE_URL + 'site/oauth2/access_token',
                 data={'grant_type': 'refresh_token',
                       'refresh_token': refresh_token},
                 auth=oauth).json()
         else:
-            response = requests.post(
+            response = self.session.post(
                 self.BASE_URL + 'site/oauth2/access_token',
                 data={'grant_type': 'client_credentials'},
                 auth=oauth).json()
@@ -141,7 +141,8 @@ class BitbucketService(Service, Client):
 
     def get_data(self, url):
         """ Perform a request to the fully qualified url and return json. """
-        return self.json_response(requests.get(url, **self.requests_kwargs))
+        return self.json_response(
+            self.session.get(url, **self.requests_kwargs))
 
     def get_collection(self, url):
         """ Pages through an object collection from the bitbucket API.
@@ -1,7 +1,6 @@
 import sys
 
 import pydantic.v1
-import requests
 import typing_extensions
 
 from bugwarrior import config
@@ -161,7 +160,7 @@ class BTSService(Service, Client):
         }
         if self.config.udd_ignore_sponsor:
             request_params['nosponsor1'] = "on"
-        resp = requests.get(UDD_BUGS_SEARCH, request_params)
+        resp = self.get_session().get(UDD_BUGS_SEARCH, params=request_params)
         return self.json_response(resp)
 
     def annotations(self, issue):
@@ -15,6 +15,9 @@ from bugwarrior.services import Service, Issue
 
 log = logging.getLogger(__name__)
 
+# Bugs whose history is asked for in each request.
+HISTORY_BATCH_SIZE = 100
+
 
 class OptionalSchemeUrl(pydantic.v1.AnyUrl):
     """
@@ -291,6 +294,9 @@ class BugzillaService(Service):
         issues = [(self.config.target, bug) for bug in bugs]
         log.debug(" Found %i total.", len(issues))
 
+        assigned_dates = self._get_assigned_dates([
+            issue['id'] for _, issue in issues if issue['status'] == 'ASSIGNED'])
+
         # Build a url for each issue
         base_url = "%s/show_bug.cgi?id=" % self.config.base_uri
         for tag, issue in issues:
@@ -310,23 +316,31 @@ class BugzillaService(Service):
                 last_mod = needinfos[0]['modification_date']
                 extra['needinfo_since'] = _ensure_datetime(last_mod).isoformat()
 
-            if issue['status'] == 'ASSIGNED':
-                extra['assigned_on'] = self._get_assigned_date(issue)
-            else:
-                extra['assigned_on'] = None
+            extra['assigned_on'] = assigned_dates.get(issue['id'])
 
             issue_obj.extra.update(extra)
             yield issue_obj
 
-    def _get_assigned_date(self, issue):
-        bug = self.bz.getbug(issue['id'])
-        history = bug.get_history_raw()['bugs'][0]['history']
-
-        # this is already in chronological order, so the last change is the one we want
-        for h in reversed(history):
-            for change in h['changes']:
-                if change['field_name'] == 'status' and change['added'] == 'ASSIGNED':
-                    return _ensure_datetime(h['when']).isoformat()
+    def _get_assigned_dates(self, bug_ids):
+        """ Return when each of the bugs `bug_ids` was last assigned.
+
+        Their history is fetched for HISTORY_BATCH_SIZE bugs at a time.
+        """
+        assigned_dates = {}
+        for start in range(0, len(bug_ids), HISTORY_BATCH_SIZE):
+            batch = bug_ids[start:start + HISTORY_BATCH_SIZE]
+            for bug in self.bz.bugs_history_raw(batch)['bugs']:
+                assigned_dates[bug['id']] = _get_assigned_date(bug['history'])
+        return assigned_dates
+
+
+def _get_assigned_date(history):
+    """Return when a bug was last assigned, given its history."""
+    # this is already in chronological order, so the last change is the one we want
+    for h in reversed(history):
+        for change in h['changes']:
+            if change['field_name'] == 'status' and change['added'] == 'ASSIGNED':
+                return _ensure_datetime(h['when']).isoformat()
 
 
 def _get_bug_attr(bug, attr):
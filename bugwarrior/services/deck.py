@@ -1,7 +1,6 @@
 import datetime
 import logging
 
-import requests
 import typing_extensions
 from dateutil.tz import tzutc
 
@@ -32,11 +31,11 @@ class NextcloudDeckConfig(config.ServiceConfig):
 # * Cards will be mapped to tasks
 # * Labels will be mapped to tags
 class NextcloudDeckClient(Client):
-    def __init__(self, base_uri, username, password):
+    def __init__(self, base_uri, username, password, cache=None):
         self.api_base_path = f'{base_uri}/index.php/apps/deck/api/v1.0'
         self.ocs_base_path = f'{base_uri}/ocs/v2.php/apps/deck/api/v1.0'
 
-        self.session = requests.session()
+        self.session = self.get_session(cache=cache)
         self.session.auth = (username, password)
         self.session.headers.update({
             'Accept': 'application/json',
@@ -160,7 +159,8 @@ class NextcloudDeckService(Service):
         self.client = NextcloudDeckClient(
             base_uri=self.config.base_uri,
             username=self.config.username,
-            password=self.config.password
+            password=self.config.password,
+            cache=self.get_response_cache(),
         )
 
     def get_owner(self, issue):
@@ -91,7 +91,7 @@ class GerritService(Service, Client):
     def __init__(self, *args, **kw):
         super().__init__(*args, **kw)
         self.password = self.get_password('password', self.config.username)
-        self.session = requests.session()
+        self.session = self.get_session(cache=self.get_response_cache())
         self.session.headers.update({
             'Accept': 'application/json',
             'Accept-Encoding': 'gzip',
@@ -4,7 +4,6 @@ import signal
 import subprocess
 import sys
 
-import requests
 import typing_extensions
 
 from bugwarrior import config
@@ -70,10 +69,11 @@ class GitBugClient(Client):
         self.path = path
         self.port = port
         self.annotation_comments = annotation_comments
+        self.session = self.get_session()
 
     def _query_graphql(self, query):
         with Webui(self.path, self.port):
-            response = requests.post(
+            response = self.session.post(
                 f'http://127.0.0.1:{self.port}/graphql',
                 json={'query': query})
         return self.json_response(response)['data']
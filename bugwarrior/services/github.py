@@ -1,9 +1,11 @@
+import concurrent.futures
+import itertools
 import re
 import sys
+import threading
 import urllib.parse
 
 import pydantic.v1
-import requests
 import typing_extensions
 
 from bugwarrior import config
@@ -40,6 +42,7 @@ class GithubConfig(config.ServiceConfig):
     body_length: int = sys.maxsize
     project_owner_prefix: bool = False
     issue_urls: config.ConfigList = config.ConfigList([])
+    api: typing_extensions.Literal['rest', 'graphql'] = 'rest'
 
     @pydantic.v1.root_validator
     def deprecate_password(cls, values):
@@ -80,10 +83,18 @@ class GithubConfig(config.ServiceConfig):
 
 
 class GithubClient(Client):
-    def __init__(self, host, auth):
+    """ Client for GitHub's REST API.
+
+    Independent requests, such as those for the pages of a listing, are made
+    from up to `max_requests` threads at once.
+    """
+
+    def __init__(self, host, auth, cache=None, max_requests=1):
         self.host = host
         self.auth = auth
-        self.session = requests.Session()
+        self.max_requests = max_requests
+        self.limiter = threading.BoundedSemaphore(max_requests)
+        self.session = self.get_session(cache=cache)
         if 'token' in self.auth:
             authorization = 'token ' + self.auth['token']
             self.session.headers['Authorization'] = authorization
@@ -100,11 +111,27 @@ class GithubClient(Client):
             baseurl = f"https://{self.host}/api/v3"
         return baseurl + path.format(**context)
 
+    def map(self, func, *iterables):
+        """ Return the list of `func` applied to every item, like map. """
+        if self.max_requests == 1:
+            return list(map(func, *iterables))
+        with concurrent.futures.ThreadPoolExecutor(
+                self.max_requests) as executor:
+            return list(executor.map(func, *iterables))
+
     def get_repos(self, username):
-        user_repos = self._getter(self._api_url("/user/repos?per_page=100"))
-        public_repos = self._getter(self._api_url(
-            "/users/{username}/repos?per_page=100", username=username))
-        return user_repos + public_repos
+        """ Returns the repos of the user and the public ones of username,
+        without duplicates. """
+        repos = {}
+        for repo_list in self.map(self._getter, [
+                self._api_url("/user/repos?per_page=100"),
+                self._api_url(
+                    "/users/{username}/repos?per_page=100",
+                    username=username)]):
+            for repo in repo_list:
+                repos.setdefault(
+                    (repo['owner']['login'], repo['name']), repo)
+        return list(repos.values())
 
     def get_query(self, query):
         """Run a generic issue/PR query"""
@@ -112,21 +139,32 @@ class GithubClient(Client):
             "/search/issues?q={query}&per_page=100", query=query)
         return self._getter(url, subkey='items')
 
-    def get_issues(self, username, repo):
+    def get_issues(self, username, repo, since=None):
+        """ Returns the open issues of a repo.
+
+        If `since` is given, returns the issues updated since then instead,
+        closed ones included.
+        """
         url = self._api_url(
             "/repos/{username}/{repo}/issues?per_page=100",
             username=username, repo=repo)
-        return self._getter(url)
+        return self._getter(url + self._since_query(since))
 
-    def get_directly_assigned_issues(self):
+    def get_directly_assigned_issues(self, since=None):
         """ Returns all issues assigned to authenticated user.
 
         List issues assigned to the authenticated user across all visible
         repositories including owned repositories, member repositories, and
-        organization repositories.
+        organization repositories.  `since` is as for :meth:`get_issues`.
         """
         url = self._api_url("/issues?per_page=100")
-        return self._getter(url)
+        return self._getter(url + self._since_query(since))
+
+    @staticmethod
+    def _since_query(since):
+        if since is None:
+            return ''
+        return '&state=all&since=' + since.strftime('%Y-%m-%dT%H:%M:%SZ')
 
     def get_issue_for_url_path(self, url_path):
         # The pull request url is '/pull/' but the api path is '/pulls/'.
@@ -147,25 +185,59 @@ class GithubClient(Client):
         return self._getter(url)
 
     def _getter(self, url, subkey=None):
-        """ Pagination utility.  Obnoxious. """
+        """ Pagination utility.  Obnoxious.
+
+        Once the first page links to the last one, the others are fetched
+        concurrently; otherwise we follow the next links one by one.
+        """
         results = []
         link = dict(next=url)
 
-        while 'next' in link:
-            response = self._request(link['next'])
+        def get_page(url):
+            response = self._request(url)
             json_res = self.json_response(response)
 
             if subkey is not None:
                 json_res = json_res[subkey]
 
+            return response, json_res
+
+        while 'next' in link:
+            response, json_res = get_page(link['next'])
             results += json_res
 
             link = self._link_field_to_dict(response.headers.get('link', None))
+            page_urls = self._page_urls(link)
+            if page_urls:
+                for _, json_res in self.map(get_page, page_urls):
+                    results += json_res
+                break
 
         return results
 
+    @staticmethod
+    def _page_urls(link):
+        """ URLs of the pages from the next one to the last one, if known. """
+        if 'next' not in link or 'last' not in link:
+            return []
+        parts = urllib.parse.urlsplit(link['last'])
+        query = urllib.parse.parse_qs(parts.query)
+        try:
+            first = int(urllib.parse.parse_qs(
+                urllib.parse.urlsplit(link['next']).query)['page'][0])
+            last = int(query['page'][0])
+        except (KeyError, ValueError):
+            return []
+        urls = []
+        for page in range(first, last + 1):
+            query['page'] = [str(page)]
+            urls.append(urllib.parse.urlunsplit(parts._replace(
+                query=urllib.parse.urlencode(query, doseq=True))))
+        return urls
+
     def _request(self, url):
-        response = self.session.get(url, **self.kwargs)
+        with self.limiter:
+            response = self.session.get(url, **self.kwargs)
 
         # Warn about the mis-leading 404 error code.  See:
         # https://github.com/ralphbean/bugwarrior/issues/374
@@ -193,6 +265,208 @@ class GithubClient(Client):
         }
 
 
+# The fields of issues and pull requests fetched over GraphQL.
+GRAPHQL_ISSUE_FIELDS = """
+    number title body url createdAt updatedAt closedAt state
+    author { login }
+    milestone { title }
+    labels(first: 100) { nodes { name } }
+    assignees(first: 10) { nodes { login } }
+    repository { nameWithOwner }
+    comments(first: $comments) { totalCount nodes { author { login } body } }
+"""
+GRAPHQL_ISSUE_FRAGMENTS = f"""
+    __typename
+    ... on Issue {{ {GRAPHQL_ISSUE_FIELDS} }}
+    ... on PullRequest {{ {GRAPHQL_ISSUE_FIELDS} isDraft }}
+"""
+GRAPHQL_PAGE = "pageInfo { hasNextPage endCursor }"
+
+
+class GithubGraphQLClient(GithubClient):
+    """ Fetch issues over GitHub's GraphQL API, as REST-shaped dicts.
+
+    Each page of issues comes with their labels, milestone, assignees and
+    first ``COMMENTS`` comments, so that no further request is needed for
+    them; comments of issues with more are still fetched over REST.
+    """
+    COMMENTS = 50
+
+    def __init__(self, host, auth, cache=None, max_requests=1):
+        super().__init__(host, auth, cache=cache, max_requests=max_requests)
+        self.comments = {}
+
+    def _graphql_url(self):
+        if self.host == 'github.com':
+            return "https://api.github.com/graphql"
+        return f"https://{self.host}/api/graphql"
+
+    def graphql(self, query, **variables):
+        if '$comments' in query:
+            variables.setdefault('comments', self.COMMENTS)
+        with self.limiter:
+            response = self.session.post(
+                self._graphql_url(),
+                json={'query': query, 'variables': variables}, **self.kwargs)
+        result = self.json_response(response)
+        if result.get('errors'):
+            raise OSError("GraphQL errors from %s: %r" % (
+                self.host, result['errors']))
+        return result['data']
+
+    def _paginate(self, query, path, **variables):
+        """ Yield the nodes of the connection at `path` in the result. """
+        after = None
+        while True:
+            connection = self.graphql(query, after=after, **variables)
+            for key in path:
+                connection = connection[key]
+            yield from connection['nodes']
+            if not connection['pageInfo']['hasNextPage']:
+                return
+            after = connection['pageInfo']['endCursor']
+
+    def _to_rest(self, node):
+        """ Shape an issue or pull request node like the REST API would. """
+        repo = node['repository']['nameWithOwner']
+        author = node['author'] or {'login': 'ghost'}
+        assignees = [
+            {'login': assignee['login']}
+            for assignee in node['assignees']['nodes']]
+        issue = {
+            'url': self._api_url(
+                '/repos/{repo}/issues/{number}',
+                repo=repo, number=node['number']),
+            'repository_url': self._api_url('/repos/{repo}', repo=repo),
+            'html_url': node['url'],
+            'number': node['number'],
+            'title': node['title'],
+            'body': node['body'],
+            'user': {'login': author['login']},
+            'milestone': node['milestone'],
+            'labels': node['labels']['nodes'],
+            'assignee': assignees[0] if assignees else None,
+            'assignees': assignees,
+            'comments': node['comments']['totalCount'],
+            'created_at': node['createdAt'],
+            'updated_at': node['updatedAt'],
+            'closed_at': node['closedAt'],
+            'state': 'open' if node['state'] == 'OPEN' else 'closed',
+        }
+        if node['__typename'] == 'PullRequest':
+            issue['pull_request'] = {'html_url': node['url']}
+            issue['draft'] = node['isDraft']
+
+        comments = node['comments']
+        if len(comments['nodes']) == comments['totalCount']:
+            self.comments[(repo.lower(), node['number'])] = [{
+                'user': comment['author'] or {'login': 'ghost'},
+                'body': comment['body'],
+            } for comment in comments['nodes']]
+        return issue
+
+    def get_repos(self, username):
+        query = f"""
+            query($owner: String!, $after: String) {{
+                repositoryOwner(login: $owner) {{
+                    repositories(first: 100, after: $after) {{
+                        {GRAPHQL_PAGE} nodes {{ name owner {{ login }} }}
+                    }}
+                }}
+            }}"""
+        return list(self._paginate(
+            query, ('repositoryOwner', 'repositories'), owner=username))
+
+    def get_query(self, query):
+        search = f"""
+            query($q: String!, $after: String, $comments: Int!) {{
+                search(query: $q, type: ISSUE, first: 100, after: $after) {{
+                    {GRAPHQL_PAGE} nodes {{ {GRAPHQL_ISSUE_FRAGMENTS} }}
+                }}
+            }}"""
+        return [self._to_rest(node)
+                for node in self._paginate(search, ('search',), q=query)]
+
+    def get_issues(self, username, repo, since=None):
+        """ Returns the open issues and pull requests of a repo.
+
+        If `since` is given, returns those updated since then instead, closed
+        ones included.
+        """
+        if since is None:
+            issues = self._get_repo_nodes(
+                username, repo, 'issues', 'states: OPEN')
+            pulls = self._get_repo_nodes(
+                username, repo, 'pullRequests', 'states: OPEN')
+        else:
+            since = since.strftime('%Y-%m-%dT%H:%M:%SZ')
+            issues = self._get_repo_nodes(
+                username, repo, 'issues', 'filterBy: {since: $since}',
+                since=since)
+            # Pull requests can't be filtered by update, but can be ordered.
+            pulls = itertools.takewhile(
+                lambda node: node['updatedAt'] >= since,
+                self._get_repo_nodes(
+                    username, repo, 'pullRequests',
+                    'orderBy: {field: UPDATED_AT, direction: DESC}'))
+        return [self._to_rest(node)
+                for node in itertools.chain(issues, pulls)]
+
+    def _get_repo_nodes(self, owner, name, connection, arguments, **variables):
+        declarations = ''.join(
+            f', ${variable}: DateTime' for variable in variables)
+        query = f"""
+            query($owner: String!, $name: String!, $comments: Int!,
+                  $after: String{declarations}) {{
+                repository(owner: $owner, name: $name) {{
+                    {connection}(first: 100, after: $after, {arguments}) {{
+                        {GRAPHQL_PAGE} nodes {{ {GRAPHQL_ISSUE_FRAGMENTS} }}
+                    }}
+                }}
+            }}"""
+        return self._paginate(
+            query, ('repository', connection),
+            owner=owner, name=name, **variables)
+
+    def get_directly_assigned_issues(self, since=None):
+        """ Returns all issues assigned to authenticated user.
+
+        `since` is as for :meth:`get_issues`.
+        """
+        if since is None:
+            return self.get_query('assignee:@me is:open')
+        return self.get_query(since.strftime(
+            'assignee:@me updated:>=%Y-%m-%dT%H:%M:%SZ'))
+
+    def get_issue_for_url_path(self, url_path):
+        owner, name, _, number = url_path.strip('/').split('/')
+        query = f"""
+            query($owner: String!, $name: String!, $number: Int!,
+                  $comments: Int!) {{
+                repository(owner: $owner, name: $name) {{
+                    issueOrPullRequest(number: $number) {{
+                        {GRAPHQL_ISSUE_FRAGMENTS}
+                    }}
+                }}
+            }}"""
+        data = self.graphql(query, owner=owner, name=name, number=int(number))
+        issue = self._to_rest(data['repository']['issueOrPullRequest'])
+        # The REST API returns the pull request itself rather than its issue.
+        if issue.pop('pull_request', None) is not None:
+            issue['url'] = self._api_url(
+                '/repos/{owner}/{name}/pulls/{number}',
+                owner=owner, name=name, number=number)
+        return issue
+
+    def get_comments(self, username, repo, number):
+        # Owners and names are case insensitive, and configured ones may
+        # differ from those of the API.
+        comments = self.comments.get((f'{username}/{repo}'.lower(), number))
+        if comments is None:
+            return super().get_comments(username, repo, number)
+        return comments
+
+
 class GithubIssue(Issue):
     TITLE = 'githubtitle'
     BODY = 'githubbody'
@@ -323,21 +597,27 @@ class GithubService(Service):
         super().__init__(*args, **kw)
 
         auth = {'token': self.get_password('token', self.config.login)}
-        self.client = GithubClient(self.config.host, auth)
+        client_class = (GithubGraphQLClient if self.config.api == 'graphql'
+                        else GithubClient)
+        self.client = client_class(
+            self.config.host, auth, cache=self.get_response_cache(),
+            max_requests=self.main_config.max_requests_per_host)
 
     @staticmethod
     def get_keyring_service(config):
         return f"github://{config.login}@{config.host}/{config.username}"
 
-    def get_owned_repo_issues(self, tag):
+    def get_owned_repo_issues(self, tag, since=None):
         """ Grab all the issues """
         issues = {}
-        for issue in self.client.get_issues(*tag.split('/')):
+        for issue in self.client.get_issues(*tag.split('/'), since=since):
             issues[issue['url']] = (tag, issue)
         return issues
 
-    def get_query(self, query):
+    def get_query(self, query, since=None):
         """ Grab all issues matching a github query """
+        if since is not None:
+            query += since.strftime(' updated:>=%Y-%m-%dT%H:%M:%SZ')
         issues = {}
         for issue in self.client.get_query(query):
             url = issue['html_url']
@@ -349,9 +629,9 @@ class GithubService(Service):
                 issues[url] = (repo, issue)
         return issues
 
-    def get_directly_assigned_issues(self):
+    def get_directly_assigned_issues(self, since=None):
         issues = {}
-        for issue in self.client.get_directly_assigned_issues():
+        for issue in self.client.get_directly_assigned_issues(since=since):
             repo = self.get_repository_from_issue(issue)
             issues[issue['url']] = (repo, issue)
         return issues
@@ -383,16 +663,18 @@ class GithubService(Service):
         user, repo = tag.split('/')
         return self.client.get_comments(user, repo, number)
 
+    def _fetch_comments(self, tag, issue):
+        comments = self._comments(tag, issue['number'])
+        log.debug(" got comments for %s", issue['html_url'])
+        return ((c['user']['login'], c['body']) for c in comments)
+
     def annotations(self, tag, issue):
         url = issue['html_url']
         annotations = []
         if self.main_config.annotation_comments:
-            comments = self._comments(tag, issue['number'])
-            log.debug(" got comments for %s", issue['html_url'])
-            annotations = ((
-                c['user']['login'],
-                c['body'],
-            ) for c in comments)
+            annotations = self.get_cached_comments(
+                url, [issue.get('comments'), issue['updated_at']],
+                lambda: self._fetch_comments(tag, issue))
         return self.build_annotations(annotations, url)
 
     def body(self, issue):
@@ -457,13 +739,32 @@ class GithubService(Service):
 
         return True
 
+    @staticmethod
+    def _closed(issues, since):
+        """ Keys of the closed issues among those updated since `since`. """
+        if since is None:
+            return set()
+        return {key for key, (_, issue) in issues.items()
+                if issue['state'] == 'closed'}
+
     def issues(self):
+        for _, issue in self.issues_updated_since(None):
+            if issue is not None:
+                yield issue
+
+    def issues_updated_since(self, since):
         issues = {}
+        closed = set()
         if self.config.query:
-            issues.update(self.get_query(self.config.query))
+            issues.update(self.get_query(self.config.query, since))
         elif self.config.involved_issues:
-            issues.update(self.get_query('involves:{user} state:open'.format(
-                user=self.config.username)))
+            # Issues closed since the previous pull are searched too, so
+            # that their tasks get closed.
+            query = 'involves:{user}'.format(user=self.config.username)
+            involved_issues = self.get_query(
+                query + ' state:open' if since is None else query, since)
+            closed.update(self._closed(involved_issues, since))
+            issues.update(involved_issues)
 
         if self.config.include_user_repos:
             # Only query for all repos if an explicit
@@ -475,24 +776,38 @@ class GithubService(Service):
                 repos = filter(self.filter_repos, all_repos)
                 repos = [repo['name'] for repo in repos]
 
-            for repo in repos:
-                issues.update(
-                    self.get_owned_repo_issues(
-                        self.config.username + "/" + repo)
-                )
+            for repo_issues in self.client.map(
+                    lambda repo: self.get_owned_repo_issues(
+                        self.config.username + "/" + repo, since),
+                    dict.fromkeys(repos)):
+                closed.update(self._closed(repo_issues, since))
+                issues.update(repo_issues)
         if self.config.include_user_issues:
-            issues.update(
+            assigned_issues = dict(
                 filter(self.filter_issues,
-                       self.get_directly_assigned_issues().items())
-            )
+                       self.get_directly_assigned_issues(since).items()))
+            closed.update(self._closed(assigned_issues, since))
+            issues.update(assigned_issues)
         if self.config.issue_urls:
-            issues.update(filter(self.filter_issues, self.get_issues_by_url().items()))
+            issue_urls = dict(
+                filter(self.filter_issues, self.get_issues_by_url().items()))
+            closed.difference_update(issue_urls)
+            issues.update(issue_urls)
 
         log.debug(" Found %i issues.", len(issues))
-        issues = list(filter(self.include, issues.values()))
-        log.debug(" Pruned down to %i issues.", len(issues))
+        included = {key: issue for key, issue in issues.items()
+                    if key not in closed and self.include(issue)}
+        log.debug(" Pruned down to %i issues.", len(included))
+
+        for key in issues.keys() - included.keys():
+            yield key, None
+
+        # Fetch the comments of every issue concurrently.
+        annotations = self.client.map(
+            lambda item: self.annotations(*item), included.values())
 
-        for tag, issue in issues:
+        for (key, (tag, issue)), issue_annotations in zip(
+                included.items(), annotations):
             # Stuff this value into the upstream dict for:
             # https://github.com/ralphbean/bugwarrior/issues/159
             issue['repo'] = tag
@@ -505,9 +820,9 @@ class GithubService(Service):
             extra = {
                 'project': projectName,
                 'type': 'pull_request' if 'pull_request' in issue else 'issue',
-                'annotations': self.annotations(tag, issue),
+                'annotations': issue_annotations,
                 'body': self.body(issue),
                 'namespace': self.config.username,
             }
             issue_obj.extra.update(extra)
-            yield issue_obj
+            yield key, issue_obj
@@ -1,9 +1,13 @@
+import concurrent.futures
+import datetime
+import itertools
 from urllib.parse import quote, urlencode
 import requests
 import typing
 
 import pydantic.v1
 import sys
+import time
 import typing_extensions
 
 from bugwarrior import config
@@ -12,6 +16,9 @@ from bugwarrior.services import Service, Issue, Client
 import logging
 log = logging.getLogger(__name__)
 
+# Seconds for which project metadata is kept from one pull to the next.
+REPO_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
 DefaultPriority = typing_extensions.Literal['', 'L', 'M', 'H', 'unassigned']
 
 
@@ -30,6 +37,9 @@ class GitlabConfig(config.ServiceConfig):
     exclude_regex: typing.Optional[typing.Pattern] = None
     membership: bool = False
     owned: typing.Optional[bool] = None
+    scope: typing.Optional[
+        typing_extensions.Literal['all', 'assigned_to_me', 'created_by_me']] = None
+    include_groups: config.ConfigList = config.ConfigList([])
     import_labels_as_tags: bool = False
     label_template: str = '{{label}}'
     include_merge_requests: typing.Union[bool, typing_extensions.Literal['Undefined']] = 'Undefined'
@@ -82,21 +92,32 @@ class GitlabConfig(config.ServiceConfig):
         Otherwise we'll get a 405 error for exceeding gitlab's rate limit by
         trying to paginate through all public repositories.
         """
+        scoped = values['include_groups'] or values['scope'] not in (None, 'all')
         if (values['host'] == 'gitlab.com'
                 # Options which automatically apply a filter.
                 and not (values['owned'] or
                          values['membership'] or
                          values['include_repos'])
-                # Query options *may* apply a filter.
+                # Query options *may* apply a filter, and so do scoped
+                # queries unless they are instance-wide for every issue.
                 and (
-                    (values['include_issues'] and not values['issue_query'])
-                    or (values['include_merge_requests'] and not values['merge_request_query'])
+                    (values['include_issues'] and not (values['issue_query'] or scoped))
+                    or (values['include_merge_requests']
+                        and not (values['merge_request_query'] or scoped))
                     or (values['include_todos'] and not values['todo_query'])
                 )):
             raise ValueError(
                 "You must set at least one of the configuration options "
                 "to filter repositories (e.g., 'owned') because there "
                 "there are too many on gitlab.com to fetch them all.")
+        if (values['host'] == 'gitlab.com' and values['scope'] == 'all'
+                and not values['include_groups']
+                and ((values['include_issues'] and not values['issue_query'])
+                     or (values['include_merge_requests']
+                         and not values['merge_request_query']))):
+            raise ValueError(
+                "The 'all' scope needs 'include_groups' on gitlab.com, "
+                "or it would fetch the issues of every public repository.")
         return values
 
     @pydantic.v1.validator('owned', always=True)
@@ -120,17 +141,27 @@ class GitlabConfig(config.ServiceConfig):
 class GitlabClient(Client):
     """Abstraction of Gitlab API v4"""
 
-    def __init__(self, host, token, only_if_assigned, also_unassigned, use_https, verify_ssl):
+    def __init__(self, host, token, only_if_assigned, also_unassigned, use_https, verify_ssl,
+                 cache=None, max_requests=1):
         if use_https:
             self.scheme = 'https'
         else:
             self.scheme = 'http'
-        self.verify_ssl = verify_ssl
+        self.session = self.get_session(cache=cache)
+        self.session.headers['PRIVATE-TOKEN'] = token
+        self.session.verify = verify_ssl
+        if not verify_ssl:
+            requests.packages.urllib3.disable_warnings()
 
         self.host = host
         self.token = token
+        self.max_requests = max_requests
 
         self.repo_cache = {}
+        # When each cached repo was fetched, and how lookups went.
+        self.repo_fetched = {}
+        self.repo_cache_hits = 0
+        self.repo_cache_misses = 0
 
         # If we're only fetching assigned issues we can reduce requests by
         # filtering in the query.
@@ -143,6 +174,15 @@ class GitlabClient(Client):
     def _base_url(self):
         return f"{self.scheme}://{self.host}/api/v4/"
 
+    def _fetch_response(self, url: str, skip_403: bool = False, **kwargs):
+        """Perform a GET request and return the response, or None if it was a skipped 403."""
+        response = self.session.get(url, **kwargs)
+
+        if skip_403 and response.status_code == 403:
+            log.debug(f'Skipping {url}. (Is feature disabled?)')
+            return None
+        return response
+
     def _fetch(self, relative_url: str, skip_403: bool = False, **kwargs) -> dict:
         """Perform a fetch operation on the gitlab server
 
@@ -154,16 +194,9 @@ class GitlabClient(Client):
         :param kwargs: will be sent alongside the request.get call
         :rtype: dict
         """
-        headers = {'PRIVATE-TOKEN': self.token}
-        url = self._base_url() + relative_url
-
-        if not self.verify_ssl:
-            requests.packages.urllib3.disable_warnings()
-        response = requests.get(
-            url, headers=headers, verify=self.verify_ssl, **kwargs)
-
-        if skip_403 and response.status_code == 403:
-            log.debug(f'Skipping {relative_url}. (Is feature disabled?)')
+        response = self._fetch_response(
+            self._base_url() + relative_url, skip_403=skip_403, **kwargs)
+        if response is None:
             return {}
         return self.json_response(response)
 
@@ -171,45 +204,93 @@ class GitlabClient(Client):
             self,
             relative_url: str,
             page_size: int = 100,
-            skip_403: bool = False
-            ) -> list:
-        """Make a gitlab REST API call with pagination. Calls will be buffered on pages with size
-        ``page_size``.
+            skip_403: bool = False,
+            keyset: bool = False,
+            ordered: bool = False,
+            ) -> typing.Iterator[dict]:
+        """Make a gitlab REST API call with pagination, yielding the items of pages with size
+        ``page_size`` as they are fetched.
+
+        With ``keyset``, the endpoint is asked for keyset pagination and the ``next`` links are
+        followed, which stays fast on large result sets.  Otherwise, if the first page tells the
+        number of pages, the remaining ones are fetched concurrently and their items are yielded
+        as each page arrives, or in page order if ``ordered``.
 
         :param relative_url:
         :type relative_url: str
         :param page_size: Size of fetch pages. Defaults to 100
         :type page_size: int
-        :rtype: list
+        :param keyset: Whether the endpoint supports keyset pagination.
+        :type keyset: bool
+        :param ordered: Whether items must be yielded in the order of the pages.
+        :type ordered: bool
+        :rtype: Iterator[dict]
         """
+        url = self._base_url() + relative_url
+        if keyset:
+            # Gitlab versions without keyset pagination ignore these
+            # parameters and link to the next offset page instead.
+            params = {
+                'pagination': 'keyset',
+                'per_page': page_size,
+                'order_by': 'id',
+                'sort': 'asc',
+            }
+            while url:
+                response = self._fetch_response(url, skip_403=skip_403, params=params)
+                if response is None:
+                    return
+                yield from self.json_response(response)
+                url = response.links.get('next', {}).get('url')
+                params = None
+            return
+
         params = {
             'page': 1,
             'per_page': page_size,
         }
 
-        full = []
-        detect_broken_gitlab_pagination = []
-        while True:
+        response = self._fetch_response(url, skip_403=skip_403, params=params)
+        if response is None:
+            return
+        items = self.json_response(response)
+        yield from items
+
+        total_pages = int(response.headers.get('X-Total-Pages') or 0)
+        if total_pages:
+            def get_page(page):
+                return self._fetch(relative_url, skip_403=skip_403,
+                                   params=dict(params, page=page))
+
+            pages = range(2, total_pages + 1)
+            if self.max_requests == 1 or not pages:
+                yield from itertools.chain.from_iterable(map(get_page, pages))
+                return
+            with concurrent.futures.ThreadPoolExecutor(self.max_requests) as executor:
+                if ordered:
+                    results = executor.map(get_page, pages)
+                else:
+                    results = (future.result() for future in concurrent.futures.as_completed(
+                        [executor.submit(get_page, page) for page in pages]))
+                for page_items in results:
+                    yield from page_items
+            return
+
+        # Gitlab omits the number of pages on large result sets, so we have to
+        # walk them one by one.
+        while items and len(items) >= page_size:
+            previous_items = items
+            params['page'] += 1
             items = self._fetch(relative_url, skip_403=skip_403, params=params)
-            if not items:
-                break
 
             # XXX: Some gitlab versions have a bug where pagination doesn't
             # work and instead return the entire result no matter what. Detect
             # this by seeing if the results are the same as the last time
             # around and bail if so. Unfortunately, while it is a GitLab bug,
             # we have to deal with instances where it exists.
-            if items == detect_broken_gitlab_pagination:
+            if items == previous_items:
                 break
-            detect_broken_gitlab_pagination = items
-
-            full += items
-
-            if len(items) < params['per_page']:
-                break
-            params['page'] += 1
-
-        return full
+            yield from items
 
     def get_repos(self, include_repos: list, only_membership: bool, only_owned: bool) -> list:
         """Returns a list of repo objects for all repositories accessible. Respects
@@ -244,9 +325,11 @@ class GitlabClient(Client):
                 querystring['membership'] = True
             if only_owned:
                 querystring['owned'] = True
-            all_repos = self._fetch_paged('projects' + '?' + urlencode(querystring))
+            all_repos = list(self._fetch_paged(
+                'projects' + '?' + urlencode(querystring), keyset=True))
         for item in all_repos:
             self.repo_cache[item['id']] = item
+            self.repo_fetched[item['id']] = time.time()
         return all_repos
 
     def _get_repo(self, repo_id: int) -> dict:
@@ -266,8 +349,12 @@ class GitlabClient(Client):
         :type repo_id: int
         :rtype: dict
         """
-        if repo_id not in self.repo_cache:
+        if repo_id in self.repo_cache:
+            self.repo_cache_hits += 1
+        else:
+            self.repo_cache_misses += 1
             self.repo_cache[repo_id] = self._get_repo(repo_id)
+            self.repo_fetched[repo_id] = time.time()
 
         return self.repo_cache[repo_id]
 
@@ -282,44 +369,84 @@ class GitlabClient(Client):
         :type issueid: int
         :rtype: list
         """
-        return self._fetch_paged(f'projects/{rid}/{issue_type}/{issueid}/notes')
+        return list(self._fetch_paged(
+            f'projects/{rid}/{issue_type}/{issueid}/notes', ordered=True))
 
-    def get_repo_issues(self, rid: int) -> dict:
+    def get_repo_issues(self, rid: int, since: datetime.datetime = None) -> dict:
         """Get all issues from a repository as JSON dictionary
 
         :param rid: Project ID in the Gitlab instance
         :type rid: int
+        :param since: If set, get the issues updated since then instead, closed ones included.
+        :type since: datetime.datetime
         :rtype: list
         """
+        state = 'state=opened&' if since is None else ''
         return self.get_issues_from_query(
-            f'projects/{rid}/issues?state=opened&{self.assignee_query}')
+            f'projects/{rid}/issues?{state}{self.assignee_query}', since=since)
 
-    def get_repo_merge_requests(self, rid: int) -> dict:
+    def get_repo_merge_requests(self, rid: int, since: datetime.datetime = None) -> dict:
         """Get all merge_requests from a repository as JSON dictionary
 
         :param rid: Project ID in the Gitlab instance
         :type rid: int
+        :param since: As for :meth:`get_repo_issues`.
+        :type since: datetime.datetime
         :rtype: dict
         """
+        state = 'state=opened&' if since is None else ''
         return self.get_issues_from_query(
-            f'projects/{rid}/merge_requests?state=opened&{self.assignee_query}',
-            skip_403=True)
+            f'projects/{rid}/merge_requests?{state}{self.assignee_query}',
+            skip_403=True, since=since)
 
     def get_issues_from_query(
-            self, query: str, skip_403: bool = False) -> dict:
+            self, query: str, skip_403: bool = False,
+            since: datetime.datetime = None) -> dict:
         """Get objects matching a query. Results will be returned in a dictionary where the key
         matches their project ID.
 
         :param query: API query string that should get sent to the server
         :type query: str
+        :param since: If set, only get objects updated since then.
+        :type since: datetime.datetime
         :rtype: dict
         """
+        if since is not None:
+            query += '&' if '?' in query else '?'
+            query += since.strftime('updated_after=%Y-%m-%dT%H:%M:%SZ')
         issues = {}
-        result = self._fetch_paged(query, skip_403=skip_403)
-        for issue in result:
+        for issue in self._fetch_paged(query, skip_403=skip_403):
             issues[issue['id']] = (issue['project_id'], issue)
         return issues
 
+    def get_scoped_issues(
+            self, issue_type: str, scope: typing.Optional[str] = None,
+            group: typing.Optional[str] = None,
+            since: datetime.datetime = None) -> dict:
+        """Get issues or merge requests from the instance-wide endpoint, or from the one of a
+        group and its subgroups, rather than from each project in turn.
+
+        :param issue_type: "issues" / "merge_requests"
+        :type issue_type: str
+        :param scope: "all" / "assigned_to_me" / "created_by_me", or None for the server's default
+        :type scope: str
+        :param group: Path or ID of the group, if any
+        :type group: str
+        :param since: As for :meth:`get_repo_issues`.
+        :type since: datetime.datetime
+        :rtype: dict
+        """
+        querystring = {}
+        if since is None:
+            querystring['state'] = 'opened'
+        if scope:
+            querystring['scope'] = scope
+        query = '&'.join(filter(None, [urlencode(querystring), self.assignee_query]))
+        prefix = 'groups/' + quote(group, '') + '/' if group else ''
+        return self.get_issues_from_query(
+            f'{prefix}{issue_type}?{query}',
+            skip_403=issue_type == 'merge_requests', since=since)
+
     def get_todos(self, query: str) -> list:
         """Get all todo objects matching a query returned as list of (project_id, todo) tuples
 
@@ -327,11 +454,14 @@ class GitlabClient(Client):
         :type query: str
         :rtype: list
         """
-        todos = []
-        fetched_todos = self._fetch_paged(query)
-        for todo in fetched_todos:
-            todos.append((todo.get('project'), todo))
-        return todos
+        return [(todo.get('project'), todo) for todo in self._fetch_paged(query)]
+
+    def get_recently_done_todos(self) -> list:
+        """Get the most recently done todo objects, from the first page of them
+
+        :rtype: list
+        """
+        return self._fetch('todos?state=done', params={'per_page': 100})
 
 
 class GitlabIssue(Issue):
@@ -539,7 +669,9 @@ class GitlabService(Service):
             only_if_assigned=self.config.only_if_assigned,
             also_unassigned=self.config.also_unassigned,
             use_https=self.config.use_https,
-            verify_ssl=self.config.verify_ssl
+            verify_ssl=self.config.verify_ssl,
+            cache=self.get_response_cache(),
+            max_requests=self.main_config.max_requests_per_host,
         )
         self.repo_map = dict()
 
@@ -547,6 +679,30 @@ class GitlabService(Service):
     def get_keyring_service(config):
         return f"gitlab://{config.login}@{config.host}"
 
+    def load_repo_cache(self):
+        """ Fill the repo cache of the client with the projects kept by the
+        previous pulls, unless they are older than REPO_CACHE_MAX_AGE. """
+        oldest = time.time() - REPO_CACHE_MAX_AGE
+        for rid, entry in self.main_config.data.get_namespace(
+                'repos.' + self.config.target).items():
+            if entry['fetched'] > oldest:
+                self.gitlab_client.repo_cache[int(rid)] = entry['project']
+                self.gitlab_client.repo_fetched[int(rid)] = entry['fetched']
+
+    def save_repo_cache(self):
+        """ Keep the projects in the repo cache for the next pulls. """
+        client = self.gitlab_client
+        lookups = client.repo_cache_hits + client.repo_cache_misses
+        if lookups:
+            log.debug("Found %i of %i projects in the repo cache (%.0f%%).",
+                      client.repo_cache_hits, lookups,
+                      100 * client.repo_cache_hits / lookups)
+        self.main_config.data.update_namespace('repos.' + self.config.target, {
+            str(rid): {'project': project,
+                       'fetched': client.repo_fetched.get(rid, time.time())}
+            for rid, project in client.repo_cache.items()
+        }, replace=True)
+
     def get_owner(self, issue):
         return [assignee['username'] for assignee in issue[1]['assignees']]
 
@@ -585,11 +741,17 @@ class GitlabService(Service):
         annotations = []
 
         if self.main_config.annotation_comments:
-            notes = self.gitlab_client.get_notes(repo['id'], issue_type, issue['iid'])
-            annotations = ((
-                n['author']['username'],
-                n['body']
-            ) for n in notes)
+            def fetch_notes():
+                notes = self.gitlab_client.get_notes(repo['id'], issue_type, issue['iid'])
+                return ((
+                    n['author']['username'],
+                    n['body']
+                ) for n in notes)
+
+            signal = None
+            if 'updated_at' in issue:
+                signal = [issue.get('user_notes_count'), issue['updated_at']]
+            annotations = self.get_cached_comments(url, signal, fetch_notes)
 
         return self.build_annotations(annotations, url)
 
@@ -666,13 +828,13 @@ class GitlabService(Service):
 
         return True
 
-    def get_issues_from_projects(self, repos):
+    def get_issues_from_projects(self, repos, since=None):
         issues = {}
         for repo in repos:
             rid = repo['id']
             self.repo_map[rid] = repo
             issues.update(
-                self.gitlab_client.get_repo_issues(rid)
+                self.gitlab_client.get_repo_issues(rid, since)
             )
         return issues
 
@@ -698,29 +860,95 @@ class GitlabService(Service):
         return description
 
     def issues(self):
+        for _, issue in self.issues_updated_since(None):
+            if issue is not None:
+                yield issue
+
+    def get_scoped_issues(self, issue_type, repos, since=None):
+        """ Get the issues of type `issue_type` from the instance-wide or group
+        endpoints.
+
+        Those are not restricted to `repos`, so issues of other repos are
+        dropped here, before ``include`` looks their repo up.  `repos` is
+        None if the repos to include can't be listed up front, in which case
+        ``include`` filters them.
+        """
+        issues = {}
+        for group in self.config.include_groups or [None]:
+            issues.update(self.gitlab_client.get_scoped_issues(
+                issue_type, self.config.scope, group, since))
+        if repos is not None:
+            ids = {repo['id'] for repo in repos}
+            issues = {
+                key: issue for key, issue in issues.items() if issue[0] in ids}
+        return issues
+
+    def _updated_issue_objs(self, issues, issue_type, since, all_states):
+        """ Yield (key, issue) pairs for the issues of type `issue_type`.
+
+        Issues of our own queries for updates since the last pull include
+        closed ones (`all_states`), which are yielded as None along with the
+        issues we don't include.
+        """
+        included = {}
+        for key, issue in issues.items():
+            if since is not None and all_states and issue[1]['state'] != 'opened':
+                continue
+            if self.include(issue):
+                included[key] = issue
+        log.debug("Pruned down to %i %ss.", len(included), issue_type)
+
+        for key in issues.keys() - included.keys():
+            yield f'{issue_type}:{key}', None
+        issue_objs = self._get_issue_objs(included.values(), issue_type)
+        for key, issue_obj in zip(included, issue_objs):
+            yield f'{issue_type}:{key}', issue_obj
+
+    def issues_updated_since(self, since):
+        self.load_repo_cache()
+        yield from self._issues_updated_since(since)
+        self.save_repo_cache()
+
+    def _issues_updated_since(self, since):
 
         # List of repos will only be queried if needed
         repos = []
 
+        # Issues and merge requests may be fetched from the instance-wide or
+        # group endpoints rather than from every repo.  The repos then only
+        # need listing to honour the membership options or include_repos.
+        scoped = bool(self.config.scope or self.config.include_groups)
+        scoped_repos = None
+        if scoped and (self.config.membership or self.config.owned or (
+                self.config.include_repos and not self.config.include_regex)):
+            repos = self.get_all_repos()
+            scoped_repos = repos
+
         # Issues
         if self.config.include_issues:
             if self.config.issue_query:
-                issues = self.gitlab_client.get_issues_from_query(self.config.issue_query)
+                issues = self.gitlab_client.get_issues_from_query(
+                    self.config.issue_query, since=since)
+            elif scoped:
+                issues = self.get_scoped_issues('issues', scoped_repos, since)
             else:
                 if not repos:
                     repos = self.get_all_repos()
-                issues = self.get_issues_from_projects(repos)
+                issues = self.get_issues_from_projects(repos, since)
 
             log.debug("Found %i issues.", len(issues))
-            issues_filtered = list(filter(self.include, issues.values()))
-            log.debug("Pruned down to %i issues.", len(issues_filtered))
-            yield from self._get_issue_objs(issues_filtered, 'issue')
+            yield from self._updated_issue_objs(
+                issues, 'issue', since, not self.config.issue_query)
 
         # Merge requests
         if self.config.include_merge_requests:
             if self.config.merge_request_query:
                 merge_requests = self.gitlab_client.get_issues_from_query(
-                    self.config.merge_request_query, skip_403=True)
+                    self.config.merge_request_query, skip_403=True,
+                    since=since)
+            elif scoped:
+                merge_requests = self.get_scoped_issues(
+                    'merge_requests', scoped_repos, since)
             else:
                 if not repos:
                     repos = self.get_all_repos()
@@ -728,15 +956,15 @@ class GitlabService(Service):
                 for repo in repos:
                     rid = repo['id']
                     merge_requests.update(
-                        self.gitlab_client.get_repo_merge_requests(rid)
+                        self.gitlab_client.get_repo_merge_requests(rid, since)
                     )
             log.debug("Found %i merge requests.", len(merge_requests))
-            merge_requests_filtered = list(filter(self.include, merge_requests.values()))
-            log.debug("Pruned down to %i merge requests.", len(merge_requests_filtered))
-
-            yield from self._get_issue_objs(merge_requests_filtered, 'merge_request')
+            yield from self._updated_issue_objs(
+                merge_requests, 'merge_request', since,
+                not self.config.merge_request_query)
 
-        # ToDos
+        # ToDos, which can't be asked for by update.  All pending ones are
+        # fetched and those done recently dropped.
         if self.config.include_todos:
             query = 'todos?state=pending'
             if self.config.todo_query:
@@ -751,4 +979,9 @@ class GitlabService(Service):
             else:
                 todos_filtered = todos
             log.debug(" Pruned down to %i todos.", len(todos_filtered))
-            yield from self._get_todo_objs(todos_filtered)
+            if since is not None and not self.config.todo_query:
+                for todo in self.gitlab_client.get_recently_done_todos():
+                    yield f"todo:{todo['id']}", None
+            todo_objs = self._get_todo_objs(todos_filtered)
+            for (_, todo), todo_obj in zip(todos_filtered, todo_objs):
+                yield f"todo:{todo['id']}", todo_obj
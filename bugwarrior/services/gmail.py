@@ -7,6 +7,7 @@ import re
 import time
 
 import googleapiclient.discovery
+import googleapiclient.errors
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 import typing_extensions
@@ -16,6 +17,9 @@ from bugwarrior.services import Service, Issue
 
 log = logging.getLogger(__name__)
 
+# Threads fetched by each batch request.
+THREAD_BATCH_SIZE = 50
+
 
 class GmailConfig(config.ServiceConfig):
     service: typing_extensions.Literal['gmail']
@@ -177,26 +181,85 @@ class GmailService(Service):
             userId=self.config.login_name).execute()
         return {label['id']: label['name'] for label in result['labels']}
 
-    def get_threads(self):
+    def list_thread_ids(self):
+        """ Return the IDs of the threads matching the query, up to the limit. """
         thread_service = self.gmail_api.users().threads()
-        threads = []
+        thread_ids = []
 
         pageToken = None
 
-        while len(threads) < self.config.thread_limit:
-            maxResults = min(100, self.config.thread_limit - len(threads))
+        while len(thread_ids) < self.config.thread_limit:
+            maxResults = min(100, self.config.thread_limit - len(thread_ids))
 
             result = thread_service.list(userId=self.config.login_name, q=self.config.query,
                                          maxResults=maxResults, pageToken=pageToken).execute()
 
-            for thread in result.get('threads', []):
-                threads.append(thread_service.get(userId='me', id=thread['id']).execute())
+            thread_ids += [thread['id'] for thread in result.get('threads', [])]
 
             pageToken = result.get('nextPageToken', None)
             if not pageToken:
                 break
 
-        return threads
+        return thread_ids
+
+    def get_threads_by_id(self, thread_ids):
+        """ Fetch the threads `thread_ids`, THREAD_BATCH_SIZE per batch request. """
+        thread_service = self.gmail_api.users().threads()
+        threads = {}
+        errors = []
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors.append(exception)
+            else:
+                threads[request_id] = response
+
+        for start in range(0, len(thread_ids), THREAD_BATCH_SIZE):
+            batch = self.gmail_api.new_batch_http_request(callback=callback)
+            for thread_id in thread_ids[start:start + THREAD_BATCH_SIZE]:
+                batch.add(thread_service.get(userId='me', id=thread_id),
+                          request_id=thread_id)
+            batch.execute()
+            if errors:
+                raise errors[0]
+
+        return [threads[thread_id] for thread_id in thread_ids]
+
+    def get_threads(self):
+        return self.get_threads_by_id(self.list_thread_ids())
+
+    def get_history_id(self):
+        """ Return the current history ID of the mailbox. """
+        return self.gmail_api.users().getProfile(
+            userId=self.config.login_name).execute()['historyId']
+
+    def get_changed_thread_ids(self, start_history_id):
+        """ Return the IDs of the threads changed since `start_history_id`.
+
+        This is None if the mailbox history no longer goes back that far.
+        """
+        history_service = self.gmail_api.users().history()
+        thread_ids = set()
+
+        pageToken = None
+
+        while True:
+            try:
+                result = history_service.list(
+                    userId=self.config.login_name, startHistoryId=start_history_id,
+                    pageToken=pageToken).execute()
+            except googleapiclient.errors.HttpError as e:
+                if e.resp.status == 404:
+                    return None
+                raise
+
+            for record in result.get('history', []):
+                thread_ids.update(
+                    message['threadId'] for message in record.get('messages', []))
+
+            pageToken = result.get('nextPageToken', None)
+            if not pageToken:
+                return thread_ids
 
     def annotations(self, issue):
         sender = issue.extra['last_sender_name']
@@ -204,15 +267,55 @@ class GmailService(Service):
         issue_url = issue.extra['url']
         return self.build_annotations([(sender, subj)], issue_url)
 
+    def get_issue_for_thread(self, thread, labels):
+        issue = self.get_issue_for_record(thread, thread_extras(thread, labels))
+        extra = {
+            'annotations': self.annotations(issue),
+        }
+        issue.extra.update(extra)
+        return issue
+
     def issues(self):
         labels = self.get_labels()
         for thread in self.get_threads():
-            issue = self.get_issue_for_record(thread, thread_extras(thread, labels))
-            extra = {
-                'annotations': self.annotations(issue),
-            }
-            issue.extra.update(extra)
-            yield issue
+            yield self.get_issue_for_thread(thread, labels)
+
+    def issues_updated_since(self, since):
+        """ Yield the threads changed since the last pull, according to the
+        mailbox history.
+
+        Each pull keeps the history ID of the mailbox from before it fetched
+        anything, and the next one only fetches the threads changed since
+        then.  The matching threads are still listed, to tell which of the
+        changed ones left the query.
+        """
+        history_id = self.get_history_id()
+
+        changed = None
+        if since is not None:
+            start_history_id = self.main_config.data.get(
+                self.config.target, 'gmail.history')
+            if start_history_id is not None:
+                changed = self.get_changed_thread_ids(start_history_id)
+            if changed is None:
+                log.warning(
+                    "No mailbox history for [%s].  Fetching every thread, but "
+                    "those which left the query are only dropped by the next "
+                    "full pull.", self.config.target)
+
+        thread_ids = self.list_thread_ids()
+        if changed is not None:
+            for thread_id in changed.difference(thread_ids):
+                yield thread_id, None
+            thread_ids = [
+                thread_id for thread_id in thread_ids if thread_id in changed]
+
+        labels = self.get_labels()
+        for thread in self.get_threads_by_id(thread_ids):
+            yield thread['id'], self.get_issue_for_thread(thread, labels)
+
+        self.main_config.data.set(
+            self.config.target, history_id, 'gmail.history')
 
 
 def thread_extras(thread, labels):
@@ -1,6 +1,11 @@
+import concurrent.futures
 import dataclasses
+import datetime
 import logging
+import math
+import re
 import sys
+import time
 import typing
 from functools import reduce
 
@@ -12,9 +17,25 @@ from requests.cookies import RequestsCookieJar
 
 from bugwarrior import config
 from bugwarrior.services import Issue, Service
+from bugwarrior.services.base import Session
 
 log = logging.getLogger(__name__)
 
+# The issue fields used by JiraIssue, so that searches return only those
+# along with the comment, sprint and extra fields.
+SEARCH_FIELDS = (
+    'created', 'description', 'duedate', 'fixVersions', 'issuetype',
+    'labels', 'parent', 'priority', 'resolution', 'status', 'subtasks',
+    'summary', 'timeestimate', 'updated',
+)
+
+# Seconds for which the IDs of the sprint fields of a Jira instance are kept
+# from one pull to the next.
+SPRINT_FIELDS_MAX_AGE = 7 * 24 * 60 * 60
+
+# Issues asked for by each request of a concurrent search.
+SEARCH_PAGE_SIZE = 100
+
 
 class ExtraFieldConfigError(Exception):
     def __init__(self, extra_field_raw):
@@ -85,6 +106,7 @@ class JiraConfig(config.ServiceConfig):
     PAT: str = ''
 
     body_length: int = sys.maxsize
+    concurrent_search: bool = False
     extra_fields: typing.Optional[JiraExtraFields] = None
     import_labels_as_tags: bool = False
     import_sprints_as_tags: bool = False
@@ -263,7 +285,7 @@ class JiraIssue(Issue):
         labels = self.record.get('fields', {}).get('labels', [])
         label_tags = self.get_tags_from_labels(labels)
 
-        sprints = [sprint['name'] for sprint in self.__get_sprints()]
+        sprints = [sprint['name'] for sprint in self.get_sprints()]
         sprint_tags = self.get_tags_from_labels(
             sprints, toggle_option='import_sprints_as_tags')
 
@@ -274,13 +296,13 @@ class JiraIssue(Issue):
         if self.record['fields'].get('duedate'):
             return self.parse_date(self.record['fields']['duedate'])
         # Otherwise, if the issue is in a sprint, use the end date of that sprint.
-        sprints = self.__get_sprints()
+        sprints = self.get_sprints()
         for sprint in filter(lambda e: e.get('state', '').lower() != 'closed', sprints):
             endDate = sprint['endDate']
             if endDate != '<null>':
                 return self.parse_date(endDate)
 
-    def __get_sprints(self):
+    def get_sprints(self):
         fields = self.record.get('fields', {})
         sprints = sum((
             fields.get(key) or []
@@ -370,9 +392,9 @@ class JiraService(Service):
         _skip_server = kw.pop('_skip_server', False)
         super().__init__(*args, **kw)
 
-        default_query = 'assignee="' + \
-            self.config.username.replace("@", "\\u0040") + \
-            '" AND resolution is null'
+        self.assignee_query = 'assignee="' + \
+            self.config.username.replace("@", "\\u0040") + '"'
+        default_query = self.assignee_query + ' AND resolution is null'
         self.query = self.config.query or default_query
 
         if self.config.PAT:
@@ -394,20 +416,37 @@ class JiraService(Service):
                     'rest_api_version': 'latest',
                     'verify': self.config.verify_ssl,
                 },
+                timeout=Session.timeout,
                 **auth
             )
 
         self.sprint_field_names = []
         if self.config.import_sprints_as_tags:
-            field_names = [field for field in self.jira.fields()
-                           if field['name'] == 'Sprint']
-            if len(field_names) < 1:
+            self.sprint_field_names = self.get_sprint_field_names()
+            if not self.sprint_field_names:
                 log.warn("No sprint custom field found.  Ignoring sprints.")
-                self.config.import_sprints_as_tags = False
-            else:
-                log.info("Found %i distinct sprint fields." % len(field_names))
-                self.sprint_field_names = [field['id']
-                                           for field in field_names]
+
+    def get_sprint_field_names(self, refresh=False):
+        """ Return the IDs of the sprint fields of the Jira instance.
+
+        Listing the fields can be slow, so their IDs are kept for
+        SPRINT_FIELDS_MAX_AGE unless we `refresh` them.  An instance without
+        sprint fields is asked again on the next pull.
+        """
+        base_uri = str(self.config.base_uri)
+        cached = self.main_config.data.get(base_uri, 'jira.sprint_fields')
+        if (not refresh and cached is not None
+                and cached['fetched'] > time.time() - SPRINT_FIELDS_MAX_AGE):
+            return cached['ids']
+
+        field_names = [field['id'] for field in self.jira.fields()
+                       if field['name'] == 'Sprint']
+        log.info("Found %i distinct sprint fields." % len(field_names))
+        if field_names:
+            self.main_config.data.set(
+                base_uri, {'ids': field_names, 'fetched': time.time()},
+                'jira.sprint_fields')
+        return field_names
 
     @staticmethod
     def get_keyring_service(config):
@@ -421,13 +460,112 @@ class JiraService(Service):
 
         return body
 
+    def search_fields(self):
+        """ The issue fields to ask searches for. """
+        fields = list(SEARCH_FIELDS) + self.sprint_field_names
+        if self.config.version > 4:
+            fields.append('comment')
+        for extra_field in self.config.extra_fields or []:
+            fields.append(extra_field.keys[0])
+        return list(dict.fromkeys(fields))
+
+    def search(self, query):
+        """ Yield the issues matching `query`.
+
+        With ``concurrent_search``, the first page of results tells how many
+        there are, and the remaining pages are then fetched concurrently.
+        Their issues are yielded as each page arrives.
+        """
+        fields = self.search_fields()
+        if not self.config.concurrent_search:
+            yield from self.jira.search_issues(
+                query, maxResults=None, fields=fields)
+            return
+
+        first = self.jira.search_issues(
+            query, startAt=0, maxResults=SEARCH_PAGE_SIZE, fields=fields)
+        yield from first
+        # The server may return fewer issues per page than we asked for.
+        if not first or first.total <= len(first):
+            return
+
+        def get_page(start_at):
+            return self.jira.search_issues(
+                query, startAt=start_at, maxResults=len(first),
+                fields=fields, validate_query=False)
+
+        with concurrent.futures.ThreadPoolExecutor(
+                self.main_config.max_requests_per_host) as executor:
+            futures = [executor.submit(get_page, start_at) for start_at
+                       in range(len(first), first.total, len(first))]
+            for future in concurrent.futures.as_completed(futures):
+                yield from future.result()
+
+    def search_with_sprints(self, query):
+        """ Yield the issues matching `query`, checking the sprint fields.
+
+        The IDs of the sprint fields are kept between pulls and may be stale.
+        Issues are held back until one of them has a sprint field which can
+        be parsed.  If none has, or the first can't be parsed, the fields are
+        looked up again and the search is run anew with the new IDs.
+        """
+        if not self.sprint_field_names:
+            yield from self.search(query)
+            return
+
+        pending = []
+        stale = False
+        for case in self.search(query):
+            if pending is None:
+                yield case
+                continue
+            if not any(key in case.raw['fields']
+                       for key in self.sprint_field_names):
+                pending.append(case)
+                continue
+            try:
+                list(self.get_issue_for_record(case.raw).get_sprints())
+            except (AttributeError, TypeError, ValueError):
+                log.warning("Could not parse the sprints of %s.", case.key)
+                stale = True
+                break
+            yield from pending
+            yield case
+            pending = None
+        if pending is None or not (stale or pending):
+            return
+
+        field_names = self.get_sprint_field_names(refresh=True)
+        if not stale and field_names == self.sprint_field_names:
+            # These issues just aren't in any sprint.
+            yield from pending
+            return
+        log.warning("The sprint fields changed to %s.  Searching again.",
+                    ', '.join(field_names) or 'none')
+        self.sprint_field_names = field_names
+        yield from self.search(query)
+
     def annotations(self, issue, issue_obj):
-        comments = self.jira.comments(issue.key) or []
-        return self.build_annotations(
-            ((
+        def fetch_comments():
+            inline = issue_obj.record['fields'].get('comment') or {}
+            comments = inline.get('comments')
+            if comments is not None and inline.get('total', 0) <= len(comments):
+                return ((
+                    comment.get('author', {}).get('displayName'),
+                    comment['body']
+                ) for comment in comments)
+
+            # Searches only return the first comments of each issue.
+            comments = self.jira.comments(issue.key) or []
+            return ((
                 comment.author.displayName,
                 comment.body
-            ) for comment in comments),
+            ) for comment in comments)
+
+        return self.build_annotations(
+            self.get_cached_comments(
+                issue.key, issue_obj.record['fields'].get('updated'),
+                fetch_comments),
             issue_obj.get_url()
         )
 
@@ -435,21 +573,48 @@ class JiraService(Service):
         if extra is None:
             extra = {}
         extra.setdefault('sprint_field_names', self.sprint_field_names)
+        extra.setdefault('jira_version', self.config.version)
+        extra.setdefault('extra_fields', self.config.extra_fields)
         return super().get_issue_for_record(record, extra=extra)
 
     def issues(self):
-        cases = self.jira.search_issues(self.query, maxResults=None)
+        for _, issue in self.issues_updated_since(None):
+            yield issue
 
-        for case in cases:
+    def issues_updated_since(self, since):
+        query = self.query
+        # Issues resolved since the previous pull are searched too with the
+        # default query, so that their tasks get closed.
+        with_resolved = since is not None and not self.config.query
+        if with_resolved:
+            query = self.assignee_query
+        if since is not None:
+            # JQL dates are in the user's time zone, so ask for a relative
+            # one.  Any ORDER BY clause has to stay at the end.
+            minutes = math.ceil((datetime.datetime.now(
+                datetime.timezone.utc) - since).total_seconds() / 60)
+            match = re.match(r'(.*?)(\s+order\s+by\s.*)?$', query,
+                             re.IGNORECASE | re.DOTALL)
+            query = f'({match.group(1)}) AND updated >= "-{minutes}m"'
+            if match.group(2):
+                query += match.group(2)
+        for case in self.search_with_sprints(query):
+            if with_resolved and case.raw['fields'].get('resolution'):
+                yield case.key, None
+                continue
             issue = self.get_issue_for_record(case.raw)
             extra = {
-                'jira_version': self.config.version,
                 'body': self.body(issue),
-                'extra_fields': self.config.extra_fields,
             }
             if self.config.version > 4:
                 extra.update({
                     'annotations': self.annotations(case, issue)
                 })
             issue.extra.update(extra)
-            yield issue
+            yield case.key, issue
+
+    def get_snapshot(self, issue):
+        # The rest of extra comes from the configuration.
+        return [issue.record, {
+            key: value for key, value in issue.extra.items()
+            if key in ('body', 'annotations')}]
@@ -39,10 +39,11 @@ class LogseqClient(Client):
             "Authorization": "Bearer " + self.token,
             "content-type": "application/json; charset=utf-8",
         }
+        self.session = self.get_session()
 
     def _datascript_query(self, query):
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"http://{self.host}:{self.port}/api",
                 headers=self.headers,
                 json={"method": "logseq.DB.datascriptQuery", "args": [query]},
@@ -54,7 +55,7 @@ class LogseqClient(Client):
 
     def _get_current_graph(self):
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"http://{self.host}:{self.port}/api",
                 headers=self.headers,
                 json={"method": "logseq.getCurrentGraph", "args": []},
@@ -2,11 +2,10 @@ import datetime
 import pytz
 
 import pydantic.v1
-import requests
 import typing_extensions
 
 from bugwarrior import config
-from bugwarrior.services import Service, Issue
+from bugwarrior.services import Service, Issue, Client
 
 import logging
 log = logging.getLogger(__name__)
@@ -106,14 +105,14 @@ class PagureIssue(Issue):
         )
 
 
-class PagureService(Service):
+class PagureService(Service, Client):
     ISSUE_CLASS = PagureIssue
     CONFIG_SCHEMA = PagureConfig
 
     def __init__(self, *args, **kw):
         super().__init__(*args, **kw)
 
-        self.session = requests.Session()
+        self.session = self.get_session(cache=self.get_response_cache())
 
     def get_issues(self, repo, keys):
         """ Grab all the issues """
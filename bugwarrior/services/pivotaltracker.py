@@ -1,11 +1,10 @@
 import re
 import operator
 
-import requests
-from jinja2 import Template
 import typing_extensions
 
 from bugwarrior import config
+from bugwarrior.collect import compile_template
 from bugwarrior.services import Service, Issue, Client
 
 import logging
@@ -121,7 +120,7 @@ class PivotalTrackerService(Service, Client):
 
         self.path = f"{self.config.host}/{self.config.version}"
 
-        self.session = requests.Session()
+        self.session = self.get_session(cache=self.get_response_cache())
         self.session.headers.update(
             {
                 'X-TrackerToken': self.config.token,
@@ -147,7 +146,8 @@ class PivotalTrackerService(Service, Client):
     def annotations(self, annotations, story):
         final_annotations = []
         if self.main_config.annotation_comments:
-            annotation_template = Template(self.config.annotation_template)
+            annotation_template = compile_template(
+                self.config.annotation_template)
             for annotation in annotations:
                 final_annotations.append(
                     ('task', annotation_template.render(annotation))
@@ -163,7 +163,7 @@ class PivotalTrackerService(Service, Client):
         if not self.config.import_blockers:
             return blockers
 
-        blocker_template = Template(self.config.blocker_template)
+        blocker_template = compile_template(self.config.blocker_template)
         for blocker in blocker_list:
             blockers.append(
                 blocker_template.render(blocker)
@@ -1,4 +1,3 @@
-import requests
 import re
 
 from taskw import TaskWarriorShellout
@@ -27,14 +26,17 @@ class RedMineConfig(config.ServiceConfig):
 
 
 class RedMineClient(Client):
-    def __init__(self, url, key, auth, issue_limit, verify_ssl):
+    def __init__(self, url, key, auth, issue_limit, verify_ssl,
+                 cache=None):
         self.url = url
         self.key = key
         self.auth = auth
         self.issue_limit = issue_limit
         self.verify_ssl = verify_ssl
+        self.session = self.get_session(cache=cache)
 
-    def find_issues(self, issue_limit, query, only_if_assigned=False):
+    def find_issues(self, issue_limit, query, only_if_assigned=False,
+                    since=None, status=None):
         args = {}
         url = "/issues.json" + "?" + query
 
@@ -47,6 +49,12 @@ class RedMineClient(Client):
         if only_if_assigned:
             args["assigned_to_id"] = 'me'
 
+        if since is not None:
+            args["updated_on"] = since.strftime('>=%Y-%m-%dT%H:%M:%SZ')
+
+        if status is not None:
+            args["status_id"] = status
+
         return self.call_api(url, args)["issues"]
 
     def call_api(self, uri, params):
@@ -60,7 +68,7 @@ class RedMineClient(Client):
 
         kwargs['verify'] = self.verify_ssl
 
-        return self.json_response(requests.get(url, **kwargs))
+        return self.json_response(self.session.get(url, **kwargs))
 
 
 class RedMineIssue(Issue):
@@ -259,7 +267,8 @@ class RedMineService(Service):
                                     self.key,
                                     auth,
                                     self.config.issue_limit,
-                                    self.config.verify_ssl)
+                                    self.config.verify_ssl,
+                                    self.get_response_cache())
 
     @staticmethod
     def get_keyring_service(config):
@@ -271,3 +280,25 @@ class RedMineService(Service):
         log.debug(" Found %i total.", len(issues))
         for issue in issues:
             yield self.get_issue_for_record(issue)
+
+    def issues_updated_since(self, since):
+        if since is None:
+            for issue in self.issues():
+                yield str(issue.record['id']), issue
+            return
+
+        issues = self.client.find_issues(
+            self.config.issue_limit, self.config.query,
+            self.config.only_if_assigned, since=since)
+        log.debug(" Found %i updated.", len(issues))
+        for issue in issues:
+            yield str(issue['id']), self.get_issue_for_record(issue)
+
+        # Unless the query picks statuses itself, only open issues are
+        # listed, so the ones closed since are dropped.
+        if 'status_id=' not in self.config.query:
+            for issue in self.client.find_issues(
+                    self.config.issue_limit, self.config.query,
+                    self.config.only_if_assigned, since=since,
+                    status='closed'):
+                yield str(issue['id']), None
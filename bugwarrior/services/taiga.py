@@ -1,4 +1,3 @@
-import requests
 import typing_extensions
 
 from bugwarrior import config
@@ -70,7 +69,7 @@ class TaigaService(Service, Client):
     def __init__(self, *args, **kw):
         super().__init__(*args, **kw)
         self.auth_token = self.get_password('auth_token')
-        self.session = requests.session()
+        self.session = self.get_session(cache=self.get_response_cache())
         self.session.headers.update({
             'Accept': 'application/json',
             'Authorization': 'Bearer %s' % self.auth_token,
@@ -1,5 +1,4 @@
 import pydantic.v1
-import requests
 import typing_extensions
 
 from bugwarrior import config
@@ -30,6 +29,7 @@ class TeamLabClient(Client):
         self.hostname = hostname
         self.verbose = verbose
         self.token = None
+        self.session = self.get_session()
 
     def authenticate(self, login, password):
         resp = self.call_api("/api/1.0/authentication.json", post={
@@ -50,8 +50,8 @@ class TeamLabClient(Client):
         if self.token:
             kwargs['headers'] = {'Authorization': self.token}
 
-        response = (requests.post(uri, data=post, **kwargs) if post
-                    else requests.get(uri, **kwargs))
+        response = (self.session.post(uri, data=post, **kwargs) if post
+                    else self.session.get(uri, **kwargs))
 
         return self.json_response(response)
 
@@ -1,4 +1,3 @@
-import requests
 import typing_extensions
 
 from bugwarrior import config
@@ -19,13 +18,15 @@ class TeamworkClient(Client):
     def __init__(self, host, token):
         self.host = host
         self.token = token
+        self.session = self.get_session()
+        self.session.auth = (token, "")
 
     def authenticate(self):
-        response = requests.get(self.host + "/authenticate.json", auth=(self.token, ""))
+        response = self.session.get(self.host + "/authenticate.json")
         return self.json_response(response)
 
     def call_api(self, method, endpoint, data=None):
-        response = requests.get(self.host + endpoint, auth=(self.token, ""), params=data)
+        response = self.session.get(self.host + endpoint, params=data)
         return self.json_response(response)
 
 
@@ -3,11 +3,10 @@ import io as StringIO
 import urllib.parse
 
 import offtrac
-import requests
 import typing_extensions
 
 from bugwarrior import config
-from bugwarrior.services import Issue, Service
+from bugwarrior.services import Issue, Service, Client
 
 import logging
 log = logging.getLogger(__name__)
@@ -90,7 +89,7 @@ class TracIssue(Issue):
         )
 
 
-class TracService(Service):
+class TracService(Service, Client):
     ISSUE_CLASS = TracIssue
     CONFIG_SCHEMA = TracConfig
 
@@ -154,7 +153,7 @@ class TracService(Service):
                 issues[i][1]['url'] = "%s/ticket/%i" % (base_url, tickets[i][0])
                 issues[i][1]['number'] = tickets[i][0]
         else:
-            resp = requests.get(
+            resp = self.get_session().get(
                 self.uri + 'query',
                 params={
                     'status': '!closed',
@@ -5,10 +5,11 @@ Pulls trello cards as tasks.
 
 Trello API documentation available at https://developers.trello.com/
 """
-import requests
+import asyncio
+
 import typing_extensions
 
-from bugwarrior.services import Service, Issue, Client
+from bugwarrior.services import AsyncClient, Service, Issue
 from bugwarrior import config
 
 
@@ -81,57 +82,70 @@ class TrelloIssue(Issue):
         }
 
 
-class TrelloService(Service, Client):
+class TrelloService(Service, AsyncClient):
     ISSUE_CLASS = TrelloIssue
     CONFIG_SCHEMA = TrelloConfig
 
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.session = self.get_session(cache=self.get_response_cache())
+
     @staticmethod
     def get_keyring_service(config):
         return f"trello://{config.api_key}@trello.com"
 
-    def issues(self):
+    async def issues(self):
         """
-        Returns a list of dicts representing issues from a remote service.
+        Yields the issues of the cards of every list of every board.
+
+        The lists of the boards, the cards of the lists and the comments of
+        the cards are each requested concurrently.
         """
-        for board in self.get_boards():
-            for lst in self.get_lists(board['id']):
-                listextra = dict(boardname=board['name'], listname=lst['name'])
-                for card in self.get_cards(lst['id']):
-                    issue = self.get_issue_for_record(card, extra=listextra)
-                    issue.extra.update({"annotations": self.annotations(card)})
-                    yield issue
-
-    def annotations(self, card_json):
+        boards = await self.get_boards()
+        board_lists = await asyncio.gather(
+            *(self.get_lists(board['id']) for board in boards))
+        lists = [(board, lst)
+                 for board, lsts in zip(boards, board_lists) for lst in lsts]
+        list_cards = await asyncio.gather(
+            *(self.get_cards(lst['id']) for _, lst in lists))
+        for (board, lst), cards in zip(lists, list_cards):
+            listextra = dict(boardname=board['name'], listname=lst['name'])
+            annotations = await asyncio.gather(
+                *(self.annotations(card) for card in cards))
+            for card, card_annotations in zip(cards, annotations):
+                issue = self.get_issue_for_record(card, extra=dict(listextra))
+                issue.extra.update({"annotations": card_annotations})
+                yield issue
+
+    async def annotations(self, card_json):
         """ A wrapper around get_comments that build the taskwarrior
         annotations. """
-        comments = self.get_comments(card_json['id'])
+        comments = await self.get_comments(card_json['id'])
         annotations = self.build_annotations(
             ((c['memberCreator']['username'], c['data']['text']) for c in comments),
             card_json["shortUrl"])
         return annotations
 
-    def get_boards(self):
+    async def get_boards(self):
         """
         Get the list of boards to pull cards from.  If the user gave a value to
         trello.include_boards use that, otherwise ask the Trello API for the
         user's boards.
         """
         if self.config.include_boards:
-            for boardid in self.config.include_boards:
-                # Get the board name
-                yield self.api_request(
-                    f"/1/boards/{boardid}", fields='name')
-        else:
-            boards = self.api_request("/1/members/me/boards", fields='name')
-            yield from boards
-
-    def get_lists(self, board):
+            # Get the board names
+            return await asyncio.gather(*(
+                self.api_request(f"/1/boards/{boardid}", fields='name')
+                for boardid in self.config.include_boards))
+        return await self.api_request("/1/members/me/boards", fields='name')
+
+    async def get_lists(self, board):
         """
         Returns a list of the filtered lists for the given board
         This filters the trello lists according to the configuration values of
         trello.include_lists and trello.exclude_lists.
         """
-        lists = self.api_request(
+        lists = await self.api_request(
             f"/1/boards/{board}/lists/open",
             fields='name')
 
@@ -145,35 +159,37 @@ class TrelloService(Service, Client):
 
         return lists
 
-    def get_cards(self, list_id):
-        """ Returns an iterator for the cards in a given list, filtered
-        according to configuration values of trello.only_if_assigned and
+    async def get_cards(self, list_id):
+        """ Returns the cards in a given list, filtered according to
+        configuration values of trello.only_if_assigned and
         trello.also_unassigned """
         params = {'fields': 'name,idShort,shortLink,shortUrl,url,labels,due,desc'}
         if self.config.only_if_assigned:
             params['members'] = 'true'
             params['member_fields'] = 'username'
-        cards = self.api_request(
+        cards = await self.api_request(
             f"/1/lists/{list_id}/cards/open",
             **params)
+        included = []
         for card in cards:
             cardmembers = [m['username'] for m in card['members']]
             if (not self.config.only_if_assigned
                     or self.config.only_if_assigned in cardmembers
                     or (self.config.also_unassigned and not cardmembers)):
-                yield card
+                included.append(card)
+        return included
 
-    def get_comments(self, card_id):
-        """ Returns an iterator for the comments on a certain card. """
+    async def get_comments(self, card_id):
+        """ Returns the comments on a certain card. """
         params = {'filter': 'commentCard', 'memberCreator_fields': 'username'}
-        comments = self.api_request(
+        comments = await self.api_request(
             f"/1/cards/{card_id}/actions",
             **params)
         for comment in comments:
             assert comment['type'] == 'commentCard'
-            yield comment
+        return comments
 
-    def api_request(self, url, **params):
+    async def api_request(self, url, **params):
         """
         Make a trello API request. This takes an absolute url (without protocol
         and host) and a list of argumnets and return a GET request with the
@@ -182,4 +198,4 @@ class TrelloService(Service, Client):
         params['key'] = self.config.api_key,
         params['token'] = self.get_password('token'),
         url = "https://api.trello.com" + url
-        return self.json_response(requests.get(url, params=params))
+        return await self.get_json(url, params=params)
@@ -134,7 +134,7 @@ class YoutrackService(Service, Client):
 
         self.rest_url = self.config.base_url + '/api'
 
-        self.session = requests.Session()
+        self.session = self.get_session(cache=self.get_response_cache())
         self.session.headers['Accept'] = 'application/json'
         if not self.config.verify_ssl:
             requests.packages.urllib3.disable_warnings()
@@ -1,5 +1,7 @@
 import os
 import json
+import time
+import unittest.mock
 
 from bugwarrior.config import data, schema
 
@@ -17,16 +19,86 @@ class TestData(ConfigTest):
         self.assertIn(permissions, ['0600', '0o600'])
 
     def test_get_set(self):
-        # "touch" data file.
-        with open(self.data.datafile, 'w+') as handle:
+        self.data.set('key', 'value')
+        self.data.set('other', {'nested': [1, 2]})
+
+        self.assertEqual(self.data.get('key'), 'value')
+        self.assertEqual(self.data.get('missing'), None)
+        self.assertEqual(
+            self.data.get_data(), {'key': 'value', 'other': {'nested': [1, 2]}})
+        self.assert0600()
+
+    def test_migrate_legacy_datafile(self):
+        with open(self.data.legacy_datafile, 'w+') as handle:
             json.dump({'old': 'stuff'}, handle)
 
         self.data.set('key', 'value')
 
-        self.assertEqual(self.data.get('key'), 'value')
         self.assertEqual(
             self.data.get_data(), {'old': 'stuff', 'key': 'value'})
-        self.assert0600()
+        self.assertFalse(os.path.exists(self.data.legacy_datafile))
+        self.assertTrue(
+            os.path.exists(self.data.legacy_datafile + '.migrated'))
+
+        # A second instance must not migrate again.
+        data.BugwarriorData(self.lists_path).set('old', 'new')
+        self.assertEqual(self.data.get('old'), 'new')
+
+    def test_migrate_legacy_datafile_once(self):
+        with open(self.data.legacy_datafile, 'w+') as handle:
+            json.dump({'old': 'stuff'}, handle)
+        self.data.set('old', 'new')
+
+        # As if we were interrupted before renaming the legacy file.
+        with open(self.data.legacy_datafile, 'w+') as handle:
+            json.dump({'old': 'stuff'}, handle)
+
+        self.assertEqual(self.data.get('old'), 'new')
+        self.assertFalse(os.path.exists(self.data.legacy_datafile))
+
+    def test_interrupted_first_run(self):
+        with open(self.data.legacy_datafile, 'w+') as handle:
+            handle.write('{"malformed')
+
+        with self.assertRaises(ValueError):
+            self.data.set('key', 'value')
+        self.assertTrue(os.path.exists(self.data.datafile))
+
+        os.remove(self.data.legacy_datafile)
+        self.data.set('key', 'value')
+        self.assertEqual(self.data.get('key'), 'value')
+
+    def test_empty_datafile(self):
+        open(self.data.datafile, 'w').close()
+
+        self.assertEqual(self.data.get('key'), None)
+        self.data.set('key', 'value')
+        self.assertEqual(self.data.get('key'), 'value')
+
+    def test_namespaces(self):
+        self.data.update_namespace('cache', {'a': 1, 'b': 2})
+        self.data.update_namespace('cache', {'b': 3, 'c': 4})
+        self.data.set('a', 'top-level')
+
+        self.assertEqual(
+            self.data.get_namespace('cache'), {'a': 1, 'b': 3, 'c': 4})
+        self.assertEqual(self.data.get('a', namespace='cache'), 1)
+        self.assertEqual(self.data.get_data(), {'a': 'top-level'})
+
+        self.data.update_namespace('cache', {'d': 5}, replace=True)
+        self.assertEqual(self.data.get_namespace('cache'), {'d': 5})
+
+    def test_transaction_rollback(self):
+        self.data.set('key', 'value')
+
+        with self.assertRaises(RuntimeError):
+            with self.data.transaction() as transaction:
+                transaction.set('key', 'changed')
+                transaction.update_namespace('cache', {'a': 1})
+                raise RuntimeError()
+
+        self.assertEqual(self.data.get('key'), 'value')
+        self.assertEqual(self.data.get_namespace('cache'), {})
 
     def test_set_first_time(self):
         self.data.set('key', 'value')
@@ -83,3 +155,37 @@ class TestGetDataPath(ConfigTest):
         self.assertTrue('TASKDATA' not in os.environ)
 
         self.assertDataPath(os.path.expanduser('~/.task'))
+
+
+class TestResponseCache(ConfigTest):
+    def get_cache(self, max_size=2 ** 20, max_age=60):
+        return data.ResponseCache(self.lists_path, max_size, max_age)
+
+    def test_get_set(self):
+        cache = self.get_cache()
+        cache.set('key', 200, {'ETag': '"abc"'}, b'body')
+
+        self.assertEqual(cache.get('key'), (200, {'ETag': '"abc"'}, b'body'))
+        self.assertEqual(cache.get('missing'), None)
+
+    def test_evict_least_recently_used_beyond_max_size(self):
+        cache = self.get_cache()
+        for key in ('old', 'middle', 'new'):
+            cache.set(key, 200, {}, b'x' * 10)
+
+        cache = self.get_cache(max_size=25)
+
+        self.assertIsNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('middle'))
+        self.assertIsNotNone(cache.get('new'))
+
+    def test_evict_unused_beyond_max_age(self):
+        cache = self.get_cache()
+        with unittest.mock.patch('time.time', return_value=time.time() - 120):
+            cache.set('old', 200, {}, b'body')
+        cache.set('new', 200, {}, b'body')
+
+        cache = self.get_cache(max_age=60)
+
+        self.assertIsNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('new'))
@@ -9,13 +9,22 @@ from .base import ConfigTest, ServiceTest, AbstractServiceTest
 
 
 class FakeBugzillaLib:
-    def __init__(self, records):
+    def __init__(self, records, assigned_on=None):
         self.records = records
+        self.assigned_on = assigned_on
+        self.history_requests = []
 
     def query(self, query):
         return [namedtuple('Record', list(record.keys()))(**record)
                 for record in self.records]
 
+    def bugs_history_raw(self, bug_ids):
+        self.history_requests.append(bug_ids)
+        return {'bugs': [{'id': bug_id, 'history': [{
+            'when': self.assigned_on,
+            'changes': [{'field_name': 'status', 'added': 'ASSIGNED'}],
+        }]} for bug_id in bug_ids]}
+
 
 class TestBugzillaServiceConfig(ConfigTest):
 
@@ -95,9 +104,7 @@ class TestBugzillaService(AbstractServiceTest, ServiceTest):
     def get_mock_service(self, *args, **kwargs):
         service = super().get_mock_service(
             *args, **kwargs)
-        service.bz = FakeBugzillaLib([self.arbitrary_record])
-        service._get_assigned_date = (
-            lambda issues: self.arbitrary_datetime.isoformat())
+        service.bz = FakeBugzillaLib([self.arbitrary_record], self.arbitrary_datetime)
         return service
 
     def test_api_key_supplied(self):
@@ -253,3 +260,16 @@ class TestBugzillaService(AbstractServiceTest, ServiceTest):
                       [1234567, 1234568])
         # Only two issues are assigned to the user or unassigned.
         self.assertRaises(StopIteration, lambda: next(issues))
+
+    def test_assigned_dates_batched(self):
+        self.service.bz.records = [
+            dict(self.arbitrary_record, id=bug_id, status='ASSIGNED')
+            for bug_id in range(250)]
+
+        issues = list(self.service.issues())
+
+        self.assertEqual(
+            [issue.extra['assigned_on'] for issue in issues],
+            [self.arbitrary_datetime.isoformat()] * 250)
+        self.assertEqual(
+            [len(bug_ids) for bug_ids in self.service.bz.history_requests], [100, 100, 50])
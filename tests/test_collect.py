@@ -0,0 +1,216 @@
+import asyncio
+import concurrent.futures
+import datetime
+import pickle
+import queue
+from unittest import TestCase, mock
+
+import typing_extensions
+
+from bugwarrior import collect, config, services
+from bugwarrior.config import schema
+
+from .base import ConfigTest
+
+
+class TestRecordBatcher(TestCase):
+    def setUp(self):
+        self.queue = queue.Queue()
+
+    def get_batches(self):
+        batches = []
+        while not self.queue.empty():
+            batches.append(self.queue.get())
+        return batches
+
+    def test_batches_bounded_by_count(self):
+        batcher = collect.RecordBatcher(self.queue, serialize=False)
+        with mock.patch.object(collect, 'BATCH_RECORDS', 2):
+            for i in range(5):
+                batcher.put({'id': i})
+            batcher.flush()
+
+        self.assertEqual(
+            [[record['id'] for record in batch]
+             for batch in self.get_batches()],
+            [[0, 1], [2, 3], [4]])
+
+    def test_serialized_batches_bounded_by_size(self):
+        batcher = collect.RecordBatcher(self.queue, serialize=True)
+        record = {'description': 'x' * 100}
+        size = len(pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+        with mock.patch.object(collect, 'BATCH_BYTES', size * 3):
+            for _ in range(4):
+                batcher.put(record)
+            batcher.flush()
+
+        batches = self.get_batches()
+        self.assertEqual([len(batch) for batch in batches], [3, 1])
+        self.assertEqual(pickle.loads(batches[1][0]), record)
+
+
+class IncrementalConfig(config.ServiceConfig):
+    service: typing_extensions.Literal['incremental']
+    password: str = 't0ps3cr3t'
+
+
+class IncrementalIssue(services.Issue):
+    def to_taskwarrior(self):
+        return {'description': self.record['title']}
+
+    def get_default_description(self):
+        return self.record['title']
+
+
+class IncrementalService(services.Service):
+    ISSUE_CLASS = IncrementalIssue
+    CONFIG_SCHEMA = IncrementalConfig
+
+    def issues(self):
+        raise NotImplementedError
+
+    def issues_updated_since(self, since):
+        self.since = since
+        for key, title in self.updates:
+            if isinstance(title, Exception):
+                raise title
+            if title is None:
+                yield key, None
+            else:
+                yield key, self.get_issue_for_record({'title': title})
+
+
+class AsyncIncrementalService(IncrementalService):
+    async def issues(self):
+        raise NotImplementedError
+        yield
+
+
+class TestIncrementalIssues(ConfigTest):
+    def setUp(self):
+        super().setUp()
+        self.config = {
+            'general': {'targets': ['target'], 'interactive': 'false'},
+            'target': {'service': 'incremental', 'incremental': 'true'},
+        }
+
+    def pull(self, updates):
+        with mock.patch('bugwarrior.config.schema.get_service',
+                        lambda x: IncrementalService):
+            conf = schema.validate_config(self.config, 'general', 'path')
+        service = IncrementalService(conf['target'], conf['general'])
+        service.updates = updates
+        titles = sorted(
+            issue.record['title'] for issue in collect._iter_issues(service))
+        return service.since, titles
+
+    def test_delta_pull(self):
+        since, titles = self.pull([('1', 'one'), ('2', 'two'), ('3', 'three')])
+        self.assertIsNone(since)
+        self.assertEqual(titles, ['one', 'three', 'two'])
+
+        since, titles = self.pull([('2', 'two, edited'), ('3', None)])
+        self.assertLess(
+            datetime.datetime.now(datetime.timezone.utc) - since,
+            collect.INCREMENTAL_OVERLAP + datetime.timedelta(minutes=1))
+        self.assertEqual(titles, ['one', 'two, edited'])
+
+        since, titles = self.pull([])
+        self.assertEqual(titles, ['one', 'two, edited'])
+
+    def test_full_pull_after_interval(self):
+        self.pull([('1', 'one')])
+
+        with mock.patch.object(
+                collect, 'datetime', wraps=datetime) as mock_datetime:
+            mock_datetime.datetime.now.return_value = (
+                datetime.datetime.now(datetime.timezone.utc)
+                + datetime.timedelta(hours=25))
+            since, titles = self.pull([('2', 'two')])
+
+        self.assertIsNone(since)
+        self.assertEqual(titles, ['two'])
+
+    def test_full_pull_after_config_change(self):
+        self.pull([('1', 'one')])
+
+        self.config['target']['add_tags'] = 'new'
+        since, titles = self.pull([('2', 'two')])
+
+        self.assertIsNone(since)
+        self.assertEqual(titles, ['two'])
+
+    def test_config_digest_without_secrets(self):
+        with mock.patch('bugwarrior.config.schema.get_service',
+                        lambda x: IncrementalService):
+            conf = schema.validate_config(self.config, 'general', 'path')
+        service_config = conf['target']
+        self.assertEqual(
+            collect._config_digest(service_config.copy(
+                update={'password': 'rotated'})),
+            collect._config_digest(service_config))
+        self.assertNotEqual(
+            collect._config_digest(service_config.copy(
+                update={'add_tags': ['new']})),
+            collect._config_digest(service_config))
+
+    def test_failed_pull_keeps_cursor(self):
+        self.pull([('1', 'one')])
+
+        with self.assertRaises(KeyError):
+            self.pull([('2', 'two'), ('3', KeyError('3'))])
+
+        since, titles = self.pull([])
+        self.assertIsNotNone(since)
+        self.assertEqual(titles, ['one'])
+
+    def test_async_service_pulled_incrementally(self):
+        with mock.patch('bugwarrior.config.schema.get_service',
+                        lambda x: AsyncIncrementalService):
+            conf = schema.validate_config(self.config, 'general', 'path')
+        AsyncIncrementalService.updates = [('1', 'one')]
+        self.addCleanup(delattr, AsyncIncrementalService, 'updates')
+
+        records = queue.Queue()
+        with mock.patch.object(collect, 'get_service',
+                               lambda x: AsyncIncrementalService), \
+                concurrent.futures.ThreadPoolExecutor(1) as executor:
+            asyncio.run(collect._aggregate_issues_async(
+                conf, 'general', 'target', records, executor))
+
+        self.assertEqual(
+            [record['description'] for record in records.get()], ['one'])
+        self.assertEqual(records.get(),
+                         (collect.SERVICE_FINISHED_OK, 'target'))
+        self.assertIsNotNone(
+            conf['general'].data.get('target', 'cursors'))
+
+    def aggregate(self, updates, **kwargs):
+        with mock.patch('bugwarrior.config.schema.get_service',
+                        lambda x: IncrementalService):
+            conf = schema.validate_config(self.config, 'general', 'path')
+        IncrementalService.updates = updates
+        self.addCleanup(delattr, IncrementalService, 'updates')
+        with mock.patch.object(collect, 'get_service',
+                               lambda x: IncrementalService):
+            records = list(collect.aggregate_issues(
+                conf, 'general', debug=True, **kwargs))
+        return sorted(record['description'] for record in records)
+
+    def test_full_pull_requested(self):
+        self.pull([('1', 'one')])
+
+        self.assertEqual(self.aggregate([('2', 'two')], full=True), ['two'])
+
+    def test_full_dry_run_keeps_cursor(self):
+        self.pull([('1', 'one')])
+        with mock.patch('bugwarrior.config.schema.get_service',
+                        lambda x: IncrementalService):
+            data = schema.validate_config(
+                self.config, 'general', 'path')['general'].data
+        cursor = data.get('target', 'cursors')
+
+        self.aggregate([('2', 'two')], full=True, dry_run=True)
+
+        self.assertEqual(data.get('target', 'cursors')['full'],
+                         cursor['full'])
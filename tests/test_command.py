@@ -16,6 +16,11 @@ def fake_github_issues(self):
     yield from [self.get_issue_for_record(ARBITRARY_ISSUE, ARBITRARY_EXTRA)]
 
 
+async def fake_async_github_issues(self):
+    for issue in fake_github_issues(self):
+        yield issue
+
+
 def fake_bz_issues(self):
     yield from [self.get_issue_for_record(
         {
@@ -81,6 +86,90 @@ class TestPull(ConfigTest):
         self.assertIn('Updating 0 tasks', logs)
         self.assertIn('Closing 0 tasks', logs)
 
+    @mock.patch(
+        'bugwarrior.services.github.GithubService.issues', fake_github_issues)
+    def test_thread_workers(self):
+        """
+        Targets can be pulled in a bounded pool of threads.
+        """
+        self.config['general']['worker_type'] = 'thread'
+        self.config['general']['max_workers'] = '1'
+        self.config['my_other_service'] = dict(self.config['my_service'])
+        self.config['my_other_service']['github.username'] = 'someone'
+        self.config['general']['targets'] = 'my_service,my_other_service'
+        self.write_rc(self.config)
+
+        with self.caplog.at_level(logging.INFO):
+            self.runner.invoke(command.cli, args=('pull',))
+
+        logs = [rec.message for rec in self.caplog.records]
+
+        self.assertIn('Spawning 1 thread workers.', logs)
+        self.assertIn('Adding 1 tasks', logs)
+
+    @mock.patch('bugwarrior.services.github.GithubService.issues',
+                fake_async_github_issues)
+    @mock.patch('bugwarrior.services.bz.BugzillaService.issues',
+                fake_bz_issues)
+    @mock.patch('bugzilla.Bugzilla')
+    def test_asyncio_workers(self, bugzillalib):
+        """
+        Asynchronous and synchronous services share the asyncio engine.
+        """
+        self.config['general']['worker_type'] = 'asyncio'
+        self.config['general']['targets'] = 'my_service,my_bz_service'
+        self.config['my_bz_service'] = {
+            'service': 'bugzilla',
+            'bugzilla.base_uri': 'bugzilla.redhat.com',
+            'bugzilla.username': 'rbean@redhat.com',
+        }
+        self.write_rc(self.config)
+
+        with self.caplog.at_level(logging.INFO):
+            self.runner.invoke(command.cli, args=('pull',))
+
+        logs = [rec.message for rec in self.caplog.records]
+
+        self.assertIn('Spawning 2 asyncio workers.', logs)
+        self.assertIn('Adding 2 tasks', logs)
+
+    @mock.patch('bugwarrior.services.github.GithubService.issues',
+                fake_async_github_issues)
+    def test_async_service_in_process_worker(self):
+        """
+        Asynchronous services also run on the process and debug engines.
+        """
+        with self.caplog.at_level(logging.INFO):
+            self.runner.invoke(command.cli, args=('pull', '--debug'))
+
+        logs = [rec.message for rec in self.caplog.records]
+
+        self.assertIn('Adding 1 tasks', logs)
+
+    def test_secrets_resolved_before_workers(self):
+        """
+        Password oracles are evaluated once, before the workers start.
+        """
+        def fake_issues(service):
+            self.assertEqual(service.config.token, 'abc123')
+            return fake_github_issues(service)
+
+        self.config['general']['worker_type'] = 'thread'
+        self.config['my_service']['github.token'] = '@oracle:eval:echo abc123'
+        self.write_rc(self.config)
+
+        with mock.patch('bugwarrior.config.secrets.oracle_eval',
+                        return_value='abc123') as oracle_eval, \
+                mock.patch(
+                    'bugwarrior.services.github.GithubService.issues',
+                    fake_issues):
+            with self.caplog.at_level(logging.INFO):
+                self.runner.invoke(command.cli, args=('pull',))
+
+        oracle_eval.assert_called_once_with('echo abc123')
+        logs = [rec.message for rec in self.caplog.records]
+        self.assertIn('Adding 1 tasks', logs)
+
     @mock.patch(
         'bugwarrior.services.github.GithubService.issues',
         lambda self: (_ for _ in ()).throw(Exception('message'))
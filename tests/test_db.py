@@ -1,7 +1,13 @@
 import copy
+import datetime
+import json
+import time
 import unittest
+from unittest import mock
 
 import taskw.task
+from taskw.exceptions import TaskwarriorError
+from taskw.fields import NumericField, StringField
 
 from bugwarrior import db
 
@@ -70,6 +76,246 @@ class TestReplaceLeft(unittest.TestCase):
         self.assertEqual(self.issue_dict, result)
 
 
+class TestTaskIndex(unittest.TestCase):
+    def setUp(self):
+        self.key_list = {
+            'github': ['githuburl', 'githubtype'],
+            'redmine': ['redmineid'],
+        }
+        udas = {
+            'githuburl': StringField(),
+            'githubtype': StringField(),
+            'redmineid': NumericField(),
+        }
+        self.tasks = [
+            taskw.task.Task({
+                'uuid': '00000000-0000-0000-0000-000000000001',
+                'status': 'pending',
+                'description': 'pending github issue',
+                'githuburl': 'https://example.com/1',
+                'githubtype': 'issue',
+            }, udas=udas),
+            taskw.task.Task({
+                'uuid': '00000000-0000-0000-0000-000000000002',
+                'status': 'completed',
+                'description': 'closed redmine issue',
+                'redmineid': 7,
+            }, udas=udas),
+            taskw.task.Task({
+                'uuid': '00000000-0000-0000-0000-000000000003',
+                'status': 'completed',
+                'description': 'closed redmine issue',
+                'redmineid': 7,
+            }, udas=udas),
+        ]
+        self.tw = mock.Mock()
+        self.tw.config.get_udas.return_value = udas
+        self.tw.filter_tasks.return_value = self.tasks
+        self.index = db.TaskIndex(self.tw, self.key_list)
+
+    def test_single_export(self):
+        self.tw.filter_tasks.assert_called_once_with([
+            ('or', [
+                ('githubtype.any', None),
+                ('githuburl.any', None),
+                ('redmineid.any', None),
+            ]),
+            ('or', [
+                ('status', 'pending'),
+                ('status', 'waiting'),
+                ('status', 'completed'),
+            ]),
+        ])
+
+    def test_find(self):
+        issue = {
+            'description': 'pending github issue',
+            'githuburl': 'https://example.com/1',
+            'githubtype': 'issue',
+        }
+        self.assertEqual(
+            db.find_taskwarrior_uuid(self.index, self.key_list, issue),
+            self.tasks[0]['uuid'])
+
+    def test_not_found(self):
+        issue = {
+            'description': 'other github issue',
+            'githuburl': 'https://example.com/1',
+            'githubtype': 'pull_request',
+        }
+        with self.assertRaises(db.NotFound):
+            db.find_taskwarrior_uuid(self.index, self.key_list, issue)
+
+    def test_completed_duplicates(self):
+        """ Numeric keys match and completed duplicates collapse to one. """
+        issue = {'description': 'closed redmine issue', 'redmineid': '7'}
+        self.assertIn(
+            db.find_taskwarrior_uuid(self.index, self.key_list, issue),
+            [self.tasks[1]['uuid'], self.tasks[2]['uuid']])
+
+    def test_managed_task_uuids(self):
+        self.assertEqual(
+            db.get_managed_task_uuids(self.index, self.key_list),
+            {self.tasks[0]['uuid']})
+
+
+class TestImportTasks(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+        self.imported = []
+
+        def fake_execute(command, path):
+            with open(path) as f:
+                records = json.load(f)
+            if any(r['description'] == 'bad' for r in records):
+                raise TaskwarriorError(['task', 'import'], 'bad task', '', 1)
+            self.imported.append(records)
+            return '', ''
+
+        self.tw = mock.Mock()
+        self.tw._execute.side_effect = fake_execute
+
+    def test_build_import_record(self):
+        record = db.build_import_record({
+            'description': ' Closed issue ',
+            'priority': None,
+            'project': '',
+            'tags': [],
+            'annotations': ['first', 'second'],
+            'end': self.now,
+        }, self.now)
+
+        self.assertEqual(len(record.pop('uuid')), 36)
+        self.assertEqual(record, {
+            'description': 'Closed issue',
+            'status': 'completed',
+            'entry': '20240102T030405Z',
+            'end': '20240102T030405Z',
+            'annotations': [
+                {'entry': '20240102T030405Z', 'description': 'first'},
+                {'entry': '20240102T030406Z', 'description': 'second'},
+            ],
+        })
+
+    def test_batches(self):
+        records = [
+            db.build_import_record({'description': str(i)}, self.now)
+            for i in range(3)]
+
+        with mock.patch.object(db, 'BATCH_SIZE', 2):
+            uuids = db.import_tasks(self.tw, records)
+
+        self.assertEqual(uuids, [r['uuid'] for r in records])
+        self.assertEqual([len(batch) for batch in self.imported], [2, 1])
+
+    def test_failed_record_reported_individually(self):
+        records = [
+            db.build_import_record({'description': description}, self.now)
+            for description in ['good', 'bad', 'also good']]
+
+        with self.assertLogs('bugwarrior.db', 'ERROR') as logs:
+            uuids = db.import_tasks(self.tw, records)
+
+        self.assertEqual(uuids, [records[0]['uuid'], records[2]['uuid']])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('Unable to add task: bad task', logs.output[0])
+
+    def test_created_notified_once_written(self):
+        created = []
+        writer = db.TaskWriter(self.tw, on_created=created.append)
+        issues = [{'description': description} for description in ['good', 'bad']]
+        for issue in issues:
+            writer.add(db.build_import_record(issue, self.now), issue)
+        self.assertEqual(created, [])
+
+        with self.assertLogs('bugwarrior.db', 'ERROR'):
+            writer.flush()
+
+        self.assertEqual(created, [issues[0]])
+
+    def test_encode_existing_task(self):
+        task = taskw.task.Task({
+            'uuid': '00000000-0000-0000-0000-000000000001',
+            'id': 1,
+            'urgency': 4.2,
+            'status': 'pending',
+            'description': 'Existing "task"',
+            'entry': '20240101T000000Z',
+            'annotations': [
+                {'entry': '20240102T030405Z', 'description': 'old'},
+            ],
+            'tags': ['foo'],
+        }, udas={})
+        db.merge_left('annotations', task, {'annotations': ['new', 'newer']})
+        task['tags'] = []
+
+        self.assertEqual(db.encode_import_record(task, self.now), {
+            'uuid': '00000000-0000-0000-0000-000000000001',
+            'status': 'pending',
+            'description': 'Existing "task"',
+            'entry': '20240101T000000Z',
+            'annotations': [
+                {'entry': '20240102T030405Z', 'description': 'old'},
+                {'entry': '20240102T030406Z', 'description': 'new'},
+                {'entry': '20240102T030407Z', 'description': 'newer'},
+            ],
+        })
+
+
+class TestCompleteTasks(unittest.TestCase):
+    def test_complete_tasks(self):
+        tw = mock.Mock()
+        uuids = ['uuid-1', 'uuid-2', 'uuid-3']
+
+        with mock.patch.object(db, 'BATCH_SIZE', 2):
+            db.complete_tasks(tw, uuids)
+
+        self.assertEqual(tw._execute.call_args_list, [
+            mock.call('rc.bulk=0', 'uuid-1', 'uuid-2', 'done'),
+            mock.call('rc.bulk=0', 'uuid-3', 'done'),
+        ])
+
+    def test_failed_task_reported_individually(self):
+        def fake_execute(*args):
+            if args[0] == '_get':
+                return 'pending\n', ''
+            if 'uuid-2' in args:
+                raise TaskwarriorError(args, 'not pending', '', 1)
+            return '', ''
+
+        tw = mock.Mock()
+        tw._execute.side_effect = fake_execute
+
+        with self.assertLogs('bugwarrior.db', 'ERROR') as logs:
+            db.complete_tasks(tw, ['uuid-1', 'uuid-2'])
+
+        self.assertEqual(tw._execute.call_args_list[1:], [
+            mock.call('_get', 'uuid-1.status'),
+            mock.call('uuid-1', 'done'),
+            mock.call('_get', 'uuid-2.status'),
+            mock.call('uuid-2', 'done'),
+        ])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('Unable to close task: not pending', logs.output[0])
+
+    def test_completed_tasks_not_retried(self):
+        def fake_execute(*args):
+            if args[0] == '_get':
+                return ('completed\n' if args[1] == 'uuid-1.status'
+                        else 'pending\n'), ''
+            if args[0] == 'rc.bulk=0':
+                raise TaskwarriorError(args, 'uuid-2 failed', '', 1)
+            return '', ''
+
+        tw = mock.Mock()
+        tw._execute.side_effect = fake_execute
+
+        db.complete_tasks(tw, ['uuid-1', 'uuid-2'])
+
+        self.assertNotIn(mock.call('uuid-1', 'done'), tw._execute.call_args_list)
+        self.assertIn(mock.call('uuid-2', 'done'), tw._execute.call_args_list)
+
+
 class TestSynchronize(ConfigTest):
 
     def test_synchronize(self):
@@ -205,6 +451,130 @@ class TestSynchronize(ConfigTest):
             }]})
 
 
+class TestPipelinedSynchronize(ConfigTest):
+    def test_write_while_collecting(self):
+        """ Tasks are written before the issue generator is exhausted. """
+        self.config = {
+            'general': {'targets': ['my_service'], 'taskrc': self.taskrc},
+            'my_service': {
+                'service': 'github',
+                'login': 'ralphbean',
+                'username': 'ralphbean',
+                'token': 'abc123',
+            },
+        }
+        bwconfig = self.validate()
+        tw = taskw.TaskWarrior(self.taskrc)
+
+        issue = {
+            'description': 'Blah blah blah.',
+            'githubtype': 'issue',
+            'githuburl': 'https://example.com',
+            'priority': 'M',
+            'tags': ['foo'],
+        }
+
+        def issue_generator():
+            yield copy.deepcopy(issue)
+            pending = tw.load_tasks()['pending']
+            self.assertEqual(len(pending), 1)
+            self.assertEqual(pending[0]['tags'], ['foo'])
+            # A duplicate arriving after the first copy was written.
+            yield dict(copy.deepcopy(issue), tags=['bar'])
+
+        with mock.patch.object(db, 'BATCH_SIZE', 1):
+            db.synchronize(issue_generator(), bwconfig, 'general')
+
+        pending = tw.load_tasks()['pending']
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(sorted(pending[0]['tags']), ['bar', 'foo'])
+
+
+class TestFingerprints(ConfigTest):
+    def setUp(self):
+        super().setUp()
+        self.config = {
+            'general': {'targets': ['my_service'], 'taskrc': self.taskrc},
+            'my_service': {
+                'service': 'github',
+                'login': 'ralphbean',
+                'username': 'ralphbean',
+                'token': 'abc123',
+            },
+        }
+        self.bwconfig = self.validate()
+        self.tw = taskw.TaskWarrior(self.taskrc)
+        self.issue = {
+            'description': 'Blah blah blah.',
+            'githubtype': 'issue',
+            'githuburl': 'https://example.com',
+            'priority': 'M',
+            'tags': ['foo'],
+        }
+
+    def reconciled(self, issue=None, **kwargs):
+        """ Synchronize and return whether the issue was matched. """
+        issue = copy.deepcopy(issue or self.issue)
+        with mock.patch.object(
+                db, 'find_taskwarrior_uuid',
+                wraps=db.find_taskwarrior_uuid) as find:
+            db.synchronize(iter((issue,)), self.bwconfig, 'general', **kwargs)
+        return find.called
+
+    def test_unchanged_issue_skipped(self):
+        self.assertTrue(self.reconciled())  # created
+        self.assertTrue(self.reconciled())  # confirmed unchanged
+        self.assertFalse(self.reconciled())
+        self.assertEqual(len(self.tw.load_tasks()['pending']), 1)
+
+    def test_full(self):
+        self.reconciled()
+        self.reconciled()
+        self.assertTrue(self.reconciled(full=True))
+
+    def test_changed_issue(self):
+        self.reconciled()
+        self.reconciled()
+        changed = dict(self.issue, description='Yada yada yada.')
+        self.assertTrue(self.reconciled(changed))
+        self.assertEqual(
+            self.tw.load_tasks()['pending'][0]['description'],
+            'Yada yada yada.')
+
+    def test_changed_task(self):
+        self.reconciled()
+        self.reconciled()
+        _, task = self.tw.get_task(githuburl='https://example.com')
+        # Modification times have a resolution of one second.
+        time.sleep(1)
+        self.tw.task_done(uuid=task['uuid'])
+        self.assertTrue(self.reconciled())
+        self.assertEqual(len(self.tw.load_tasks()['pending']), 1)
+
+    def test_unchanged_issue_with_string_uda_skipped(self):
+        self.config['my_service'] = {
+            'service': 'gitlab',
+            'login': 'ralphbean',
+            'token': 'abc123',
+            'host': 'my-git.org',
+            'owned': 'false',
+        }
+        self.bwconfig = self.validate()
+        issue = {
+            'description': 'Blah blah blah.',
+            'gitlabrepo': 'ralphbean/project',
+            'gitlabtype': 'issue',
+            # Stored as a string by the gitlabnumber UDA.
+            'gitlabnumber': 1,
+            'priority': 'M',
+            'tags': [],
+        }
+        self.assertTrue(self.reconciled(issue))  # created
+        self.assertTrue(self.reconciled(issue))  # confirmed unchanged
+        self.assertFalse(self.reconciled(issue))
+        self.assertEqual(len(self.tw.load_tasks()['pending']), 1)
+
+
 class TestUDAs(ConfigTest):
     def test_udas(self):
         self.config = {
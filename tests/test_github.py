@@ -1,4 +1,5 @@
 import datetime
+import json
 from unittest import TestCase
 
 import pytz
@@ -6,7 +7,7 @@ import responses
 
 from bugwarrior.collect import TaskConstructor
 from bugwarrior.services.github import (
-    GithubConfig, GithubService, GithubClient)
+    GithubConfig, GithubService, GithubClient, GithubGraphQLClient)
 
 from .base import ServiceTest, AbstractServiceTest
 
@@ -181,6 +182,53 @@ class TestGithubIssue(AbstractServiceTest, ServiceTest):
 
         self.assertEqual(TaskConstructor(issue).get_taskwarrior_record(), expected)
 
+    @responses.activate
+    def test_updated_issues(self):
+        self.add_response(
+            'https://api.github.com/user/repos?per_page=100', json=[])
+        self.add_response(
+            'https://api.github.com/users/arbitrary_username/repos?per_page=100',
+            json=[{
+                'name': 'arbitrary_repo',
+                'owner': {'login': 'arbitrary_username'}
+            }])
+        self.add_response(
+            'https://api.github.com/repos/arbitrary_username/arbitrary_repo/issues?per_page=100&state=all&since=2024-01-02T03:04:05Z',  # noqa: E501
+            json=[ARBITRARY_ISSUE])
+        self.add_response(
+            'https://api.github.com/issues?per_page=100&state=all&since=2024-01-02T03:04:05Z',
+            json=[])
+
+        service = self.get_mock_service(GithubService)
+        since = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=pytz.UTC)
+
+        self.assertEqual(list(service.issues_updated_since(since)),
+                         [(ARBITRARY_ISSUE['url'], None)])
+
+
+class TestGithubInvolvedIssues(ServiceTest):
+    SERVICE_CONFIG = {
+        'service': 'github',
+        'login': 'arbitrary_login',
+        'token': 'arbitrary_token',
+        'username': 'arbitrary_username',
+        'involved_issues': 'True',
+        'include_user_repos': 'False',
+        'include_user_issues': 'False',
+    }
+
+    @responses.activate
+    def test_updated_issues(self):
+        self.add_response(
+            'https://api.github.com/search/issues?q=involves%3Aarbitrary_username+updated%3A%3E%3D2024-01-02T03%3A04%3A05Z&per_page=100',  # noqa: E501
+            json={'items': [ARBITRARY_ISSUE]})
+
+        service = self.get_mock_service(GithubService)
+        since = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=pytz.UTC)
+
+        self.assertEqual(list(service.issues_updated_since(since)),
+                         [(ARBITRARY_ISSUE['html_url'], None)])
+
 
 class TestGithubIssueQuery(AbstractServiceTest, ServiceTest):
     maxDiff = None
@@ -242,6 +290,142 @@ class TestGithubIssueQuery(AbstractServiceTest, ServiceTest):
         self.assertEqual(TaskConstructor(issue).get_taskwarrior_record(), expected)
 
 
+def graphql_node(typename='Issue', comments=1, **fields):
+    node = {
+        '__typename': typename,
+        'number': 10,
+        'title': 'Hallo',
+        'body': 'Something',
+        'url': 'https://github.com/arbitrary_username/arbitrary_repo/issues/10',
+        'createdAt': ARBITRARY_CREATED.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'updatedAt': ARBITRARY_UPDATED.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'closedAt': None,
+        'state': 'OPEN',
+        'author': {'login': 'arbitrary_login'},
+        'milestone': {'title': 'alpha'},
+        'labels': {'nodes': [{'name': 'bugfix'}]},
+        'assignees': {'nodes': []},
+        'repository': {'nameWithOwner': 'arbitrary_username/arbitrary_repo'},
+        'comments': {'totalCount': comments, 'nodes': [{
+            'author': {'login': 'arbitrary_login'},
+            'body': 'Arbitrary comment.',
+        }]},
+    }
+    if typename == 'PullRequest':
+        node['isDraft'] = False
+    node.update(fields)
+    return node
+
+
+def graphql_page(*nodes):
+    return {'pageInfo': {'hasNextPage': False, 'endCursor': None},
+            'nodes': list(nodes)}
+
+
+class TestGithubGraphQL(ServiceTest):
+    maxDiff = None
+    SERVICE_CONFIG = {
+        'service': 'github',
+        'login': 'arbitrary_login',
+        'token': 'arbitrary_token',
+        'username': 'arbitrary_username',
+        'include_repos': ['arbitrary_repo'],
+        'include_user_issues': False,
+        'api': 'graphql',
+    }
+
+    def add_graphql_response(self, **connections):
+        """ Answer each query with the page of the connection it asks for. """
+        def callback(request):
+            query = json.loads(request.body)['query']
+            for connection, page in connections.items():
+                if f'{connection}(' in query:
+                    return 200, {}, json.dumps(
+                        {'data': {'repository': {connection: page}}})
+            raise AssertionError(query)
+
+        responses.add_callback(
+            responses.POST, 'https://api.github.com/graphql',
+            callback=callback)
+
+    @responses.activate
+    def test_issues(self):
+        self.add_graphql_response(
+            issues=graphql_page(graphql_node()),
+            pullRequests=graphql_page(graphql_node(
+                'PullRequest', number=11, comments=2, state='MERGED',
+                url='https://github.com/arbitrary_username/arbitrary_repo/pull/11')))
+        self.add_response(
+            'https://api.github.com/repos/arbitrary_username/arbitrary_repo/issues/11/comments?per_page=100',  # noqa: E501
+            json=[{'user': {'login': 'someone'}, 'body': 'First.'},
+                  {'user': {'login': 'someone'}, 'body': 'Second.'}])
+
+        service = self.get_mock_service(GithubService)
+        issue, pull = list(service.issues())
+
+        self.assertEqual(TaskConstructor(issue).get_taskwarrior_record(), {
+            'annotations': ['@arbitrary_login - Arbitrary comment.'],
+            'description': '(bw)Is#10 - Hallo .. https://github.com/arbitrary_username/arbitrary_repo/issues/10',  # noqa: E501
+            'entry': ARBITRARY_CREATED,
+            'end': None,
+            'githubbody': 'Something',
+            'githubcreatedon': ARBITRARY_CREATED,
+            'githubclosedon': None,
+            'githubdraft': 0,
+            'githubmilestone': 'alpha',
+            'githubnamespace': 'arbitrary_username',
+            'githubnumber': 10,
+            'githubrepo': 'arbitrary_username/arbitrary_repo',
+            'githubtitle': 'Hallo',
+            'githubtype': 'issue',
+            'githubupdatedat': ARBITRARY_UPDATED,
+            'githuburl': 'https://github.com/arbitrary_username/arbitrary_repo/issues/10',
+            'githubuser': 'arbitrary_login',
+            'githubstate': 'open',
+            'priority': 'M',
+            'project': 'arbitrary_repo',
+            'tags': []})
+
+        # Comments beyond the first page are fetched over REST.
+        record = TaskConstructor(pull).get_taskwarrior_record()
+        self.assertEqual(record['githubtype'], 'pull_request')
+        self.assertEqual(record['githubstate'], 'closed')
+        self.assertEqual(record['annotations'],
+                         ['@someone - First.', '@someone - Second.'])
+
+    @responses.activate
+    def test_comments_case_insensitive(self):
+        client = GithubGraphQLClient('github.com', {'token': 'abc'})
+        client._to_rest(graphql_node(
+            repository={'nameWithOwner': 'Arbitrary_Username/Arbitrary_Repo'}))
+
+        self.assertEqual(
+            client.get_comments('arbitrary_username', 'arbitrary_repo', 10),
+            [{'user': {'login': 'arbitrary_login'},
+              'body': 'Arbitrary comment.'}])
+
+    @responses.activate
+    def test_issue_url_pull_request(self):
+        self.add_graphql_response(issueOrPullRequest=graphql_node(
+            'PullRequest', number=11,
+            url='https://github.com/arbitrary_username/arbitrary_repo/pull/11'))
+        client = GithubGraphQLClient('github.com', {'token': 'abc'})
+
+        pull = client.get_issue_for_url_path(
+            '/arbitrary_username/arbitrary_repo/pull/11')
+
+        # Like over REST, which returns the pull request rather than its issue.
+        self.assertNotIn('pull_request', pull)
+        self.assertEqual(
+            pull['url'],
+            'https://api.github.com/repos/arbitrary_username/arbitrary_repo/pulls/11')
+
+    def test_enterprise_host(self):
+        client = GithubGraphQLClient('github.example.com', {'token': 'abc'})
+        self.assertEqual(
+            client._graphql_url(), 'https://github.example.com/api/graphql')
+
+
 class TestGithubService(ServiceTest):
     SERVICE_CONFIG = {
         'service': 'github',
@@ -337,3 +521,31 @@ class TestGithubClient(TestCase):
         self.assertEqual(
             client._api_url('/some/path'),
             'https://github.example.com/api/v3/some/path')
+
+    @responses.activate
+    def test_getter_fetches_pages_up_to_last(self):
+        url = 'https://api.github.com/issues?per_page=100'
+        responses.add(responses.GET, url, json=[1], headers={'link': (
+            f'<{url}&page=2>; rel="next", <{url}&page=3>; rel="last"')})
+        for page in (2, 3):
+            responses.add(responses.GET, f'{url}&page={page}', json=[page])
+
+        client = GithubClient('github.com', {'token': 'xxxx'}, max_requests=2)
+
+        self.assertEqual(client._getter(url), [1, 2, 3])
+        self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    def test_get_repos_deduplicated(self):
+        repo = {'name': 'repo', 'owner': {'login': 'someone'}}
+        other = {'name': 'other', 'owner': {'login': 'someone'}}
+        responses.add(responses.GET,
+                      'https://api.github.com/user/repos?per_page=100',
+                      json=[repo, other])
+        responses.add(responses.GET,
+                      'https://api.github.com/users/someone/repos?per_page=100',
+                      json=[repo])
+
+        client = GithubClient('github.com', {'token': 'xxxx'}, max_requests=2)
+
+        self.assertEqual(client.get_repos('someone'), [repo, other])
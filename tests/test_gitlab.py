@@ -1,4 +1,6 @@
 import datetime
+import time
+import unittest.mock
 
 import pytz
 import responses
@@ -9,6 +11,9 @@ from bugwarrior.services.gitlab import GitlabService, GitlabClient
 from .base import ConfigTest, ServiceTest, AbstractServiceTest
 
 
+KEYSET_QUERY = '&pagination=keyset&per_page=100&order_by=id&sort=asc'
+
+
 class TestData():
     def __init__(self):
         self.arbitrary_created = (
@@ -364,15 +369,15 @@ class TestGitlabClient(ServiceTest):
     @responses.activate
     def test_get_repos(self):
         self.add_response(
-            'https://my-git.org/api/v4/projects?simple=True&archived=False&page=1&per_page=100',
+            'https://my-git.org/api/v4/projects?simple=True&archived=False' + KEYSET_QUERY,
             json=[self.data.arbitrary_project])
         self.add_response(
             'https://my-git.org/api/v4/projects' +
-            '?simple=True&archived=False&membership=True&page=1&per_page=100',
+            '?simple=True&archived=False&membership=True' + KEYSET_QUERY,
             json=[self.data.arbitrary_project])
         self.add_response(
             'https://my-git.org/api/v4/projects' +
-            '?simple=True&archived=False&owned=True&page=1&per_page=100',
+            '?simple=True&archived=False&owned=True' + KEYSET_QUERY,
             json=[])
         self.add_response(
             'https://my-git.org/api/v4/projects/' +
@@ -386,11 +391,11 @@ class TestGitlabClient(ServiceTest):
             json=[])
         self.add_response(
             'https://my-git.org/api/v4/projects' +
-            '?simple=True&membership=True&owned=False&page=1&per_page=100',
+            '?simple=True&membership=True&owned=False' + KEYSET_QUERY,
             json=[self.data.arbitrary_project])
         self.add_response(
             'https://my-git.org/api/v4/projects' +
-            '?simple=True&archived=False&membership=True&owned=True&page=1&per_page=100',
+            '?simple=True&archived=False&membership=True&owned=True' + KEYSET_QUERY,
             json=[])
 
         result = self.client.get_repos(include_repos=[], only_membership=False, only_owned=False)
@@ -474,6 +479,47 @@ class TestGitlabClient(ServiceTest):
             [(self.data.arbitrary_todo['project'], self.data.arbitrary_todo)]
         )
 
+    @responses.activate
+    def test_get_scoped_issues(self):
+        self.add_response(
+            'https://my-git.org/api/v4/groups/my-company%2Fteam/' +
+            'merge_requests?state=opened&scope=all&page=1&per_page=100',
+            json=[self.data.arbitrary_mr])
+        self.assertEqual(
+            self.client.get_scoped_issues('merge_requests', 'all', 'my-company/team'),
+            {self.data.arbitrary_mr['id']: (
+                self.data.arbitrary_mr['project_id'], self.data.arbitrary_mr)}
+        )
+
+    @responses.activate
+    def test_fetch_paged_keyset(self):
+        next_url = ('https://my-git.org/api/v4/projects?simple=True' +
+                    '&pagination=keyset&per_page=1&order_by=id&sort=asc&id_after=1')
+        self.add_response(
+            'https://my-git.org/api/v4/projects?simple=True' +
+            '&pagination=keyset&per_page=1&order_by=id&sort=asc',
+            json=[{'id': 1}], headers={'Link': f'<{next_url}>; rel="next"'})
+        self.add_response(next_url, json=[{'id': 2}])
+
+        result = self.client._fetch_paged('projects?simple=True', page_size=1, keyset=True)
+        self.assertEqual(list(result), [{'id': 1}, {'id': 2}])
+
+    @responses.activate
+    def test_fetch_paged_total_pages(self):
+        self.client.max_requests = 4
+        for page in range(1, 6):
+            self.add_response(
+                f'https://my-git.org/api/v4/todos?state=pending&page={page}&per_page=1',
+                json=[{'id': page}], headers={'X-Total-Pages': '5'})
+
+        result = self.client._fetch_paged('todos?state=pending', page_size=1)
+        self.assertEqual(sorted(item['id'] for item in result), [1, 2, 3, 4, 5])
+        # Only the pages announced are fetched, not an extra empty one.
+        self.assertEqual(len(responses.calls), 5)
+
+        result = self.client._fetch_paged('todos?state=pending', page_size=1, ordered=True)
+        self.assertEqual([item['id'] for item in result], [1, 2, 3, 4, 5])
+
 
 class TestGitlabService(ConfigTest):
 
@@ -535,6 +581,13 @@ class TestGitlabService(ConfigTest):
                                    'configuration options to filter '
                                    'repositories')
 
+    def test_filter_gitlab_dot_com_scope_all(self):
+        self.config['myservice']['scope'] = 'all'
+        self.assertValidationError("The 'all' scope needs 'include_groups'")
+
+        self.config['myservice']['include_groups'] = 'my-team'
+        self.validate()
+
     def test_add_default_namespace_to_included_repos(self):
         self.config['myservice']['include_repos'] = 'baz, banana/tree'
         self.assertEqual(self.service.config.include_repos,
@@ -876,6 +929,39 @@ class TestGitlabIssue(AbstractServiceTest, ServiceTest):
             'tags': []}
         self.assertEqual(TaskConstructor(issue).get_taskwarrior_record(), expected)
 
+    @responses.activate
+    def test_repo_cache_persisted(self):
+        overrides = {
+            'issue_query': 'issues?state=opened',
+            'include_merge_requests': 'false',
+        }
+        general_overrides = {'annotation_comments': 'false'}
+        self.add_response(
+            'https://my-git.org/api/v4/issues?state=opened&per_page=100&page=1',
+            json=[self.data.arbitrary_issue])
+        self.add_response(
+            'https://my-git.org/api/v4/projects/8',
+            json=self.data.arbitrary_project)
+
+        service = self.get_mock_service(
+            GitlabService, config_overrides=overrides, general_overrides=general_overrides)
+        self.assertEqual(len(list(service.issues())), 1)
+        self.assertEqual(len(responses.calls), 2)
+
+        # The next pull finds the project in the cache.
+        service = self.get_mock_service(
+            GitlabService, config_overrides=overrides, general_overrides=general_overrides)
+        self.assertEqual(len(list(service.issues())), 1)
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual(service.gitlab_client.repo_cache_misses, 0)
+
+        # Unless it is too old by then.
+        with unittest.mock.patch('time.time', return_value=time.time() + 8 * 24 * 60 * 60):
+            service = self.get_mock_service(
+                GitlabService, config_overrides=overrides, general_overrides=general_overrides)
+            self.assertEqual(len(list(service.issues())), 1)
+        self.assertEqual(len(responses.calls), 5)
+
     @responses.activate
     def test_mrs_from_query(self):
         overrides = {
@@ -1011,10 +1097,80 @@ class TestGitlabIssue(AbstractServiceTest, ServiceTest):
         todo = next(service.issues())
         self.assertEqual(TaskConstructor(todo).get_taskwarrior_record(), expected)
 
+    @responses.activate
+    def test_scoped_issues(self):
+        overrides = {
+            'scope': 'assigned_to_me',
+            'membership': 'true',
+            'include_merge_requests': 'false',
+        }
+        service = self.get_mock_service(GitlabService, config_overrides=overrides)
+        self.add_response(
+            'https://my-git.org/api/v4/projects' +
+            '?simple=True&archived=False&membership=True' + KEYSET_QUERY,
+            json=[{
+                'id': 8,
+                'path': 'arbitrary_username/project',
+                'web_url': 'example.com',
+                "namespace": {
+                    "full_path": "arbitrary_username"
+                },
+                'path_with_namespace': 'arbitrary_username/project'
+            }])
+        self.add_response(
+            'https://my-git.org/api/v4/' +
+            'issues?state=opened&scope=assigned_to_me&page=1&per_page=100',
+            json=[dict(self.data.arbitrary_issue, id=43, project_id=9),
+                  self.data.arbitrary_issue])
+        self.add_response(
+            'https://my-git.org/api/v4/projects/8/issues/3/notes?page=1&per_page=100',
+            json=[])
+
+        issues = list(service.issues())
+
+        # Only the issue of a repo we are a member of is kept, and no
+        # per-repo endpoint is queried.
+        self.assertEqual([issue.record['id'] for issue in issues], [42])
+        self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    def test_scoped_issues_include_repos(self):
+        overrides = {
+            'scope': 'assigned_to_me',
+            'include_repos': 'arbitrary_username/project',
+            'include_merge_requests': 'false',
+        }
+        service = self.get_mock_service(GitlabService, config_overrides=overrides)
+        self.add_response(
+            'https://my-git.org/api/v4/projects/arbitrary_username%2Fproject?simple=true',
+            json={
+                'id': 8,
+                'path': 'arbitrary_username/project',
+                'web_url': 'example.com',
+                "namespace": {
+                    "full_path": "arbitrary_username"
+                },
+                'path_with_namespace': 'arbitrary_username/project'
+            })
+        self.add_response(
+            'https://my-git.org/api/v4/' +
+            'issues?state=opened&scope=assigned_to_me&page=1&per_page=100',
+            json=[dict(self.data.arbitrary_issue, id=43, project_id=9),
+                  self.data.arbitrary_issue])
+        self.add_response(
+            'https://my-git.org/api/v4/projects/8/issues/3/notes?page=1&per_page=100',
+            json=[])
+
+        issues = list(service.issues())
+
+        # The repo of the other issue is not looked up.
+        self.assertEqual([issue.record['id'] for issue in issues], [42])
+        self.assertEqual(len(responses.calls), 3)
+
     @responses.activate
     def test_issues(self):
         self.add_response(
-            'https://my-git.org/api/v4/projects?simple=True&archived=False&per_page=100&page=1',
+            'https://my-git.org/api/v4/projects?simple=True&archived=False' + KEYSET_QUERY,
             json=[{
                 'id': 8,
                 'path': 'arbitrary_username/project',
@@ -103,6 +103,19 @@ TEST_LABELS = [
 ]
 
 
+class FakeBatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            self.callback(request_id, request.execute(), None)
+
+
 class TestGmailIssue(AbstractServiceTest, ServiceTest):
     SERVICE_CONFIG = {
         'service': 'gmail',
@@ -118,6 +131,7 @@ class TestGmailIssue(AbstractServiceTest, ServiceTest):
         mock_api().users().threads().list().execute.return_value = {
             'threads': [{'id': TEST_THREAD['id']}]}
         mock_api().users().threads().get().execute.return_value = TEST_THREAD
+        mock_api().new_batch_http_request.side_effect = FakeBatch
         gmail.GmailService.build_api = mock_api
         self.service = self.get_mock_service(gmail.GmailService, section='test_section')
 
@@ -173,6 +187,30 @@ class TestGmailIssue(AbstractServiceTest, ServiceTest):
 
         self.assertEqual(taskwarrior, expected)
 
+    def test_issues_updated_since(self):
+        api = self.service.gmail_api
+        api.users().getProfile().execute.return_value = {'historyId': '100'}
+
+        updated = list(self.service.issues_updated_since(None))
+        self.assertEqual([key for key, _ in updated], ['1234'])
+        api.users().history().list.assert_not_called()
+
+        # Only the threads changed since are fetched, and those which left
+        # the query are removed.
+        api.users().getProfile().execute.return_value = {'historyId': '200'}
+        api.users().history().list().execute.return_value = {'history': [
+            {'id': '150', 'messages': [{'id': 'a', 'threadId': '5678'}]}]}
+        api.users().threads().get.reset_mock()
+
+        since = datetime.now(tzutc()) - timedelta(hours=1)
+        updated = list(self.service.issues_updated_since(since))
+        self.assertEqual(updated, [('5678', None)])
+        api.users().threads().get.assert_not_called()
+        self.assertEqual(
+            api.users().history().list.call_args[1]['startHistoryId'], '100')
+        self.assertEqual(
+            self.service.main_config.data.get('test_section', 'gmail.history'), '200')
+
     def test_last_sender(self):
         test_thread = {
             'messages': [
@@ -3,6 +3,7 @@ from unittest import mock
 
 from dateutil.tz import datetime
 from dateutil.tz.tz import tzutc
+from jira.client import ResultList
 
 from bugwarrior.collect import TaskConstructor
 from bugwarrior.config import schema
@@ -93,6 +94,7 @@ class TestJiraIssue(AbstractServiceTest, ServiceTest):
             'parent': {'key': f'DONUT-{arbitrary_parent_id}'},
             'customfield_10000': 'foo',
             'namedfield': {'valueinside': arbitrary_namedfield_valueinside},
+            'Sprint': None,
         },
         'key': '%s-%s' % (arbitrary_project, arbitrary_id, ),
     }
@@ -243,6 +245,126 @@ class TestJiraIssue(AbstractServiceTest, ServiceTest):
 
         self.assertEqual(TaskConstructor(issue).get_taskwarrior_record(), expected)
 
+    def test_issues_inline_comments(self):
+        record = dict(self.arbitrary_record, fields=dict(
+            self.arbitrary_record['fields'],
+            updated='2016-06-07T06:07:08.123-0700',
+            comment={'total': 1, 'comments': [
+                {'author': {'displayName': 'Milou'}, 'body': 'Woof.'}]}))
+        Case = namedtuple('Case', ['raw', 'key'])
+        self.service.jira = mock.Mock()
+        self.service.jira.search_issues.return_value = [Case(record, record['key'])]
+
+        issue = next(self.service.issues())
+
+        self.assertEqual(issue.extra['annotations'][-1], '@Milou - Woof.')
+        self.service.jira.comments.assert_not_called()
+        fields = self.service.jira.search_issues.call_args[1]['fields']
+        for field in ('summary', 'comment', 'Sprint', 'customfield_10000', 'namedfield'):
+            self.assertIn(field, fields)
+
+        # Comments beyond those returned by the search are fetched.
+        record['fields']['comment']['total'] = 2
+        record['fields']['updated'] = '2016-06-08T06:07:08.123-0700'
+        Comment = namedtuple('Comment', ['author', 'body'])
+        self.service.jira.comments.return_value = [
+            Comment(mock.Mock(displayName='Milou'), 'Woof.'),
+            Comment(mock.Mock(displayName='Tintin'), 'Milou!')]
+
+        issue = next(self.service.issues())
+
+        self.assertEqual(issue.extra['annotations'][-1], '@Tintin - Milou!')
+
+    def test_resolved_issues_updated(self):
+        record = dict(self.arbitrary_record, fields=dict(
+            self.arbitrary_record['fields'], resolution={'name': 'Done'}))
+        Case = namedtuple('Case', ['raw', 'key'])
+        self.service.jira = mock.Mock()
+        self.service.jira.search_issues.return_value = [Case(record, record['key'])]
+        since = datetime.datetime.now(tzutc()) - datetime.timedelta(hours=1)
+
+        self.assertEqual(list(self.service.issues_updated_since(since)),
+                         [('DONUT-10', None)])
+        self.assertRegex(self.service.jira.search_issues.call_args[0][0],
+                         r'^\(assignee="one"\) AND updated >= "-6[01]m"$')
+
+    def test_concurrent_search(self):
+        with mock.patch('jira.client.JIRA._get_json'):
+            service = self.get_mock_service(
+                JiraService, config_overrides={'concurrent_search': 'true'})
+        Case = namedtuple('Case', ['raw', 'key'])
+
+        def search_issues(query, startAt, maxResults, **kwargs):
+            keys = [f'DONUT-{i}' for i in range(startAt, min(startAt + maxResults, 250))]
+            return ResultList(
+                [Case(dict(self.arbitrary_record, key=key), key) for key in keys],
+                _startAt=startAt, _maxResults=maxResults, _total=250)
+
+        service.jira = mock.Mock()
+        service.jira.search_issues.side_effect = search_issues
+        service.jira.comments.return_value = []
+
+        keys = [key for key, _ in service.issues_updated_since(None)]
+
+        self.assertEqual(sorted(keys), sorted(f'DONUT-{i}' for i in range(250)))
+        self.assertEqual(
+            sorted(call[1]['startAt'] for call in service.jira.search_issues.call_args_list),
+            [0, 100, 200])
+
+    def test_sprint_field_names_kept(self):
+        fields = [{'id': 'customfield_10001', 'name': 'Sprint'},
+                  {'id': 'customfield_10002', 'name': 'Story Points'}]
+        overrides = {'import_sprints_as_tags': 'true'}
+        with mock.patch('jira.client.JIRA._get_json'), \
+                mock.patch('jira.client.JIRA.fields', return_value=fields) as get_fields:
+            service = super().get_mock_service(JiraService, config_overrides=overrides)
+            self.assertEqual(service.sprint_field_names, ['customfield_10001'])
+            service = super().get_mock_service(JiraService, config_overrides=overrides)
+            self.assertEqual(service.sprint_field_names, ['customfield_10001'])
+        get_fields.assert_called_once()
+
+    def test_sprint_field_names_stale(self):
+        fields = [{'id': 'customfield_10003', 'name': 'Sprint'}]
+        overrides = {'import_sprints_as_tags': 'true'}
+        with mock.patch('jira.client.JIRA._get_json'):
+            service = super().get_mock_service(JiraService, config_overrides=overrides)
+        # The field kept by a previous pull has disappeared since.
+        service.sprint_field_names = ['customfield_10001']
+        sprint = {'name': 'Sprint 1', 'state': 'ACTIVE', 'endDate': '<null>'}
+        Case = namedtuple('Case', ['raw', 'key'])
+
+        def search_issues(query, fields, **kwargs):
+            record = dict(self.arbitrary_record, fields={
+                key: value for key, value in dict(
+                    self.arbitrary_record['fields'],
+                    customfield_10003=[sprint]).items()
+                if key in fields})
+            return [Case(record, record['key'])]
+
+        service.jira = mock.Mock()
+        service.jira.search_issues.side_effect = search_issues
+        service.jira.fields.return_value = fields
+        service.jira.comments.return_value = []
+
+        issue = next(service.issues())
+
+        self.assertEqual(service.sprint_field_names, ['customfield_10003'])
+        self.assertEqual(issue.get_tags(), ['Sprint_1'])
+        self.assertEqual(service.jira.search_issues.call_count, 2)
+        self.assertEqual(
+            service.main_config.data.get('https://two.org', 'jira.sprint_fields')['ids'],
+            ['customfield_10003'])
+
+    def test_sprint_field_names_not_found(self):
+        with mock.patch('jira.client.JIRA._get_json'), \
+                mock.patch('jira.client.JIRA.fields', return_value=[]):
+            service = super().get_mock_service(
+                JiraService, config_overrides={'import_sprints_as_tags': 'true'})
+
+        self.assertEqual(service.sprint_field_names, [])
+        self.assertIsNone(
+            service.main_config.data.get('https://two.org', 'jira.sprint_fields'))
+
     def test_get_due(self):
         issue = self.service.get_issue_for_record(
             self.arbitrary_record_with_due
@@ -1,10 +1,16 @@
+import asyncio
 import re
+import threading
+import time
 import unittest.mock
 
+import requests
+import responses
 import typing_extensions
 
-from bugwarrior import config, services
+from bugwarrior import collect, config, services
 from bugwarrior.config import schema
+from bugwarrior.services import base
 
 from .base import ConfigTest
 
@@ -121,6 +127,31 @@ class TestService(ServiceBase):
         self.assertEqual(annotations, [
             f'@some_author - {LONG_MESSAGE}'])
 
+    def test_get_cached_comments(self):
+        fetch = unittest.mock.Mock(return_value=[('author', 'body')])
+
+        def pull(signals):
+            service = self.makeService()
+            comments = {key: service.get_cached_comments(key, signal, fetch)
+                        for key, signal in signals.items()}
+            service.save_cached_comments()
+            return comments
+
+        self.assertEqual(pull({'1': [1, 'a'], '2': [1, 'a']}),
+                         {'1': [['author', 'body']], '2': [['author', 'body']]})
+        self.assertEqual(fetch.call_count, 2)
+
+        fetch.return_value = [('author', 'edited')]
+        self.assertEqual(pull({'1': [1, 'a'], '2': [2, 'b']}),
+                         {'1': [['author', 'body']], '2': [['author', 'edited']]})
+        self.assertEqual(fetch.call_count, 3)
+
+        # Comments of issues missing from the last pull are forgotten, and
+        # those without a signal always fetched.
+        pull({'2': [2, 'b']})
+        pull({'1': [1, 'a'], '2': None})
+        self.assertEqual(fetch.call_count, 5)
+
 
 class TestIssue(ServiceBase):
 
@@ -156,3 +187,191 @@ class TestIssue(ServiceBase):
 
         self.assertEqual(issue.get_tags_from_labels(['needs work']),
                          ['needs_work'])
+
+
+class TestAsyncClient(unittest.TestCase):
+
+    def test_requests_per_host_are_limited(self):
+        lock = threading.Lock()
+        active = {}
+        peaks = {}
+
+        def request(method, url):
+            host = url.split('/')[2]
+            with lock:
+                active[host] = active.get(host, 0) + 1
+                peaks[host] = max(peaks.get(host, 0), active[host])
+            time.sleep(0.05)
+            with lock:
+                active[host] -= 1
+            return url
+
+        client = services.AsyncClient()
+        client.session = unittest.mock.Mock(request=request)
+
+        async def fetch():
+            collect.host_limiter.set(collect.HostLimiter(2))
+            return await asyncio.gather(*(
+                client.get(f'https://{host}/{i}')
+                for host in ('one.example', 'two.example') for i in range(4)))
+
+        responses = asyncio.run(fetch())
+
+        self.assertEqual(len(responses), 8)
+        self.assertEqual(peaks, {'one.example': 2, 'two.example': 2})
+
+
+@unittest.mock.patch('bugwarrior.services.base.time.sleep')
+class TestSession(unittest.TestCase):
+    URL = 'https://example.com/api'
+
+    def setUp(self):
+        self.session = base.Session()
+
+    @responses.activate
+    def test_timeout(self, sleep):
+        responses.add(responses.GET, self.URL, json={})
+
+        self.session.get(self.URL)
+
+        self.assertEqual(
+            responses.calls[0].request.req_kwargs['timeout'], (10, 60))
+
+    @responses.activate
+    def test_retry_server_errors_with_backoff(self, sleep):
+        responses.add(responses.GET, self.URL, status=502)
+        responses.add(responses.GET, self.URL, status=503)
+        responses.add(responses.GET, self.URL, json={'ok': True})
+
+        response = self.session.get(self.URL)
+
+        self.assertEqual(response.json(), {'ok': True})
+        self.assertEqual(sleep.call_args_list,
+                         [unittest.mock.call(1), unittest.mock.call(2)])
+
+    @responses.activate
+    def test_give_up_after_retries(self, sleep):
+        responses.add(responses.GET, self.URL, status=500)
+
+        response = self.session.get(self.URL)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(responses.calls), 6)
+
+    @responses.activate
+    def test_retry_after(self, sleep):
+        responses.add(responses.GET, self.URL, status=429,
+                      headers={'Retry-After': '7'})
+        responses.add(responses.GET, self.URL, json={})
+
+        self.session.get(self.URL)
+
+        sleep.assert_called_once_with(7.0)
+
+    @responses.activate
+    def test_retry_exhausted_rate_limit(self, sleep):
+        reset = time.time() + 30
+        responses.add(responses.GET, self.URL, status=403, headers={
+            'X-RateLimit-Remaining': '0',
+            'X-RateLimit-Reset': str(int(reset)),
+        })
+        responses.add(responses.GET, self.URL, json={})
+
+        self.assertEqual(self.session.get(self.URL).status_code, 200)
+        self.assertAlmostEqual(sleep.call_args[0][0], 30, delta=2)
+
+    @responses.activate
+    def test_wait_for_rate_limit_reset(self, sleep):
+        responses.add(responses.GET, self.URL, json={}, headers={
+            'RateLimit-Remaining': '0',
+            'RateLimit-Reset': '12',
+        })
+
+        self.session.get(self.URL)
+
+        sleep.assert_called_once_with(12.0)
+
+    @responses.activate
+    def test_no_wait_beyond_max_wait(self, sleep):
+        responses.add(responses.GET, self.URL, status=429,
+                      headers={'Retry-After': '3600'})
+
+        self.assertEqual(self.session.get(self.URL).status_code, 429)
+        sleep.assert_not_called()
+
+    def test_retry_connection_errors_of_idempotent_requests(self, sleep):
+        with unittest.mock.patch.object(
+                requests.Session, 'request',
+                side_effect=requests.ConnectionError()) as request:
+            with self.assertRaises(requests.ConnectionError):
+                self.session.get(self.URL)
+            self.assertEqual(request.call_count, 6)
+
+            request.reset_mock()
+            with self.assertRaises(requests.ConnectionError):
+                self.session.post(self.URL)
+            self.assertEqual(request.call_count, 1)
+
+
+class TestSessionCache(ConfigTest):
+    URL = 'https://example.com/api'
+
+    def setUp(self):
+        super().setUp()
+        self.cache = config.data.ResponseCache(
+            self.lists_path, max_size=2 ** 20, max_age=60)
+        self.session = base.Session(cache=self.cache)
+
+    @responses.activate
+    def test_not_modified(self):
+        responses.add(responses.GET, self.URL, json={'id': 1},
+                      headers={'ETag': '"v1"'})
+        responses.add(responses.GET, self.URL, status=304,
+                      headers={'ETag': '"v1"', 'X-RateLimit-Remaining': '9'})
+
+        self.assertEqual(self.session.get(self.URL).json(), {'id': 1})
+        response = self.session.get(self.URL)
+
+        self.assertEqual(
+            responses.calls[1].request.headers['If-None-Match'], '"v1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.json(), {'id': 1})
+        self.assertEqual(response.headers['X-RateLimit-Remaining'], '9')
+
+    @responses.activate
+    def test_modified(self):
+        responses.add(responses.GET, self.URL, json={'id': 1},
+                      headers={'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+        responses.add(responses.GET, self.URL, json={'id': 2},
+                      headers={'Last-Modified': 'Tue, 02 Jan 2024 00:00:00 GMT'})
+        responses.add(responses.GET, self.URL, status=304)
+
+        self.session.get(self.URL)
+        self.assertEqual(self.session.get(self.URL).json(), {'id': 2})
+        self.assertEqual(self.session.get(self.URL).json(), {'id': 2})
+
+        self.assertEqual(
+            responses.calls[2].request.headers['If-Modified-Since'],
+            'Tue, 02 Jan 2024 00:00:00 GMT')
+
+    @responses.activate
+    def test_keyed_by_credentials(self):
+        responses.add(responses.GET, self.URL, json={},
+                      headers={'ETag': '"v1"'})
+
+        self.session.get(self.URL, headers={'Authorization': 'token one'})
+        self.session.get(self.URL, headers={'Authorization': 'token two'})
+
+        self.assertNotIn('If-None-Match', responses.calls[1].request.headers)
+
+    @responses.activate
+    def test_without_validators(self):
+        responses.add(responses.GET, self.URL, json={})
+
+        self.session.get(self.URL)
+        self.session.get(self.URL)
+
+        self.assertNotIn('If-None-Match', responses.calls[1].request.headers)
+        self.assertNotIn(
+            'If-Modified-Since', responses.calls[1].request.headers)
@@ -1,7 +1,9 @@
+from unittest import mock
+
 from .base import ServiceTest
 from .test_service import DumbIssue
 
-from bugwarrior.collect import TaskConstructor
+from bugwarrior.collect import TaskConstructor, compile_template
 from bugwarrior.config.schema import ServiceConfig, MainSectionConfig
 
 
@@ -94,3 +96,32 @@ class TestTemplates(ServiceTest):
         })
 
         self.assertEqual(record, expected_record)
+
+    def test_templates_compiled_once(self):
+        compile_template.cache_clear()
+        project_template = "wat_{{ project|upper }}"
+
+        for _ in range(3):
+            issue = self.get_issue(
+                {'project': project_template}, add_tags=['{{ project }}'])
+            TaskConstructor(issue).get_taskwarrior_record()
+
+        self.assertEqual(compile_template.cache_info().misses, 2)
+
+    def test_record_built_once(self):
+        issue = self.get_issue(
+            {'project': 'wat_{{ project }}', 'priority': '{{ priority }}'},
+            add_tags=['one', '{{ project }}'])
+        issue.to_taskwarrior = mock.Mock(return_value=self.arbitrary_issue)
+        issue.get_default_description = mock.Mock(
+            return_value=self.arbitrary_default_description)
+
+        constructor = TaskConstructor(issue)
+        first = constructor.get_taskwarrior_record()
+        second = constructor.get_taskwarrior_record()
+
+        self.assertEqual(issue.to_taskwarrior.call_count, 1)
+        self.assertEqual(issue.get_default_description.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first['tags'], ['one', 'end_of_empire'])
+        self.assertNotIn('tags', self.arbitrary_issue)
@@ -1,6 +1,9 @@
+import asyncio
+
 from dateutil.parser import parse as parse_date
 import responses
 
+from bugwarrior import collect
 from bugwarrior.collect import TaskConstructor
 from bugwarrior.config.schema import MainSectionConfig
 from bugwarrior.services.trello import TrelloConfig, TrelloService, TrelloIssue
@@ -97,12 +100,16 @@ class TestTrelloService(ConfigTest):
                       'https://api.trello.com/1/cards/C4RD/actions',
                       json=[self.COMMENT1, self.COMMENT2])
 
+    @staticmethod
+    async def collect_issues(service):
+        return [issue async for issue in service.issues()]
+
     @responses.activate
     def test_get_boards_config(self):
         self.config['mytrello']['include_boards'] = 'F00, B4R'
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        boards = service.get_boards()
+        boards = asyncio.run(service.get_boards())
         self.assertEqual(list(boards), [{'id': 'F00', 'name': 'Foo Board'},
                                         {'id': 'B4R', 'name': 'Bar Board'}])
 
@@ -110,14 +117,14 @@ class TestTrelloService(ConfigTest):
     def test_get_boards_api(self):
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        boards = service.get_boards()
+        boards = asyncio.run(service.get_boards())
         self.assertEqual(list(boards), [self.BOARD])
 
     @responses.activate
     def test_get_lists(self):
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        lists = service.get_lists('B04RD')
+        lists = asyncio.run(service.get_lists('B04RD'))
         self.assertEqual(list(lists), [self.LIST1, self.LIST2])
 
     @responses.activate
@@ -125,7 +132,7 @@ class TestTrelloService(ConfigTest):
         self.config['mytrello']['include_lists'] = 'List 1'
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        lists = service.get_lists('B04RD')
+        lists = asyncio.run(service.get_lists('B04RD'))
         self.assertEqual(list(lists), [self.LIST1])
 
     @responses.activate
@@ -133,14 +140,14 @@ class TestTrelloService(ConfigTest):
         self.config['mytrello']['exclude_lists'] = 'List 1'
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        lists = service.get_lists('B04RD')
+        lists = asyncio.run(service.get_lists('B04RD'))
         self.assertEqual(list(lists), [self.LIST2])
 
     @responses.activate
     def test_get_cards(self):
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        cards = service.get_cards('L15T')
+        cards = asyncio.run(service.get_cards('L15T'))
         self.assertEqual(list(cards), [self.CARD1, self.CARD2, self.CARD3])
 
     @responses.activate
@@ -148,7 +155,7 @@ class TestTrelloService(ConfigTest):
         self.config['mytrello']['only_if_assigned'] = 'tintin'
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        cards = service.get_cards('L15T')
+        cards = asyncio.run(service.get_cards('L15T'))
         self.assertEqual(list(cards), [self.CARD1])
 
     @responses.activate
@@ -159,21 +166,21 @@ class TestTrelloService(ConfigTest):
         })
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        cards = service.get_cards('L15T')
+        cards = asyncio.run(service.get_cards('L15T'))
         self.assertEqual(list(cards), [self.CARD1, self.CARD3])
 
     @responses.activate
     def test_get_comments(self):
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        comments = service.get_comments('C4RD')
+        comments = asyncio.run(service.get_comments('C4RD'))
         self.assertEqual(list(comments), [self.COMMENT1, self.COMMENT2])
 
     @responses.activate
     def test_annotations(self):
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        annotations = service.annotations(self.CARD1)
+        annotations = asyncio.run(service.annotations(self.CARD1))
         self.assertEqual(
             list(annotations), ["@luidgi - Preums", "@mario - Deuz"])
 
@@ -182,7 +189,7 @@ class TestTrelloService(ConfigTest):
         self.config['general']['annotation_links'] = 'true'
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        annotations = service.annotations(self.CARD1)
+        annotations = asyncio.run(service.annotations(self.CARD1))
         self.assertEqual(
             list(annotations),
             ["https://trello.com/c/AAaaBBbb",
@@ -197,7 +204,7 @@ class TestTrelloService(ConfigTest):
         })
         conf = self.validate()
         service = TrelloService(conf['mytrello'], conf['general'])
-        issues = service.issues()
+        issues = asyncio.run(self.collect_issues(service))
         expected = {
             'due': parse_date('2018-12-02T12:59:00.000Z'),
             'description': '(bw)#1 - Card 1 .. https://trello.com/c/AAaaBBbb',
@@ -216,9 +223,25 @@ class TestTrelloService(ConfigTest):
                 "@luidgi - Preums",
                 "@mario - Deuz"],
             'tags': []}
-        actual = TaskConstructor(next(issues)).get_taskwarrior_record()
+        actual = TaskConstructor(issues[0]).get_taskwarrior_record()
         self.assertEqual(expected, actual)
 
+    @responses.activate
+    def test_issues_on_event_loop(self):
+        self.config['general']['worker_type'] = 'asyncio'
+        self.config['mytrello'].update({
+            'include_lists': 'List 1',
+            'only_if_assigned': 'tintin',
+        })
+        conf = self.validate()
+
+        records = list(collect.aggregate_issues(conf, 'general', debug=False))
+
+        self.assertEqual([record['trellocardid'] for record in records],
+                         ['C4RD'])
+        self.assertEqual(records[0]['annotations'],
+                         ["@luidgi - Preums", "@mario - Deuz"])
+
     maxDiff = None
 
     def test_validate_config(self):